@@ -12,7 +12,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 # Flask imports
-from flask import Flask, render_template, request, redirect, url_for, session, send_file, flash, current_app, Blueprint
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, flash, current_app, Blueprint, jsonify
 from flask_wtf import CSRFProtect
 from flask_login import LoginManager, login_user, logout_user, current_user, login_required as flask_login_required
 from flask_migrate import Migrate
@@ -157,6 +157,9 @@ db.init_app(app)
 mail.init_app(app)
 # Initialize Redis for caching
 redis_manager.init_app(app)
+# Track active companies and keep their dashboards warm
+from utils.dashboard_warmer import dashboard_warmer
+dashboard_warmer.init_app(app)
 
 migrate = Migrate(app, db)
 csrf = CSRFProtect(app)
@@ -607,6 +610,17 @@ def admin_dashboard():
         print(f"❌ Traceback: {traceback.format_exc()}")
         return f"Error in admin dashboard: {e}", 500
 
+@app.route('/admin/cache-stats')
+@login_required(role='admin')
+def admin_cache_stats():
+    """Cache server figures plus hit, latency and size metrics per key prefix and category"""
+    from utils.cache_manager import CacheMonitor
+    days = request.args.get('days', 1, type=int)
+    return jsonify({
+        'server': CacheMonitor.get_cache_stats(),
+        'metrics': CacheMonitor.get_key_metrics(days=max(1, days))
+    })
+
 @app.route('/terms')
 def terms():
     """Terms of service page"""
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Stock Movement Rollup Backfill
+Rebuilds the stock_movement_daily table from raw movement history, one company
+per transaction. Safe to re-run; each company's rows are replaced.
+
+Usage: python backfill_stock_rollup.py [company_id ...]
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models.company import Company
+from models.product import StockMovementDaily
+
+
+def backfill(company_ids=None):
+    with app.app_context():
+        try:
+            StockMovementDaily.__table__.create(db.engine, checkfirst=True)
+            if not company_ids:
+                company_ids = [company_id for (company_id,) in db.session.query(Company.id).order_by(Company.id)]
+
+            print(f"📊 Rebuilding daily stock rollup for {len(company_ids)} companies")
+            for company_id in company_ids:
+                start = time.perf_counter()
+                StockMovementDaily.rebuild(company_id)
+                rows = StockMovementDaily.query.filter_by(company_id=company_id).count()
+                print(f"✅ Company {company_id}: {rows:,} daily rows in {time.perf_counter() - start:.2f}s")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error backfilling rollup: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    backfill([int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cache Codec Benchmark for RahaSoft ERP
+Encodes typical cache payloads with every installed codec and compressor and
+reports stored size and encode/decode time against the old json.dumps path,
+checking each combination round-trips. Runs without Redis.
+
+Usage: python benchmark_cache_codecs.py [rounds]
+"""
+import os
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.cache_codec import CODECS, COMPRESSORS, CacheCodec, SignedPickleCodec
+
+
+def payloads(rng):
+    """A dashboard, a product listing page, company settings and a non-JSON object."""
+    today = datetime(2026, 1, 1)
+    dashboard = {
+        'stats': {'total_products': 48211, 'low_stock': 312, 'out_of_stock': 41, 'cost_value': 1823311.42},
+        'sales_by_day': [{'day': (today - timedelta(days=i)).date().isoformat(),
+                          'revenue': round(rng.uniform(1000, 9000), 2), 'orders': rng.randint(20, 200)}
+                         for i in range(365)],
+        'top_products': [{'product_id': i, 'product_name': f'Product {i}', 'units': rng.randint(10, 900),
+                          'revenue': round(rng.uniform(100, 50000), 2)} for i in range(50)],
+    }
+    products = [{'id': i, 'product_code': f'SKU-{i:06d}', 'product_name': f'Catalogue Item {i}',
+                 'category': rng.choice(['Hardware', 'Grocery', 'Stationery', 'Electrical']),
+                 'price': round(rng.uniform(1, 500), 2), 'quantity': rng.randint(0, 1000),
+                 'is_active': True} for i in range(2000)]
+    settings = {'currency': 'KES', 'timezone': 'Africa/Nairobi', 'tax_rate': 16.0, 'low_stock_alerts': True}
+    report = (today, [(today + timedelta(hours=i), i * 1.5) for i in range(200)])
+    return {'dashboard': dashboard, 'product page': products, 'settings': settings, 'report tuple': report}
+
+
+def timed(func, value, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func(value)
+    return result, (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    structured = [codec.name for codec in CODECS.values() if codec.id != SignedPickleCodec.id]
+    compressors = [compressor.name for compressor in COMPRESSORS.values()]
+    all_round_trip = True
+    dashboard_sizes = {}
+
+    print("=" * 78)
+    print(f"🧪 Codecs: {', '.join(structured)} + signed pickle; compression: {', '.join(compressors)}")
+    for name, value in payloads(random.Random(19)).items():
+        print("-" * 78)
+        legacy = json.dumps(value, default=str)
+        _, legacy_encode = timed(lambda v: json.dumps(v, default=str), value, rounds)
+        _, legacy_decode = timed(json.loads, legacy, rounds)
+        print(f"📦 {name}: old json.dumps {len(legacy):>9,} B  encode {legacy_encode:>9.1f} µs  "
+              f"decode {legacy_decode:>9.1f} µs")
+        expected = json.loads(legacy) if name != 'report tuple' else value
+        # Non-JSON values always take the signed pickle path, so only compression varies
+        codec_names = structured if name != 'report tuple' else structured[:1]
+        for codec_name in codec_names:
+            for compression in compressors:
+                codec = CacheCodec(structured=codec_name, compression=compression)
+                encoded, encode_us = timed(codec.encode, value, rounds)
+                decoded, decode_us = timed(codec.decode, encoded, rounds)
+                round_trip = decoded == expected
+                all_round_trip &= round_trip
+                label = f"{codec_name if name != 'report tuple' else 'pickle'}+{compression}"
+                if name == 'dashboard':
+                    dashboard_sizes[label] = len(encoded)
+                print(f"   {'✅' if round_trip else '❌'} {label:<16} {len(encoded):>9,} B  "
+                      f"encode {encode_us:>9.1f} µs  decode {decode_us:>9.1f} µs")
+
+    print("-" * 78)
+    smallest = min(dashboard_sizes, key=dashboard_sizes.get)
+    legacy_size = len(json.dumps(payloads(random.Random(19))['dashboard'], default=str))
+    smaller = dashboard_sizes[smallest] < legacy_size / 2
+    print(f"{'✅' if smaller else '❌'} Dashboard stored in {dashboard_sizes[smallest]:,} B with {smallest} "
+          f"({legacy_size / dashboard_sizes[smallest]:.1f}x smaller than before)")
+    print(f"{'✅' if all_round_trip else '❌'} Every codec round-trips its payloads")
+    print("=" * 78)
+    sys.exit(0 if smaller and all_round_trip else 1)
+
+
+if __name__ == '__main__':
+    main()
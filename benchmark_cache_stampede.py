@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cache Stampede Load Test for RahaSoft ERP
+Fires every thread of several worker processes at a cached dashboard query the
+moment its entry expires, and counts how often the backend runs per expiry:
+plain cache-aside, the single-flight `cached` decorator, and stale-while-revalidate.
+Needs a Redis server (REDIS_URL, default redis://localhost:6379/15 - flushed).
+
+Usage: python benchmark_cache_stampede.py [processes] [threads_per_process] [waves]
+"""
+import os
+import sys
+import time
+import threading
+import multiprocessing
+
+import redis
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extensions  # noqa: F401 - resolves the cache module's import order
+from utils.cache_manager import cache, cached, redis_manager
+
+BACKEND_SECONDS = 0.2  # Cost of the dashboard query being protected
+TTL = 60
+STALE_TTL = 60
+CALLS_KEY = "bench:stampede:calls"
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/15')
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['REDIS_URL'] = REDIS_URL
+    return app
+
+
+def dashboard_query(company_id):
+    """The expensive backend call; counts itself in Redis so every process adds to one total."""
+    cache.redis.incr(CALLS_KEY)
+    time.sleep(BACKEND_SECONDS)
+    return {'company_id': company_id, 'revenue': 1234.5, 'orders': 42}
+
+
+def cache_aside(company_id):
+    """What the decorator did before: every caller that misses recomputes."""
+    key = f"bench:aside:{company_id}"
+    result = cache.get(key)
+    if result is None:
+        result = dashboard_query(company_id)
+        cache.set(key, result, ttl=TTL)
+    return result
+
+
+single_flight = cached(ttl=TTL, key_generator=lambda company_id: f"bench:single:{company_id}")(dashboard_query)
+stale_while_revalidate = cached(ttl=TTL, stale_ttl=STALE_TTL,
+                                key_generator=lambda company_id: f"bench:swr:{company_id}")(dashboard_query)
+SCENARIOS = {
+    'cache-aside': (cache_aside, "bench:aside:1"),
+    'single-flight': (single_flight, "bench:single:1"),
+    'stale-while-revalidate': (stale_while_revalidate, "bench:swr:1"),
+}
+
+
+def worker(scenario, threads, waves, barrier, latencies):
+    app = create_app()
+    redis_manager.init_app(app)
+    func = SCENARIOS[scenario][0]
+
+    def caller():
+        with app.app_context():
+            for _ in range(waves):
+                barrier.wait()  # Parent has expired the entry
+                started = time.perf_counter()
+                func(1)
+                latencies.append(time.perf_counter() - started)
+                barrier.wait()  # Parent counts the backend calls
+
+    pool = [threading.Thread(target=caller) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def expire(scenario, key):
+    """Make the entry lapse for every worker at once."""
+    if scenario == 'stale-while-revalidate':
+        # Keep the value but mark it stale, as it would be just past its ttl
+        entry = cache.get(key) or {'value': dashboard_query(1), 'delta': BACKEND_SECONDS}
+        entry['fresh_until'] = time.time() - 1
+        cache.set(key, entry, ttl=STALE_TTL)
+    else:
+        cache.delete(key)
+    time.sleep(0.2)  # Let workers drop their in-process copies
+
+
+def run(scenario, processes, threads, waves, redis_client):
+    key = SCENARIOS[scenario][1]
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(processes * threads + 1)
+    latencies = context.Manager().list()
+    pool = [context.Process(target=worker, args=(scenario, threads, waves, barrier, latencies))
+            for _ in range(processes)]
+    for process in pool:
+        process.start()
+
+    calls = []
+    for _ in range(waves):
+        expire(scenario, key)
+        redis_client.set(CALLS_KEY, 0)
+        barrier.wait()
+        barrier.wait()
+        time.sleep(BACKEND_SECONDS * 2)  # Background refreshes finish after their callers return
+        calls.append(int(redis_client.get(CALLS_KEY)))
+    for process in pool:
+        process.join()
+    return calls, max(latencies)
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    waves = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        redis_client.ping()
+    except redis.RedisError as e:
+        print(f"❌ Redis unavailable at {REDIS_URL}: {e}")
+        sys.exit(1)
+    redis_client.flushdb()
+    app = create_app()
+    redis_manager.init_app(app)
+
+    print("=" * 64)
+    print(f"🌊 {processes} processes x {threads} threads hitting one entry, {waves} expiries, "
+          f"backend {BACKEND_SECONDS}s")
+    results = {}
+    with app.app_context():
+        for scenario in SCENARIOS:
+            calls, slowest = run(scenario, processes, threads, waves, redis_client)
+            results[scenario] = calls
+            print(f"⏱️  {scenario:<24} backend calls per expiry {calls}, slowest caller {slowest:.3f} s")
+            if scenario == 'stale-while-revalidate':
+                never_waited = slowest < BACKEND_SECONDS
+                print(f"{'✅' if never_waited else '❌'} No caller waited for the refresh")
+
+    once = all(calls == 1 for name, calls in results.items() if name != 'cache-aside')
+    print(f"{'✅' if once else '❌'} Backend hit once per expiry with stampede protection")
+    print("=" * 64)
+    redis_client.flushdb()
+    sys.exit(0 if once and never_waited else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Catalogue Classification Benchmark for RahaSoft ERP
+Times the vectorised ABC / XYZ classification over a synthetic 100k SKU x 1 year
+history, checks it against a per-product Python loop, then runs the full batch
+(rollup and history load, classify, changed-only write-back) twice against a
+throwaway SQLite database
+
+Usage: python benchmark_catalogue_classification.py [sku_count] [db_sku_count]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+import tempfile
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product
+from models.sale import Sale, ProductSalesDaily
+from utils.catalogue_classification import CatalogueClassifier, HISTORY_DAYS, MIN_SPAN_WEEKS
+from utils.demand_forecast import DemandHistory
+
+SELLING_DAY_SHARE = 0.1
+LOOP_SAMPLE = 20000
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def synthetic_catalogue(sku_count, rng):
+    """Sparse demand with a long-tailed rate per SKU, and revenue at a per-SKU price."""
+    rows = int(sku_count * HISTORY_DAYS * SELLING_DAY_SHARE)
+    positions = rng.integers(0, sku_count, rows)
+    days = rng.integers(0, HISTORY_DAYS, rows)
+    keys = np.unique(positions * HISTORY_DAYS + days)
+    positions, days = keys // HISTORY_DAYS, keys % HISTORY_DAYS
+    rates = rng.pareto(1.5, sku_count) + 0.5
+    quantities = rng.poisson(rates[positions]) + 1.0
+    product_ids = np.arange(1, sku_count + 1)
+    history = DemandHistory(product_ids, positions, days, quantities, HISTORY_DAYS, date.today())
+    prices = rng.uniform(1, 100, sku_count)
+    revenue = np.bincount(positions, weights=quantities, minlength=sku_count) * prices
+    return product_ids, history, revenue
+
+
+def loop_classify(history, revenue, count):
+    """Reference: rank and bucket the first `count` SKUs one at a time in plain Python."""
+    revenue = list(revenue[:count])
+    total = sum(revenue)
+    abc = {}
+    running = 0.0
+    for position in sorted(range(count), key=lambda p: -revenue[p]):
+        abc[position] = 'C' if revenue[position] <= 0 else (
+            'A' if running / total < 0.8 else 'B' if running / total < 0.95 else 'C')
+        running += revenue[position]
+
+    weeks = history.history_days // 7
+    weekly = {}
+    for p, d, q in zip(history.positions, history.days, history.quantities):
+        week = (history.history_days - 1 - d) // 7
+        if p < count and week < weeks:
+            weekly.setdefault(p, [0.0] * weeks)[week] += q
+    xyz = {}
+    for position in range(count):
+        series = weekly.get(position)
+        if not series:
+            xyz[position] = 'Z'
+            continue
+        span = min(max(max(w for w, q in enumerate(series) if q) + 1, MIN_SPAN_WEEKS), weeks)
+        values = series[:span]
+        cv = statistics.pstdev(values) / statistics.fmean(values)
+        # A CV landing exactly on a threshold can round either way between the two methods
+        xyz[position] = None if min(abs(cv - 0.5), abs(cv - 1.0)) < 1e-9 else (
+            'X' if cv <= 0.5 else 'Y' if cv <= 1.0 else 'Z')
+    return abc, xyz
+
+
+def seed(sku_count, rng):
+    company = Company(name='Classify Co', unique_id='CLS01C')
+    db.session.add(company)
+    db.session.commit()
+    db.session.execute(Product.__table__.insert(), [
+        {'product_code': f'CL-{i:06d}', 'product_name': f'Classified Item {i}', 'price': 10.0,
+         'cost_price': 6.0, 'quantity': 50, 'is_active': True, 'company_id': company.id}
+        for i in range(sku_count)
+    ])
+    start = datetime.combine(date.today(), datetime.min.time()) - timedelta(days=HISTORY_DAYS)
+    sales = []
+    for i in range(sku_count):
+        rate = rng.paretovariate(1.5)
+        for day in rng.sample(range(HISTORY_DAYS), int(HISTORY_DAYS * SELLING_DAY_SHARE)):
+            quantity = max(int(rng.expovariate(1 / rate)), 1)
+            sales.append({'product_name': f'Classified Item {i}', 'quantity': quantity,
+                          'total_amount': quantity * 10.0, 'date_created': start + timedelta(days=day, hours=12),
+                          'company_id': company.id})
+    db.session.execute(Sale.__table__.insert(), sales)
+    ProductSalesDaily.rebuild(company.id)  # Core inserts bypass the sale hook
+    db.session.commit()
+    return company.id, len(sales)
+
+
+def main():
+    sku_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    db_sku_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    print("=" * 64)
+    product_ids, history, revenue = synthetic_catalogue(sku_count, np.random.default_rng(3))
+    print(f"🧮 Synthetic catalogue: {sku_count:,} SKUs x {HISTORY_DAYS} days, "
+          f"{len(history.quantities):,} demand days")
+    start = time.perf_counter()
+    classification = CatalogueClassifier.classify(
+        product_ids, revenue, CatalogueClassifier.weekly_cv(history, product_ids))
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  Vectorised ABC / XYZ:       {elapsed:>8.2f} s")
+
+    count = min(LOOP_SAMPLE, sku_count)
+    sample = CatalogueClassifier.classify(
+        product_ids[:count], revenue[:count],
+        CatalogueClassifier.weekly_cv(history, product_ids)[:count])
+    start = time.perf_counter()
+    abc, xyz = loop_classify(history, revenue, count)
+    loop_elapsed = time.perf_counter() - start
+    print(f"⏱️  Python loop ({count:,} SKUs):  {loop_elapsed:>8.2f} s")
+    matches = (list(sample['abc_class']) == [abc[p] for p in range(count)]
+               and all(xyz[p] in (None, sample['xyz_class'].iloc[p]) for p in range(count)))
+    print(f"{'✅' if matches else '❌'} Matches the per-product loop on {count:,} SKUs")
+    cells = classification.groupby(['abc_class', 'xyz_class']).size()
+    print("📊 " + ' '.join(f"{a}{x}={n:,}" for (a, x), n in cells.items()))
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print("-" * 64)
+        company_id, sale_count = seed(db_sku_count, random.Random(3))
+        print(f"🌱 Seeded {db_sku_count:,} products with {sale_count:,} sales")
+        first = CatalogueClassifier.run(company_id)
+        second = CatalogueClassifier.run(company_id)
+        print(f"⏱️  First run:  load {first['load_seconds']}s, classify {first['classify_seconds']}s, "
+              f"save {first['save_seconds']}s; {first['products_changed']:,} products written")
+        print(f"⏱️  Second run: load {second['load_seconds']}s, classify {second['classify_seconds']}s, "
+              f"save {second['save_seconds']}s; {second['products_changed']:,} products written")
+        stored = Product.query.filter(Product.company_id == company_id, Product.abc_class.isnot(None)).count()
+        incremental = first['products_changed'] == db_sku_count and second['products_changed'] == 0
+        print(f"{'✅' if stored == db_sku_count and incremental else '❌'} {stored:,} products classified, "
+              f"unchanged classes not rewritten")
+        print("=" * 64)
+
+    os.remove(db_path)
+    sys.exit(0 if matches and incremental else 1)
+
+
+if __name__ == '__main__':
+    main()
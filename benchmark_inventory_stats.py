@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Inventory Dashboard Statistics Benchmark for RahaSoft ERP
+Compares query count and latency of the old per-status count queries against
+the single-pass statistics service on a seeded tenant (in a throwaway SQLite database)
+
+Usage: python benchmark_inventory_stats.py [product_count]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product, InventoryValuation
+
+ROUNDS = 5
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(product_count):
+    """Seed one tenant with product_count products spread across all stock statuses"""
+    company = Company(name='Benchmark Co', unique_id='BEN01C')
+    db.session.add(company)
+    db.session.commit()
+
+    rng = random.Random(42)
+    rows = []
+    for i in range(product_count):
+        rows.append({
+            'product_code': f'BENCH-{i:06d}',
+            'product_name': f'Benchmark Product {i}',
+            'price': round(rng.uniform(1, 500), 2),
+            'cost_price': round(rng.uniform(1, 300), 2),
+            'quantity': rng.choice([0, rng.randint(1, 10), rng.randint(11, 900), rng.randint(1001, 2000)]),
+            'reorder_level': 10,
+            'max_stock_level': 1000,
+            'is_active': True,
+            'company_id': company.id,
+        })
+    db.session.execute(Product.__table__.insert(), rows)
+    InventoryValuation.mark_stale(db.session, company.id)
+    db.session.commit()
+    return company.id
+
+
+def legacy_dashboard_stats(company_id):
+    """The per-status count queries and full catalogue loads the dashboards used before"""
+    products = Product.query.filter_by(company_id=company_id)
+    total_products = products.count()
+    in_stock = products.filter(Product.quantity > 0).count()
+    low_stock = len(products.filter(Product.quantity <= Product.reorder_level).filter_by(is_active=True).all())
+    out_of_stock = products.filter(Product.quantity <= 0).count()
+
+    catalogue = Product.query.filter_by(company_id=company_id, is_active=True).all()
+    cost_value = sum(p.get_total_value() for p in catalogue)
+    retail_value = sum(p.get_retail_value() for p in catalogue)
+    return total_products, in_stock, low_stock, out_of_stock, cost_value, retail_value
+
+
+def measure(label, func, counter):
+    timings = []
+    queries = 0
+    for _ in range(ROUNDS):
+        db.session.expunge_all()
+        counter['n'] = 0
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        queries = counter['n']
+    timings.sort()
+    print(f"{label:<42} {queries:>8} {timings[len(timings) // 2]:>12.2f}")
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {product_count:,} products...")
+        company_id = seed(product_count)
+
+        counter = {'n': 0}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            counter['n'] += 1
+
+        print("=" * 64)
+        print(f"{'Strategy':<42} {'Queries':>8} {'Median ms':>12}")
+        print("-" * 64)
+        measure("Before: count() per status + full load", lambda: legacy_dashboard_stats(company_id), counter)
+        measure("After: single GROUP BY aggregate", lambda: Product.get_stock_summary(company_id), counter)
+        measure("After: valuation summary row", lambda: InventoryValuation.for_company(company_id), counter)
+        print("=" * 64)
+        print("ℹ️  Redis is not used here; with it enabled a warm dashboard issues no queries at all.")
+
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
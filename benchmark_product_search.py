@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Product Search Benchmark for RahaSoft ERP
+Measures p50/p95 type-ahead latency of the old ILIKE '%q%' scan against the
+indexed ProductSearch on a seeded tenant (in a throwaway SQLite database with FTS5)
+
+Usage: python benchmark_product_search.py [product_count]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from flask import Flask
+from sqlalchemy import or_
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product
+from utils.product_search import ProductSearch
+
+WORDS = ['steel', 'cable', 'rice', 'sugar', 'maize', 'flour', 'soap', 'paint', 'nail', 'bolt',
+         'pipe', 'wire', 'tile', 'lamp', 'bulb', 'cement', 'glue', 'tape', 'brush', 'hose']
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(product_count, rng):
+    company = Company(name='Benchmark Co', unique_id='BEN01C')
+    db.session.add(company)
+    db.session.commit()
+
+    rows = []
+    for i in range(product_count):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {rng.randint(1, 999)}"
+        rows.append({
+            'product_code': f'SKU-{i:07d}',
+            'product_name': name,
+            'barcode': f'600{i:010d}',
+            'price': round(rng.uniform(1, 500), 2),
+            'quantity': rng.randint(0, 500),
+            'is_active': True,
+            'company_id': company.id,
+        })
+    db.session.execute(Product.__table__.insert(), rows)
+    db.session.commit()
+    return company.id
+
+
+def legacy_search(company_id, query):
+    return Product.query.filter_by(company_id=company_id).filter(or_(
+        Product.product_name.ilike(f'%{query}%'),
+        Product.product_code.ilike(f'%{query}%'),
+        Product.barcode.ilike(f'%{query}%')
+    )).limit(10).all()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def measure(label, func, queries):
+    samples = []
+    for query in queries:
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<34} {percentile(samples, 0.50):>10.2f} {percentile(samples, 0.95):>10.2f}")
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(7)
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {product_count:,} products...")
+        company_id = seed(product_count, rng)
+
+        # Keystroke-style queries: growing prefixes of words, plus scanned codes
+        queries = []
+        for _ in range(100):
+            word = rng.choice(WORDS)
+            queries.extend(word[:length] for length in range(2, len(word) + 1))
+        queries.extend(f'SKU-{rng.randrange(product_count):07d}' for _ in range(50))
+        queries.extend(f'600{rng.randrange(product_count):010d}' for _ in range(50))
+
+        print("=" * 58)
+        print(f"{'Strategy':<34} {'p50 ms':>10} {'p95 ms':>10}")
+        print("-" * 58)
+        measure("Before: ILIKE '%q%' scan", lambda q: legacy_search(company_id, q), queries)
+        measure("After: exact match + FTS5 index", lambda q: ProductSearch.search(company_id, q), queries)
+        print("=" * 58)
+        print(f"ℹ️  {len(queries)} queries. On PostgreSQL the trigram GIN indexes serve the same role as FTS5.")
+
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
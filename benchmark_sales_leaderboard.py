@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Sales Leaderboard Benchmark for RahaSoft ERP
+Compares the dashboard's 30-day top-sellers join over the sales table with the
+leaderboard read from the daily sales rollup, checks both rank the same
+products, and times ORM sale writes with the rollup hook (in a throwaway SQLite database)
+
+Usage: python benchmark_sales_leaderboard.py [sale_count]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import desc, func
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product
+from models.sale import Sale, ProductSalesDaily
+from utils.sales_leaderboard import SalesLeaderboard
+
+ROUNDS = 20
+PRODUCTS = 2000
+HISTORY_DAYS = 365
+WRITES = 2000
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(sale_count):
+    """One tenant with a year of sales skewed towards a few hundred best sellers."""
+    company = Company(name='Leaderboard Co', unique_id='LDB01C')
+    db.session.add(company)
+    db.session.commit()
+
+    db.session.execute(Product.__table__.insert(), [
+        {
+            'product_code': f'TOP-{i:05d}',
+            'product_name': f'Top Product {i}',
+            'price': 10.0,
+            'quantity': 1000,
+            'is_active': True,
+            'company_id': company.id,
+        }
+        for i in range(PRODUCTS)
+    ])
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    db.session.execute(Sale.__table__.insert(), [
+        {
+            'product_name': f'Top Product {min(int(rng.paretovariate(1.2)) - 1, PRODUCTS - 1)}',
+            'quantity': rng.randint(1, 5),
+            'price': 10.0,
+            'total_amount': 10.0,
+            'date_created': now - timedelta(minutes=rng.randint(0, HISTORY_DAYS * 24 * 60)),
+            'company_id': company.id,
+        }
+        for _ in range(sale_count)
+    ])
+    ProductSalesDaily.rebuild(company.id)  # Core inserts bypass the hook, as a data import would
+    db.session.commit()
+    return company.id
+
+
+def join_top_sellers(company_id, limit=5, since=None):
+    """The query the inventory dashboard used to run on every load."""
+    thirty_days_ago = since or datetime.utcnow() - timedelta(days=30)
+    return db.session.query(
+        Product.id,
+        Product.product_name,
+        func.sum(Sale.quantity).label('total_sold')
+    ).join(Sale, Product.product_name == Sale.product_name).filter(
+        Product.company_id == company_id,
+        Sale.date_created >= thirty_days_ago
+    ).group_by(Product.id, Product.product_name).order_by(
+        desc(func.sum(Sale.quantity))
+    ).limit(limit).all()
+
+
+def median_ms(func):
+    timings = []
+    for _ in range(ROUNDS):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    sale_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {sale_count:,} sales over {HISTORY_DAYS} days...")
+        company_id = seed(sale_count)
+
+        print("=" * 60)
+        join = median_ms(lambda: join_top_sellers(company_id))
+        leaderboard = median_ms(lambda: SalesLeaderboard.top(company_id, days=30))
+        quarter = median_ms(lambda: SalesLeaderboard.top(company_id, days=90, limit=20))
+        print(f"⏱️  Sales join (30 days):   {join:>9.2f} ms")
+        print(f"⏱️  Leaderboard (30 days):  {leaderboard:>9.2f} ms")
+        print(f"⏱️  Leaderboard (90, top 20):{quarter:>8.2f} ms")
+
+        rng = random.Random(5)
+        start = time.perf_counter()
+        for _ in range(WRITES):
+            db.session.add(Sale(product_name=f'Top Product {rng.randrange(50)}', quantity=1, price=10.0,
+                                total_amount=10.0, company_id=company_id))
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+        print(f"⏱️  {WRITES:,} sale writes:      {elapsed * 1000:>9.0f} ms with the rollup hook")
+        print("-" * 60)
+
+        # Same whole-day window on both sides: the 30 UTC days ending today
+        since = datetime.combine(datetime.utcnow().date() - timedelta(days=29), datetime.min.time())
+        expected = [(row.product_name, int(row.total_sold)) for row in join_top_sellers(company_id, 10, since)]
+        ranked = [(row['product_name'], row['units']) for row in SalesLeaderboard.top(company_id, limit=10)]
+        same = sorted(expected) == sorted(ranked)
+        print(f"{'✅' if same else '❌'} Leaderboard matches the join: top seller {ranked[0][0]} with {ranked[0][1]:,} units")
+        print(f"🚀 Read speedup: {join / leaderboard:.1f}x")
+        print("=" * 60)
+
+    os.remove(db_path)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Low-Stock Alert Benchmark for RahaSoft ERP
+Compares rescanning the catalogue for products at or below their reorder level
+with reading the maintained low-stock set, checks both return the same products,
+and times the ledger writes that keep the set current (in a throwaway SQLite database)
+
+Usage: python benchmark_stock_alerts.py [product_count]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product, StockAlert
+from utils.stock_alerts import StockAlerts
+from utils.stock_ledger import StockLedger
+
+ROUNDS = 20
+SALES = 2000
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(product_count):
+    """One tenant where roughly one product in fifty needs reordering."""
+    company = Company(name='Alert Co', unique_id='ALR01C')
+    db.session.add(company)
+    db.session.commit()
+
+    rng = random.Random(7)
+    db.session.execute(Product.__table__.insert(), [
+        {
+            'product_code': f'ALERT-{i:06d}',
+            'product_name': f'Alert Product {i}',
+            'price': 10.0,
+            'cost_price': 6.0,
+            'quantity': rng.randint(0, 10) if rng.random() < 0.02 else rng.randint(11, 900),
+            'reorder_level': 10,
+            'max_stock_level': 1000,
+            'is_active': True,
+            'company_id': company.id,
+        }
+        for i in range(product_count)
+    ])
+    StockAlert.rebuild(db.session, company.id)
+    db.session.commit()
+    return company.id
+
+
+def scan_low_stock(company_id):
+    """The polling query the dashboards, reports and export used to run."""
+    return Product.query.filter_by(company_id=company_id, is_active=True).filter(
+        Product.quantity <= Product.reorder_level
+    ).all()
+
+
+def median_ms(func):
+    timings = []
+    for _ in range(ROUNDS):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding {product_count:,} products...")
+        company_id = seed(product_count)
+
+        events = []
+        StockAlerts.subscribe(events.extend)
+
+        print("=" * 60)
+        scan = median_ms(lambda: scan_low_stock(company_id))
+        alerts = median_ms(lambda: StockAlerts.products(company_id))
+        counts = median_ms(lambda: StockAlerts.counts(company_id))
+        print(f"⏱️  Catalogue scan:        {scan:>9.2f} ms")
+        print(f"⏱️  Low-stock set read:    {alerts:>9.2f} ms")
+        print(f"⏱️  Low-stock set counts:  {counts:>9.2f} ms")
+
+        # Sell stock down so products cross their thresholds through the ledger
+        rng = random.Random(3)
+        product_ids = [row.id for row in db.session.query(Product.id).filter_by(company_id=company_id)]
+        start = time.perf_counter()
+        for _ in range(SALES):
+            StockLedger.adjust(company_id, rng.choice(product_ids[:200]), -5, 'sale', allow_negative=True)
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+        print(f"⏱️  {SALES:,} ledger sales:     {elapsed * 1000:>9.0f} ms, {len(events):,} reorder/cleared events")
+        print("-" * 60)
+
+        same = sorted(p.id for p in scan_low_stock(company_id)) == sorted(p.id for p in StockAlerts.products(company_id))
+        print(f"{'✅' if same else '❌'} Set matches a full rescan: {sum(StockAlerts.counts(company_id).values()):,} products")
+        print(f"🚀 Read speedup: {scan / alerts:.1f}x")
+        print("=" * 60)
+
+    os.remove(db_path)
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
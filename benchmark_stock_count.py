@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Cycle Count Benchmark for RahaSoft ERP
+Posts a large stock take line by line (one adjust_stock-style commit per line)
+and through StockCountService in one transaction, and checks both leave the same
+stock behind (in a throwaway SQLite database)
+
+Usage: python benchmark_stock_count.py [product_count] [count_lines]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from flask import Flask
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product, StockMovement
+from utils.stock_count import StockCountService
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(name, unique_id, product_count):
+    company = Company(name=name, unique_id=unique_id)
+    db.session.add(company)
+    db.session.commit()
+    db.session.execute(Product.__table__.insert(), [
+        {
+            'product_code': f'{unique_id}-{i:06d}',
+            'product_name': f'Item {i}',
+            'price': 10.0,
+            'cost_price': 6.0,
+            'quantity': 100,
+            'is_active': True,
+            'company_id': company.id,
+        }
+        for i in range(product_count)
+    ])
+    db.session.commit()
+    return company.id
+
+
+def count_lines(unique_id, product_count, line_count, rng):
+    """A count where roughly one line in three disagrees with the system."""
+    lines = []
+    for i in rng.sample(range(product_count), line_count):
+        counted = 100 if rng.random() > 0.33 else rng.randint(80, 120)
+        lines.append({'sku': f'{unique_id}-{i:06d}', 'counted': counted})
+    return lines
+
+
+def post_line_by_line(company_id, lines):
+    """The old flow: one adjust_stock submission and commit per counted line."""
+    for line in lines:
+        product = Product.query.filter_by(company_id=company_id, product_code=line['sku']).first()
+        previous = product.quantity
+        product.quantity = line['counted']
+        db.session.add(StockMovement(
+            product_id=product.id, company_id=company_id, movement_type='adjustment_set',
+            quantity=line['counted'] - previous, previous_quantity=previous,
+            new_quantity=line['counted'], created_by='benchmark'
+        ))
+        db.session.commit()
+
+
+def stock_total(company_id):
+    return db.session.query(func.sum(Product.quantity)).filter(Product.company_id == company_id).scalar()
+
+
+def main():
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    with app.app_context():
+        db.create_all()
+        print(f"🌱 Seeding 2 x {product_count:,} products...")
+        old_company = seed('Line Co', 'LIN01C', product_count)
+        new_company = seed('Bulk Co', 'BLK01C', product_count)
+        rng = random.Random(11)
+        old_lines = count_lines('LIN01C', product_count, line_count, random.Random(11))
+        new_lines = count_lines('BLK01C', product_count, line_count, rng)
+
+        print("=" * 60)
+        start = time.perf_counter()
+        post_line_by_line(old_company, old_lines)
+        old_elapsed = time.perf_counter() - start
+        print(f"⏱️  Line by line:      {old_elapsed * 1000:>9.0f} ms for {line_count:,} lines")
+
+        start = time.perf_counter()
+        stock_count, variances, errors = StockCountService.post(new_company, new_lines, counted_by='benchmark')
+        db.session.commit()
+        new_elapsed = time.perf_counter() - start
+        print(f"⏱️  StockCountService: {new_elapsed * 1000:>9.0f} ms for {line_count:,} lines "
+              f"({stock_count.variance_line_count:,} variances)")
+        print("-" * 60)
+
+        same = stock_total(old_company) == stock_total(new_company)
+        print(f"{'✅' if same else '❌'} Resulting stock matches: {stock_total(new_company):,} units")
+        print(f"🚀 Speedup: {old_elapsed / new_elapsed:.1f}x")
+        print("=" * 60)
+
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
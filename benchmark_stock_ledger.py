@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Stock Ledger Concurrency Stress Test for RahaSoft ERP
+Hammers one SKU from many threads and checks that no sale is lost: first with
+the old read-modify-write pattern, then through StockLedger (in a throwaway
+SQLite database). Exits non-zero if the ledger loses an update.
+
+Usage: python benchmark_stock_ledger.py [threads] [sales_per_thread]
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from flask import Flask
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from extensions import db
+import models  # noqa: F401 - registers core models
+import models.crm  # noqa: F401 - Sale references customers
+from models.company import Company
+from models.product import Product, StockMovement, InventoryValuation
+from utils.stock_ledger import StockLedger, StockLedgerError
+
+INITIAL_STOCK = 1_000_000
+
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(app)
+    return app
+
+
+def seed(name, unique_id, count):
+    company = Company(name=name, unique_id=unique_id)
+    db.session.add(company)
+    db.session.commit()
+    products = [
+        Product(product_code=f'{unique_id}-{i}', product_name=f'Stress Item {i}', price=10.0,
+                cost_price=6.0, quantity=INITIAL_STOCK, company_id=company.id)
+        for i in range(count)
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return company.id, [product.id for product in products]
+
+
+def naive_sale(company_id, product_id):
+    """The pre-ledger pattern: read the quantity, subtract in Python, write it back."""
+    product = Product.query.filter_by(id=product_id, company_id=company_id).first()
+    product.quantity = product.quantity - 1
+    db.session.commit()
+
+
+def ledger_sale(company_id, product_id):
+    StockLedger.adjust(company_id, product_id, -1, 'sale', created_by='stress')
+    db.session.commit()
+
+
+def ledger_basket(company_id, product_ids):
+    """A checkout touching every SKU at once, in shuffled order."""
+    StockLedger.adjust_many(company_id, [
+        {'product_id': product_id, 'delta': -1, 'movement_type': 'sale'}
+        for product_id in reversed(product_ids)
+    ], created_by='stress')
+    db.session.commit()
+
+
+def hammer(app, label, work, threads, per_thread):
+    errors = []
+
+    def worker():
+        with app.app_context():
+            for _ in range(per_thread):
+                try:
+                    work()
+                except StockLedgerError as e:
+                    db.session.rollback()
+                    errors.append(e)
+            db.session.remove()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {label}: {threads * per_thread:,} operations in {elapsed:.2f}s, {len(errors)} rejected")
+    return errors
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    expected_sales = threads * per_thread
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    app = create_app(db_path)
+    failed = False
+    with app.app_context():
+        db.create_all()
+        naive_company_id, (naive_id,) = seed('Naive Co', 'NAI01C', 1)
+        company_id, product_ids = seed('Ledger Co', 'LED01C', 3)
+        ledger_id = product_ids[0]
+        db.session.remove()
+
+    print("=" * 60)
+    print(f"🔨 {threads} threads x {per_thread} sales against one SKU")
+    print("=" * 60)
+
+    hammer(app, "Read-modify-write", lambda: naive_sale(naive_company_id, naive_id), threads, per_thread)
+    hammer(app, "StockLedger.adjust", lambda: ledger_sale(company_id, ledger_id), threads, per_thread)
+    hammer(app, "StockLedger.adjust_many (3 SKUs)", lambda: ledger_basket(company_id, product_ids),
+           threads, per_thread)
+
+    with app.app_context():
+        print("-" * 60)
+        for label, product_id, sales in (("Read-modify-write", naive_id, expected_sales),
+                                         ("StockLedger", ledger_id, expected_sales * 2)):
+            quantity = db.session.get(Product, product_id).quantity
+            lost = quantity - (INITIAL_STOCK - sales)
+            icon = '✅' if lost == 0 else '❌'
+            print(f"{icon} {label:<20} final={quantity:,} lost updates={lost:,}")
+            if label == 'StockLedger' and lost:
+                failed = True
+
+        # Every ledger movement must chain: one row per sale, each new_quantity distinct
+        movements = db.session.query(
+            func.count(StockMovement.id),
+            func.count(func.distinct(StockMovement.new_quantity)),
+            func.sum(StockMovement.quantity)
+        ).filter(StockMovement.product_id == ledger_id).one()
+        chained = movements[0] == movements[1] == expected_sales * 2 and -movements[2] == expected_sales * 2
+        print(f"{'✅' if chained else '❌'} Ledger movements: {movements[0]:,} rows, "
+              f"{movements[1]:,} distinct balances, net {movements[2]:,}")
+        failed = failed or not chained
+
+        summary = InventoryValuation.query.filter_by(company_id=company_id).one().cost_value
+        actual = db.session.query(func.sum(Product.quantity * Product.cost_price)).filter(
+            Product.company_id == company_id).scalar()
+        in_sync = abs(summary - actual) < 0.01
+        print(f"{'✅' if in_sync else '❌'} Valuation summary {summary:,.2f} vs SQL {actual:,.2f}")
+        failed = failed or not in_sync
+        print("=" * 60)
+
+    os.remove(db_path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Threat Scanner Benchmark for RahaSoft ERP
+Checks that the precompiled threat scanner flags exactly the inputs the old
+per-pattern detectors flagged, over a corpus of attack and benign strings plus
+random strings built from the patterns' trigger tokens, both per input source
+and through full requests. Then times both on a typical API request and a large
+JSON body. Runs without a database or Redis.
+
+Usage: python benchmark_threat_scanner.py [fuzz_cases] [rounds]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, request
+from security_enhancements import SecurityEnhancer
+from utils.threat_scanner import (ThreatScanner, CATEGORIES, SOURCE_CATEGORIES, SQL_INJECTION, XSS,
+                                  PATH_TRAVERSAL, SQL_PATTERNS, XSS_PATTERNS, PATH_PATTERNS)
+
+LEGACY_PATTERNS = {SQL_INJECTION: SQL_PATTERNS, XSS: XSS_PATTERNS, PATH_TRAVERSAL: PATH_PATTERNS}
+
+ATTACKS = [
+    "' OR 1=1 --", "admin'--", "1; DROP TABLE users", "x' union all select password from users",
+    "1 UNION SELECT null, table_name FROM information_schema.tables", "'; waitfor delay '0:0:5'--",
+    "%27%20or%201%3D1", "1 and 2=2", "name=' or ''='", "select * from sysobjects", "%3Cimg src=x%3E",
+    "<script>alert(1)</script>", "<SCRIPT SRC=//evil/x.js></SCRIPT>", "javascript:alert(document.cookie)",
+    "<img src=x onerror=alert(1)>", "<iframe src=//evil></iframe>", "<body onload=steal()>",
+    "<object data=x></object>", "<embed src=x></embed>", "<form action=//evil><input name=p></form>",
+    "window.location='//evil'", "eval (atob('x'))", "prompt(1)", "confirm (document.domain)",
+    "document.write('<b>')", "onmouseover = go()",
+    "../../etc/passwd", "..\\..\\windows\\win.ini", "%2e%2e%2fetc%2fpasswd", "%2E%2E\\boot.ini",
+    "..%2fetc", "..%5cwin.ini", "%252e%252e%252fetc", "..%252fetc", "..%c0%afetc", "..%c1%9cetc",
+    "ab%2fetc", "ſelect", "\u212aelvin=1'",
+]
+
+BENIGN = [
+    "", "Maize flour 2kg", "SKU-000123", "john.doe@example.com", "+254 712 345678", "Nairobi, Kenya",
+    "Order #1042 delivered", "Price: 1,250.00 KES", "2026-01-31", "Sales Q4 report", "50% off",
+    "Selected items", "Updated stock levels", "Union Bank of Africa", "v1.2.3", "Drop-off point",
+    "The quick brown fox", "Please confirm delivery", "Alerts enabled", "Window blinds x4",
+    "Documents attached", "Executive summary", "delayed shipment", "evaluation", "prompted",
+    "C:\\reports\\q4.xlsx", "a < b", "x = 5", "O'Reilly Media", "url?a=1&b=2",
+]
+
+TOKENS = [
+    "'", '"', "=", "<", ">", "/", "\\", "%", "..", "%27", "%3D", "%3C", "%3E", "%2f", "%2e", "%5c",
+    "%252e", "%c0%af", "%69", "%6D", "%67", "or", "OR", "and", "1", "23", " ", "  ", "\n", "\t",
+    "select", "SELECT", "union", "all", "drop", "exec", "script", "iframe", "img", "src", "onload",
+    "onclick", "javascript:", "document.cookie", "document.", "window.location", "eval", "alert",
+    "confirm", "prompt", "(", "waitfor", "delay", "information_schema", "sysobjects", "input",
+    "form", "body", "object", "embed", "</script>", "a", "b", "x", "ſ", "\u212a", "ı", "İ", "é", "ß",
+]
+
+
+def legacy_match(category, value):
+    """The old detectors' check: each pattern searched separately."""
+    return any(re.search(pattern, value, re.IGNORECASE) for pattern in LEGACY_PATTERNS[category])
+
+
+def legacy_json_values(json_data):
+    """The old SecurityEnhancer.extract_json_values."""
+    values = []
+    if isinstance(json_data, dict):
+        for value in json_data.values():
+            if isinstance(value, str):
+                values.append(value)
+            elif isinstance(value, (dict, list)):
+                values.extend(legacy_json_values(value))
+    elif isinstance(json_data, list):
+        for item in json_data:
+            if isinstance(item, str):
+                values.append(item)
+            elif isinstance(item, (dict, list)):
+                values.extend(legacy_json_values(item))
+    return values
+
+
+def legacy_scan(request):
+    """Categories the old detect_* methods flagged for a request."""
+    args = list(request.args.values())
+    form = list(request.form.values()) if request.form else []
+    body = legacy_json_values(request.json) if request.is_json and request.json else []
+    inputs = {
+        SQL_INJECTION: args + form + body + [request.path],
+        XSS: args + form + body,
+        PATH_TRAVERSAL: [request.path] + args + form,
+    }
+    return {category for category in CATEGORIES
+            if any(isinstance(value, str) and legacy_match(category, value) for value in inputs[category])}
+
+
+def fuzz(rng, count):
+    return [''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+
+def check_corpus(strings):
+    """Each string through every source on its own, then in batches; returns the mismatches."""
+    scanner = ThreatScanner()
+    mismatches = []
+    for value in strings:
+        for source, categories in SOURCE_CATEGORIES.items():
+            if source == 'path':
+                result = scanner.scan(value)
+            elif source == 'json':
+                result = scanner.scan('', json_data={'field': [value]})
+            else:
+                result = scanner.scan('', **{source: [value]})
+            expected = {category for category in categories if legacy_match(category, value)}
+            if result.categories != expected:
+                mismatches.append((source, value, sorted(expected), sorted(result.categories)))
+
+    # Many values of one source scanned together, as in a real body
+    rng = random.Random(len(strings))
+    for _ in range(len(strings) // 10):
+        batch = rng.sample(strings, rng.randint(2, 30))
+        for source in ('args', 'json'):
+            result = scanner.scan('', **({'args': batch} if source == 'args' else {'json_data': [batch]}))
+            expected = {category for category in SOURCE_CATEGORIES[source]
+                        if any(legacy_match(category, value) for value in batch)}
+            if result.categories != expected:
+                mismatches.append((source, batch, sorted(expected), sorted(result.categories)))
+    return mismatches
+
+
+def check_requests(rng, count):
+    """Random requests mixing corpus values across sources, old detectors vs SecurityEnhancer."""
+    app = Flask(__name__)
+    enhancer = SecurityEnhancer()
+    pool = ATTACKS + BENIGN * 4
+    mismatches = 0
+    for _ in range(count):
+        path = '/' + rng.choice(['products', 'api/v1/customers', '..%2fetc', 'a/../b', "x'or", 'union'])
+        query = {f'q{i}': rng.choice(pool) for i in range(rng.randint(0, 2))}
+        options = {'query_string': query}
+        if rng.random() < 0.5:
+            options['json'] = {'name': rng.choice(pool), 'lines': [{'note': rng.choice(pool)}], 'n': 1}
+        else:
+            options.update(method='POST', data={'note': rng.choice(pool)})
+        with app.test_request_context(path, **options):
+            old = legacy_scan(request)
+            new = {category for category, detected in (
+                (SQL_INJECTION, enhancer.detect_sql_injection()),
+                (XSS, enhancer.detect_xss_attempt()),
+                (PATH_TRAVERSAL, enhancer.detect_path_traversal())) if detected}
+            mismatches += old != new
+    return mismatches
+
+
+def large_body(rng, lines):
+    return {'customer': {'name': 'Acme Traders Ltd', 'email': 'accounts@acme.co.ke', 'phone': '+254700000000'},
+            'notes': 'Deliver before noon, call on arrival',
+            'lines': [{'product_code': f'SKU-{i:06d}', 'description': f'Catalogue item {i} - {rng.choice(BENIGN)}',
+                       'quantity': rng.randint(1, 50), 'unit_price': round(rng.uniform(1, 900), 2),
+                       'tags': ['retail', 'wholesale'], 'meta': {'warehouse': 'Nairobi', 'bin': f'A{i % 40}'}}
+                      for i in range(lines)]}
+
+
+def timed(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return result, (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    fuzz_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(25)
+
+    print("=" * 78)
+    corpus = ATTACKS + BENIGN + fuzz(rng, fuzz_cases)
+    mismatches = check_corpus(corpus)
+    flagged = sum(any(legacy_match(category, value) for category in CATEGORIES) for value in corpus)
+    for source, value, expected, found in mismatches[:10]:
+        print(f"   ❌ {source}: {value!r} old {expected} new {found}")
+    print(f"{'✅' if not mismatches else '❌'} Corpus parity: {len(corpus):,} strings x {len(SOURCE_CATEGORIES)} sources "
+          f"and {len(corpus) // 10:,} batches, {flagged:,} flagged, {len(mismatches)} mismatches")
+
+    request_mismatches = check_requests(rng, 2000)
+    print(f"{'✅' if not request_mismatches else '❌'} Request parity: 2,000 mixed requests, "
+          f"{request_mismatches} mismatches")
+
+    scanner = ThreatScanner()
+    print("-" * 78)
+    faster = True
+    for label, body in (('typical request', large_body(rng, 10)), ('large JSON body', large_body(rng, 2000))):
+        args = {'page': '2', 'per_page': '50', 'search': 'maize flour'}
+        size = len(json.dumps(body))
+        old_result, old_us = timed(lambda: {
+            category for category in CATEGORIES
+            if any(legacy_match(category, value) for value in
+                   (list(args.values()) + (legacy_json_values(body) if category != PATH_TRAVERSAL else [])
+                    + (['/api/v1/invoices'] if category != XSS else [])))}, rounds)
+        new_result, new_us = timed(lambda: scanner.scan('/api/v1/invoices', args=args.values(), json_data=body),
+                                   rounds)
+        same = old_result == new_result.categories
+        faster &= new_us < old_us
+        print(f"   {'✅' if same else '❌'} {label:<16} {size:>9,} B  old {old_us:>9.1f} µs  "
+              f"new {new_us:>9.1f} µs  ({old_us / new_us:.1f}x)")
+
+    deep = current = {}
+    for _ in range(200):
+        current['next'] = current = {}
+    current['payload'] = "' or 1=1"
+    bounded = scanner.scan('/', json_data=deep).limit_hit == 'depth'
+    print(f"{'✅' if bounded else '❌'} Deeply nested JSON stops at max_depth instead of recursing")
+
+    print("=" * 78)
+    ok = not mismatches and not request_mismatches and faster and bounded
+    print(f"{'✅' if ok else '❌'} Threat scanner matches the old detectors{' and is faster' if faster else ''}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
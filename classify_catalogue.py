@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Nightly Catalogue Classification
+Assigns every active product of each company an ABC class by revenue share and
+an XYZ class by weekly demand variability, one company per transaction. Only
+products whose class changed are written. Intended for cron, after the sales
+rollup and demand history for the day are in.
+
+Usage: python classify_catalogue.py [--history-days N] [--abc A B] [--xyz X Y] [company_id ...]
+"""
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models.company import Company
+from utils.catalogue_classification import CatalogueClassifier, ClassificationError, HISTORY_DAYS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Classify the catalogue by ABC and XYZ')
+    parser.add_argument('company_ids', nargs='*', type=int)
+    parser.add_argument('--history-days', type=int, default=HISTORY_DAYS)
+    parser.add_argument('--abc', type=float, nargs=2, metavar=('A', 'B'),
+                        help='Cumulative revenue shares closing classes A and B (default 0.8 0.95)')
+    parser.add_argument('--xyz', type=float, nargs=2, metavar=('X', 'Y'),
+                        help='Weekly demand CV closing classes X and Y (default 0.5 1.0)')
+    return parser.parse_args()
+
+
+def classify(args):
+    with app.app_context():
+        try:
+            company_ids = args.company_ids or [
+                company_id for (company_id,) in db.session.query(Company.id).order_by(Company.id)
+            ]
+
+            print(f"🔠 Classifying the catalogue of {len(company_ids)} companies")
+            for company_id in company_ids:
+                result = CatalogueClassifier.run(
+                    company_id, history_days=args.history_days,
+                    abc_thresholds=tuple(args.abc) if args.abc else None,
+                    xyz_thresholds=tuple(args.xyz) if args.xyz else None
+                )
+                abc = ' '.join(f"{name}={count:,}" for name, count in result['abc'].items())
+                xyz = ' '.join(f"{name}={count:,}" for name, count in result['xyz'].items())
+                print(f"✅ Company {company_id}: {result['products']:,} products ({abc}; {xyz}), "
+                      f"{result['products_changed']:,} changed (load {result['load_seconds']}s, "
+                      f"classify {result['classify_seconds']}s, save {result['save_seconds']}s)")
+
+        except ClassificationError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error classifying catalogue: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    classify(parse_args())
@@ -9,14 +9,11 @@ mail = Mail()
 try:
     from utils.cache_manager import redis_manager
     print("✅ Redis cache manager imported successfully")
-except ImportError as e:
-    print(f"⚠️ Warning: Redis cache manager not available: {e}")
-    # Create a dummy redis_manager to prevent errors
-    class DummyRedisManager:
-        def init_app(self, app): pass
-        def get(self, key): return None
-        def set(self, key, value, timeout=None): return True
-        def delete(self, key): return True
-        def invalidate_category(self, category): return True
+except ImportError:
+    # utils.cache_manager is still importing (it imports db from here); resolve it on first use
+    class LazyRedisManager:
+        def __getattr__(self, name):
+            from utils.cache_manager import redis_manager as manager
+            return getattr(manager, name)
     
-    redis_manager = DummyRedisManager()
\ No newline at end of file
+    redis_manager = LazyRedisManager()
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""Add demand_forecasts
+
+Revision ID: 1a6e9c4b3d87
+Revises: f4b7d2e91c53
+Create Date: 2026-10-18 18:03:52.118904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a6e9c4b3d87'
+down_revision = 'f4b7d2e91c53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('demand_forecasts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('method', sa.String(length=20), nullable=False),
+    sa.Column('daily_demand', sa.Float(), nullable=False),
+    sa.Column('demand_std', sa.Float(), nullable=False),
+    sa.Column('safety_stock', sa.Float(), nullable=False),
+    sa.Column('reorder_level', sa.Integer(), nullable=False),
+    sa.Column('max_stock_level', sa.Integer(), nullable=False),
+    sa.Column('velocity_band', sa.String(length=10), nullable=True),
+    sa.Column('history_days', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id')
+    )
+    op.create_index(op.f('ix_demand_forecasts_company_id'), 'demand_forecasts', ['company_id'], unique=False)
+    # Populated nightly by: python forecast_demand.py
+
+
+def downgrade():
+    op.drop_index(op.f('ix_demand_forecasts_company_id'), table_name='demand_forecasts')
+    op.drop_table('demand_forecasts')
@@ -0,0 +1,61 @@
+"""Add product_sales_daily rollup
+
+Revision ID: 2b8d5f1a7c64
+Revises: 1a6e9c4b3d87
+Create Date: 2026-10-18 19:12:40.207381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8d5f1a7c64'
+down_revision = '1a6e9c4b3d87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_sales_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(length=100), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sale_count', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('company_id', 'product_name', 'day', name='uq_product_sales_daily')
+    )
+    op.create_index('ix_product_sales_daily_company_day', 'product_sales_daily', ['company_id', 'day'], unique=False)
+
+    # Seed the rollup from existing sales; the sale write hooks keep it current from here
+    sales = sa.table('sale', sa.column('company_id', sa.Integer), sa.column('product_name', sa.String),
+                     sa.column('quantity', sa.Integer), sa.column('price', sa.Float),
+                     sa.column('subtotal', sa.Float), sa.column('total_amount', sa.Float),
+                     sa.column('timestamp', sa.DateTime), sa.column('date_created', sa.DateTime))
+    daily = sa.table('product_sales_daily', sa.column('company_id', sa.Integer),
+                     sa.column('product_name', sa.String), sa.column('day', sa.Date),
+                     sa.column('sale_count', sa.Integer), sa.column('units', sa.Integer),
+                     sa.column('revenue', sa.Float))
+    day = sa.func.date(sa.func.coalesce(sales.c.date_created, sales.c.timestamp))
+    revenue = sa.func.coalesce(sales.c.total_amount, sales.c.subtotal, sales.c.price * sales.c.quantity, 0)
+    op.execute(daily.insert().from_select(
+        ['company_id', 'product_name', 'day', 'sale_count', 'units', 'revenue'],
+        sa.select(
+            sales.c.company_id, sales.c.product_name, day, sa.func.count(),
+            sa.func.coalesce(sa.func.sum(sales.c.quantity), 0), sa.func.sum(revenue)
+        ).where(
+            sales.c.company_id.isnot(None),
+            sales.c.product_name.isnot(None),
+            sales.c.product_name != '',
+            day.isnot(None)
+        ).group_by(sales.c.company_id, sales.c.product_name, day)
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_product_sales_daily_company_day', table_name='product_sales_daily')
+    op.drop_table('product_sales_daily')
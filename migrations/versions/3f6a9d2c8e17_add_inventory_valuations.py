@@ -0,0 +1,79 @@
+"""Add inventory_valuations summary table
+
+Revision ID: 3f6a9d2c8e17
+Revises: 8e4a2c6f1b95
+Create Date: 2026-10-19 09:24:51.207334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a9d2c8e17'
+down_revision = '8e4a2c6f1b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('inventory_valuations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('cost_value', sa.Float(), nullable=False),
+    sa.Column('retail_value', sa.Float(), nullable=False),
+    sa.Column('total_products', sa.Integer(), nullable=False),
+    sa.Column('out_of_stock_count', sa.Integer(), nullable=False),
+    sa.Column('low_stock_count', sa.Integer(), nullable=False),
+    sa.Column('overstocked_count', sa.Integer(), nullable=False),
+    sa.Column('normal_count', sa.Integer(), nullable=False),
+    sa.Column('rebuilt_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_inventory_valuations_company_id', 'inventory_valuations', ['company_id'], unique=True)
+
+    # Seed one row per company from current stock; the product write hooks keep them current
+    # from here, and companies without a row are rebuilt on first read
+    products = sa.table('products', sa.column('company_id', sa.Integer), sa.column('quantity', sa.Integer),
+                        sa.column('price', sa.Float), sa.column('cost_price', sa.Float),
+                        sa.column('reorder_level', sa.Integer), sa.column('max_stock_level', sa.Integer),
+                        sa.column('is_active', sa.Boolean))
+    valuations = sa.table('inventory_valuations', sa.column('company_id', sa.Integer),
+                          sa.column('cost_value', sa.Float), sa.column('retail_value', sa.Float),
+                          sa.column('total_products', sa.Integer), sa.column('out_of_stock_count', sa.Integer),
+                          sa.column('low_stock_count', sa.Integer), sa.column('overstocked_count', sa.Integer),
+                          sa.column('normal_count', sa.Integer), sa.column('rebuilt_at', sa.DateTime),
+                          sa.column('updated_at', sa.DateTime))
+    # Same classification as Product.stock_status_expression()
+    status = sa.case(
+        (products.c.quantity <= 0, 'out_of_stock'),
+        (products.c.quantity <= products.c.reorder_level, 'low_stock'),
+        (products.c.quantity > products.c.max_stock_level, 'overstocked'),
+        else_='normal'
+    )
+
+    def count(value):
+        return sa.func.sum(sa.case((status == value, 1), else_=0))
+
+    op.execute(valuations.insert().from_select(
+        ['company_id', 'cost_value', 'retail_value', 'total_products', 'out_of_stock_count',
+         'low_stock_count', 'overstocked_count', 'normal_count', 'rebuilt_at', 'updated_at'],
+        sa.select(
+            products.c.company_id,
+            sa.func.coalesce(sa.func.sum(sa.func.coalesce(products.c.cost_price, 0) * products.c.quantity), 0),
+            sa.func.coalesce(sa.func.sum(products.c.price * products.c.quantity), 0),
+            sa.func.count(),
+            count('out_of_stock'), count('low_stock'), count('overstocked'), count('normal'),
+            sa.func.now(), sa.func.now()
+        ).where(
+            products.c.is_active == sa.true(),
+            products.c.company_id.isnot(None)
+        ).group_by(products.c.company_id)
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_inventory_valuations_company_id', table_name='inventory_valuations')
+    op.drop_table('inventory_valuations')
@@ -0,0 +1,70 @@
+"""Add product search indexes
+
+Revision ID: 5c1e7a9d2f40
+Revises: bc08f5214114
+Create Date: 2026-10-18 09:12:44.310527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d2f40'
+down_revision = 'bc08f5214114'
+branch_labels = None
+depends_on = None
+
+
+FTS_COLUMNS = 'product_name, product_code, barcode, brand, company_id'
+
+
+def upgrade():
+    op.create_index('ix_products_company_name', 'products', ['company_id', 'product_name'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (product_name gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_products_code_trgm ON products USING gin (product_code gin_trgm_ops)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_products_barcode_trgm ON products USING gin (barcode gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            "product_name, product_code, barcode, brand, company_id, "
+            "content='products', content_rowid='id', prefix='2 3')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+            f"INSERT INTO products_fts(rowid, {FTS_COLUMNS}) "
+            "VALUES (new.id, new.product_name, new.product_code, new.barcode, new.brand, new.company_id); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+            f"INSERT INTO products_fts(products_fts, rowid, {FTS_COLUMNS}) "
+            "VALUES ('delete', old.id, old.product_name, old.product_code, old.barcode, old.brand, old.company_id); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF {FTS_COLUMNS} ON products BEGIN "
+            f"INSERT INTO products_fts(products_fts, rowid, {FTS_COLUMNS}) "
+            "VALUES ('delete', old.id, old.product_name, old.product_code, old.barcode, old.brand, old.company_id); "
+            f"INSERT INTO products_fts(rowid, {FTS_COLUMNS}) "
+            "VALUES (new.id, new.product_name, new.product_code, new.barcode, new.brand, new.company_id); END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_barcode_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_products_code_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS products_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_ai")
+        op.execute("DROP TABLE IF EXISTS products_fts")
+
+    op.drop_index('ix_products_company_name', table_name='products')
@@ -0,0 +1,113 @@
+"""Add cost layers and product cost positions
+
+Revision ID: 5d1c8e3f9a20
+Revises: 2b8d5f1a7c64
+Create Date: 2026-10-18 20:41:17.604219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1c8e3f9a20'
+down_revision = '2b8d5f1a7c64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cost_layers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('movement_type', sa.String(length=50), nullable=True),
+    sa.Column('unit_cost', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('remaining', sa.Integer(), nullable=False),
+    sa.Column('start_position', sa.Integer(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cost_layers_product_open', 'cost_layers', ['product_id', 'remaining'], unique=False)
+    op.create_table('product_costs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('units_in', sa.Integer(), nullable=False),
+    sa.Column('units_out', sa.Integer(), nullable=False),
+    sa.Column('cost_in', sa.Float(), nullable=False),
+    sa.Column('cogs_fifo', sa.Float(), nullable=False),
+    sa.Column('cogs_average', sa.Float(), nullable=False),
+    sa.Column('average_cost', sa.Float(), nullable=False),
+    sa.Column('backlog_fifo_cost', sa.Float(), nullable=False),
+    sa.Column('backlog_average_cost', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id')
+    )
+    op.create_index(op.f('ix_product_costs_company_id'), 'product_costs', ['company_id'], unique=False)
+    op.create_table('product_cost_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('units_in', sa.Integer(), nullable=False),
+    sa.Column('units_out', sa.Integer(), nullable=False),
+    sa.Column('cost_in', sa.Float(), nullable=False),
+    sa.Column('cogs_fifo', sa.Float(), nullable=False),
+    sa.Column('cogs_average', sa.Float(), nullable=False),
+    sa.Column('average_cost', sa.Float(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'day', name='uq_product_cost_daily')
+    )
+    op.create_index('ix_product_cost_daily_company_day', 'product_cost_daily', ['company_id', 'day'], unique=False)
+
+    # Open every product at its current quantity and cost price; movements keep the positions current
+    products = sa.table('products', sa.column('id', sa.Integer), sa.column('company_id', sa.Integer),
+                        sa.column('quantity', sa.Integer), sa.column('cost_price', sa.Float))
+    cost = sa.func.coalesce(products.c.cost_price, 0.0)
+    units_in = sa.case((products.c.quantity > 0, products.c.quantity), else_=0)
+    units_out = sa.case((products.c.quantity < 0, -products.c.quantity), else_=0)
+
+    costs = sa.table('product_costs', *[sa.column(name) for name in (
+        'product_id', 'units_in', 'units_out', 'cost_in', 'cogs_fifo', 'cogs_average', 'average_cost',
+        'backlog_fifo_cost', 'backlog_average_cost', 'updated_at', 'company_id')])
+    op.execute(costs.insert().from_select(
+        [column.name for column in costs.columns],
+        sa.select(products.c.id, units_in, units_out, units_in * cost, units_out * cost, units_out * cost, cost,
+                  units_out * cost, units_out * cost, sa.func.now(), products.c.company_id)
+    ))
+
+    layers = sa.table('cost_layers', *[sa.column(name) for name in (
+        'product_id', 'movement_type', 'unit_cost', 'quantity', 'remaining', 'start_position', 'received_at',
+        'company_id')])
+    op.execute(layers.insert().from_select(
+        [column.name for column in layers.columns],
+        sa.select(products.c.id, sa.literal('opening'), cost, products.c.quantity, products.c.quantity,
+                  sa.literal(0), sa.func.now(), products.c.company_id).where(products.c.quantity > 0)
+    ))
+
+    daily = sa.table('product_cost_daily', *[sa.column(name) for name in (
+        'product_id', 'day', 'units_in', 'units_out', 'cost_in', 'cogs_fifo', 'cogs_average', 'average_cost',
+        'company_id')])
+    op.execute(daily.insert().from_select(
+        [column.name for column in daily.columns],
+        sa.select(products.c.id, sa.func.current_date(), units_in, units_out, units_in * cost, units_out * cost,
+                  units_out * cost, cost, products.c.company_id)
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_product_cost_daily_company_day', table_name='product_cost_daily')
+    op.drop_table('product_cost_daily')
+    op.drop_index(op.f('ix_product_costs_company_id'), table_name='product_costs')
+    op.drop_table('product_costs')
+    op.drop_index('ix_cost_layers_product_open', table_name='cost_layers')
+    op.drop_table('cost_layers')
@@ -0,0 +1,26 @@
+"""Add stock_version to products
+
+Revision ID: 8d3b6f1a2c97
+Revises: 5c1e7a9d2f40
+Create Date: 2026-10-18 11:40:18.204913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3b6f1a2c97'
+down_revision = '5c1e7a9d2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('stock_version')
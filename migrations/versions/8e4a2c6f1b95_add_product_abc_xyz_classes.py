@@ -0,0 +1,31 @@
+"""Add ABC / XYZ classes to products
+
+Revision ID: 8e4a2c6f1b95
+Revises: 5d1c8e3f9a20
+Create Date: 2026-10-18 21:36:02.881734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a2c6f1b95'
+down_revision = '5d1c8e3f9a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('abc_class', sa.String(length=1), nullable=True))
+        batch_op.add_column(sa.Column('xyz_class', sa.String(length=1), nullable=True))
+        batch_op.create_index('ix_products_company_class', ['company_id', 'abc_class', 'xyz_class'], unique=False)
+    # Classes are assigned by: python classify_catalogue.py
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_company_class')
+        batch_op.drop_column('xyz_class')
+        batch_op.drop_column('abc_class')
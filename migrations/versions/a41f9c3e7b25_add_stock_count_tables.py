@@ -0,0 +1,57 @@
+"""Add stock count tables
+
+Revision ID: a41f9c3e7b25
+Revises: 8d3b6f1a2c97
+Create Date: 2026-10-18 13:05:52.671840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f9c3e7b25'
+down_revision = '8d3b6f1a2c97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('reference', sa.String(length=100), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('line_count', sa.Integer(), nullable=True),
+    sa.Column('variance_line_count', sa.Integer(), nullable=True),
+    sa.Column('surplus_quantity', sa.Integer(), nullable=True),
+    sa.Column('shrinkage_quantity', sa.Integer(), nullable=True),
+    sa.Column('variance_value', sa.Float(), nullable=True),
+    sa.Column('counted_by', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_counts_company_id'), 'stock_counts', ['company_id'], unique=False)
+    op.create_table('stock_count_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stock_count_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('expected_quantity', sa.Integer(), nullable=False),
+    sa.Column('counted_quantity', sa.Integer(), nullable=False),
+    sa.Column('variance', sa.Integer(), nullable=False),
+    sa.Column('unit_cost', sa.Float(), nullable=True),
+    sa.Column('variance_value', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['stock_count_id'], ['stock_counts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_count_lines_stock_count_id'), 'stock_count_lines', ['stock_count_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stock_count_lines_stock_count_id'), table_name='stock_count_lines')
+    op.drop_table('stock_count_lines')
+    op.drop_index(op.f('ix_stock_counts_company_id'), table_name='stock_counts')
+    op.drop_table('stock_counts')
@@ -0,0 +1,43 @@
+"""Add stock_movement_daily rollup
+
+Revision ID: c7e2d94b1f08
+Revises: a41f9c3e7b25
+Create Date: 2026-10-18 14:22:09.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2d94b1f08'
+down_revision = 'a41f9c3e7b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_movement_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('movement_type', sa.String(length=50), nullable=False),
+    sa.Column('movement_count', sa.Integer(), nullable=False),
+    sa.Column('quantity_in', sa.Integer(), nullable=False),
+    sa.Column('quantity_out', sa.Integer(), nullable=False),
+    sa.Column('net_quantity', sa.Integer(), nullable=False),
+    sa.Column('closing_quantity', sa.Integer(), nullable=True),
+    sa.Column('last_movement_at', sa.DateTime(), nullable=True),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'day', 'movement_type', name='uq_stock_movement_daily')
+    )
+    op.create_index('ix_stock_movement_daily_company_day', 'stock_movement_daily', ['company_id', 'day'], unique=False)
+    # Existing history is loaded with: python backfill_stock_rollup.py
+
+
+def downgrade():
+    op.drop_index('ix_stock_movement_daily_company_day', table_name='stock_movement_daily')
+    op.drop_table('stock_movement_daily')
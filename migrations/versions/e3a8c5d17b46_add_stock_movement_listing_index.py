@@ -0,0 +1,26 @@
+"""Add stock movement listing index
+
+Revision ID: e3a8c5d17b46
+Revises: c7e2d94b1f08
+Create Date: 2026-10-18 16:05:41.207734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8c5d17b46'
+down_revision = 'c7e2d94b1f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pages of the movement history seek on (created_at, id) within a company
+    op.create_index('ix_stock_movements_company_created', 'stock_movements',
+                    ['company_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_movements_company_created', table_name='stock_movements')
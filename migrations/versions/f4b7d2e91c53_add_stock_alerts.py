@@ -0,0 +1,56 @@
+"""Add stock_alerts low-stock set
+
+Revision ID: f4b7d2e91c53
+Revises: e3a8c5d17b46
+Create Date: 2026-10-18 17:12:30.644180
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b7d2e91c53'
+down_revision = 'e3a8c5d17b46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('raised_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id')
+    )
+    op.create_index('ix_stock_alerts_company_status', 'stock_alerts', ['company_id', 'status'], unique=False)
+
+    # Seed the set from current stock; the product write hooks keep it current from here
+    products = sa.table('products', sa.column('id', sa.Integer), sa.column('company_id', sa.Integer),
+                        sa.column('quantity', sa.Integer), sa.column('reorder_level', sa.Integer),
+                        sa.column('is_active', sa.Boolean))
+    alerts = sa.table('stock_alerts', sa.column('product_id', sa.Integer), sa.column('status', sa.String),
+                      sa.column('raised_at', sa.DateTime), sa.column('updated_at', sa.DateTime),
+                      sa.column('company_id', sa.Integer))
+    op.execute(alerts.insert().from_select(
+        ['product_id', 'status', 'raised_at', 'updated_at', 'company_id'],
+        sa.select(
+            products.c.id,
+            sa.case((products.c.quantity <= 0, 'out_of_stock'), else_='low_stock'),
+            sa.func.now(), sa.func.now(), products.c.company_id
+        ).where(
+            products.c.is_active == sa.true(),
+            sa.or_(products.c.quantity <= 0, products.c.quantity <= products.c.reorder_level)
+        )
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_stock_alerts_company_status', table_name='stock_alerts')
+    op.drop_table('stock_alerts')
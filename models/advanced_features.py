@@ -140,10 +140,15 @@ class PriceRecommendation(db.Model):
         # Simplified AI pricing algorithm
         base_markup = 1.4  # 40% markup
         
-        # Adjust based on sales velocity
-        if sales_data.get('velocity', 0) > 10:  # Fast moving
+        # Adjust based on sales velocity; the nightly demand forecast's band is
+        # relative to the tenant's own catalogue, the unit thresholds are the fallback
+        band = sales_data.get('velocity_band')
+        if band is None:
+            velocity = sales_data.get('velocity', 0)
+            band = 'fast' if velocity > 10 else 'slow' if velocity < 2 else 'normal'
+        if band == 'fast':
             recommended_markup = base_markup * 1.1
-        elif sales_data.get('velocity', 0) < 2:  # Slow moving
+        elif band == 'slow':
             recommended_markup = base_markup * 0.9
         else:
             recommended_markup = base_markup
@@ -2,16 +2,25 @@
 RESTful API Framework for RahaSoft ERP
 Provides enterprise-grade API endpoints for third-party integrations
 """
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app
 from flask_restful import Api, Resource, reqparse
+from flask_restful.utils import unpack
 from functools import wraps
 import jwt
 import hashlib
 import secrets
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response as ResponseBase
 from extensions import db
 from models.user import User
 from models.company import Company
+from models.product import Product
+from models.crm import Customer
+from models.finance import Invoice
+from utils.cache_manager import APIResponseCache, CacheConfig
 
 # Create API Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
@@ -173,6 +182,10 @@ def api_auth_required(permissions=None):
             g.company = key_record.company
             g.user = key_record.user
             
+            # Conditional and cached responses are only served once the caller is known
+            resource = args[0] if args else None
+            if isinstance(resource, BaseAPIResource):
+                return resource.dispatch_authenticated(f, args, kwargs)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -269,7 +282,18 @@ class APIResponse:
 
 # Base API Resource with common functionality
 class BaseAPIResource(Resource):
-    """Base class for API resources"""
+    """
+    Base class for API resources
+    
+    GETs of a resource that lists its cache_tables get a strong ETag derived from
+    the tenant's version of those tables and the request URL. A matching
+    If-None-Match (or an If-Modified-Since no older than the last write) is
+    answered 304 before the handler runs, and 200 responses are kept serialized
+    under their ETag so a repeat poll is served without querying.
+    """
+    
+    cache_tables = ()  # Tables whose writes change this resource's GET responses
+    cache_ttl = CacheConfig.TTL_MEDIUM
     
     def dispatch_request(self, *args, **kwargs):
         """Override to add logging and error handling"""
@@ -277,7 +301,10 @@ class BaseAPIResource(Resource):
         
         try:
             response = super().dispatch_request(*args, **kwargs)
-            status_code = getattr(response, 'status_code', 200)
+            if isinstance(response, tuple):
+                status_code = unpack(response)[1]
+            else:
+                status_code = getattr(response, 'status_code', 200)
             
             # Log successful requests
             if hasattr(g, 'api_key'):
@@ -310,6 +337,47 @@ class BaseAPIResource(Resource):
                 code="INTERNAL_ERROR",
                 status_code=500
             )
+    
+    def dispatch_authenticated(self, handler, args, kwargs):
+        """Run an authenticated handler, answering GETs from validators or the response cache where possible"""
+        if request.method not in ('GET', 'HEAD') or not self.cache_tables:
+            return handler(*args, **kwargs)
+        
+        company_id = g.company.id
+        versions = APIResponseCache.data_versions(company_id, self.cache_tables)
+        if versions is None:
+            return handler(*args, **kwargs)
+        version, modified = versions
+        etag = hashlib.sha256(
+            f"{company_id}|{request.path}|{sorted(request.args.items(multi=True))}|{version}".encode()
+        ).hexdigest()[:32]
+        last_modified = datetime.fromtimestamp(modified, timezone.utc)
+        
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return self._with_validators(current_app.response_class(status=304), etag, last_modified)
+        
+        cached = APIResponseCache.get_response(company_id, etag)
+        if cached is not None:
+            response = current_app.response_class(cached['body'], status=200, mimetype='application/json')
+            return self._with_validators(response, etag, last_modified)
+        
+        result = handler(*args, **kwargs)
+        if isinstance(result, ResponseBase):
+            return result
+        data, status_code, headers = unpack(result)
+        response = api.make_response(data, status_code, headers=headers)
+        if status_code != 200:
+            return response
+        APIResponseCache.set_response(company_id, etag, response.get_data(as_text=True), modified, ttl=self.cache_ttl)
+        return self._with_validators(response, etag, last_modified)
+    
+    @staticmethod
+    def _with_validators(response, etag, last_modified):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Clients may keep the body but must revalidate it on every use
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 # Webhook Support
@@ -406,9 +474,8 @@ class DataImportJob(db.Model):
         if failed is not None:
             self.failed_records = failed
         if errors:
-            if not self.error_log:
-                self.error_log = []
-            self.error_log.extend(errors)
+            # Reassign rather than extend so the JSON column is flagged as changed
+            self.error_log = (self.error_log or []) + list(errors)
         
         # Update status
         if self.processed_records >= self.total_records:
@@ -444,3 +511,41 @@ class IntegrationConfig(db.Model):
     
     # Relationships
     company = db.relationship('Company', backref='integrations')
+
+
+# Data versions behind the cached API responses, by the models whose writes change them
+API_TABLES_BY_MODEL = {
+    Product: 'products',
+    Customer: 'customers',
+    Invoice: 'invoices',
+}
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_api_writes(session, flush_context):
+    """Note which tenants' API tables this transaction wrote through the ORM."""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = API_TABLES_BY_MODEL.get(type(obj))
+        company_id = getattr(obj, 'company_id', None) if table else None
+        if company_id is not None:
+            session.info.setdefault('api_changed_tables', {}).setdefault(company_id, set()).add(table)
+
+
+def _bump_api_versions(session):
+    """Give every table written in the committed transaction a new version."""
+    changed = session.info.pop('api_changed_tables', {})
+    # Bulk imports and stock postings write products through Core; only these marks record them
+    for mark in ('inventory_changed_companies', 'product_lookup_stale'):
+        for company_id in session.info.get(mark, ()):
+            changed.setdefault(company_id, set()).add('products')
+    for company_id, tables in changed.items():
+        APIResponseCache.bump_versions(company_id, sorted(tables))
+
+
+# Inserted ahead of the product hooks, which pop the inventory marks after commit
+event.listen(Session, 'after_commit', _bump_api_versions, insert=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_api_writes(session):
+    session.info.pop('api_changed_tables', None)
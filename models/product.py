@@ -1,9 +1,16 @@
 from models import db
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, case, event, DDL, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_company_name', 'company_id', 'product_name'),
+        db.Index('ix_products_company_class', 'company_id', 'abc_class', 'xyz_class'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_code = db.Column(db.String(100), unique=True, nullable=False)
@@ -27,6 +34,9 @@ class Product(db.Model):
     reviews_count = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     tax_rate = db.Column(db.Float, default=0.0)  # Tax percentage
+    stock_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped by every ledger write
+    abc_class = db.Column(db.String(1), nullable=True)  # Revenue contribution class, set by the catalogue classifier
+    xyz_class = db.Column(db.String(1), nullable=True)  # Weekly demand variability class
     
     # Timestamps
     created_at = db.Column(db.DateTime, server_default=db.func.now())
@@ -112,6 +122,16 @@ class Product(db.Model):
         else:
             return 'normal'
 
+    @classmethod
+    def stock_status_expression(cls):
+        """SQL CASE expression mirroring get_stock_status() for aggregate queries."""
+        return case(
+            (cls.quantity <= 0, 'out_of_stock'),
+            (cls.quantity <= cls.reorder_level, 'low_stock'),
+            (cls.quantity > cls.max_stock_level, 'overstocked'),
+            else_='normal'
+        )
+
     def get_turnover_rate(self):
         """Calculate inventory turnover rate (sold / average stock)."""
         if self.quantity == 0:
@@ -120,17 +140,18 @@ class Product(db.Model):
 
     @classmethod
     def get_low_stock_products(cls, company_id):
-        """Get all products with low stock for a company."""
-        return cls.query.filter_by(company_id=company_id).filter(
-            cls.quantity <= cls.reorder_level
-        ).filter_by(is_active=True).all()
+        """Get all products at or below their reorder level, read from the low-stock set."""
+        return cls.query.join(StockAlert, StockAlert.product_id == cls.id).filter(
+            StockAlert.company_id == company_id
+        ).all()
 
     @classmethod
     def get_out_of_stock_products(cls, company_id):
-        """Get all out of stock products for a company."""
-        return cls.query.filter_by(company_id=company_id).filter(
-            cls.quantity <= 0
-        ).filter_by(is_active=True).all()
+        """Get all out of stock products for a company, read from the low-stock set."""
+        return cls.query.join(StockAlert, StockAlert.product_id == cls.id).filter(
+            StockAlert.company_id == company_id,
+            StockAlert.status == 'out_of_stock'
+        ).all()
 
     @classmethod
     def get_expiring_products(cls, company_id, days=30):
@@ -141,13 +162,39 @@ class Product(db.Model):
             cls.expiry_date <= cutoff_date
         ).filter_by(is_active=True).all()
 
+    @classmethod
+    def get_stock_summary(cls, company_id):
+        """Count products and sum stock value per stock status in one GROUP BY query."""
+        statuses = db.session.query(
+            cls.stock_status_expression().label('status'),
+            cls.quantity,
+            cls.price,
+            cls.cost_price
+        ).filter(
+            cls.company_id == company_id,
+            cls.is_active == True
+        ).subquery()
+
+        rows = db.session.query(
+            statuses.c.status,
+            func.count(),
+            func.sum(func.coalesce(statuses.c.cost_price, 0) * statuses.c.quantity),
+            func.sum(statuses.c.price * statuses.c.quantity)
+        ).group_by(statuses.c.status).all()
+
+        summary = {'total_products': 0, 'cost_value': 0.0, 'retail_value': 0.0}
+        summary.update({field: 0 for field in InventoryValuation.STATUS_COUNT_FIELDS.values()})
+        for status, count, cost_value, retail_value in rows:
+            summary[InventoryValuation.STATUS_COUNT_FIELDS[status]] = count
+            summary['total_products'] += count
+            summary['cost_value'] += float(cost_value or 0)
+            summary['retail_value'] += float(retail_value or 0)
+        return summary
+
     @classmethod
     def get_inventory_value(cls, company_id):
-        """Get total inventory value for a company."""
-        products = cls.query.filter_by(company_id=company_id).filter_by(is_active=True).all()
-        total_cost = sum(p.get_total_value() for p in products)
-        total_retail = sum(p.get_retail_value() for p in products)
-        return {'cost_value': total_cost, 'retail_value': total_retail}
+        """Get total inventory value for a company from its valuation summary."""
+        return InventoryValuation.for_company(company_id).to_dict()
 
     def __repr__(self):
         return f"<Product {self.product_code} - {self.product_name}>"
@@ -156,6 +203,9 @@ class Product(db.Model):
 class StockMovement(db.Model):
     """Track all stock movements for audit and history"""
     __tablename__ = 'stock_movements'
+    __table_args__ = (
+        db.Index('ix_stock_movements_company_created', 'company_id', 'created_at', 'id'),  # listing page key
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -175,6 +225,998 @@ class StockMovement(db.Model):
         return f"<StockMovement {self.movement_type} {self.quantity} units>"
 
 
+class StockMovementDaily(db.Model):
+    """Per-product, per-type movement totals for one day, maintained as movements are written"""
+    __tablename__ = 'stock_movement_daily'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'day', 'movement_type', name='uq_stock_movement_daily'),
+        db.Index('ix_stock_movement_daily_company_day', 'company_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    movement_type = db.Column(db.String(50), nullable=False)
+    movement_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity_in = db.Column(db.Integer, nullable=False, default=0)
+    quantity_out = db.Column(db.Integer, nullable=False, default=0)
+    net_quantity = db.Column(db.Integer, nullable=False, default=0)
+    closing_quantity = db.Column(db.Integer, nullable=True)  # Stock after the day's last movement of this type
+    last_movement_at = db.Column(db.DateTime, nullable=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+
+    product = db.relationship('Product', backref=db.backref(
+        'daily_movements', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True))
+
+    COUNTER_FIELDS = ('movement_count', 'quantity_in', 'quantity_out', 'net_quantity')
+
+    @classmethod
+    def record(cls, session, movements):
+        """Fold newly written movements (dicts of StockMovement columns) into their daily rows."""
+        buckets = {}
+        for movement in movements:
+            created_at = movement.get('created_at') or datetime.utcnow()
+            key = (movement['product_id'], created_at.date(), movement['movement_type'])
+            # new - previous is the true signed change whatever sign convention `quantity` used
+            change = movement['new_quantity'] - movement['previous_quantity']
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    'product_id': key[0], 'day': key[1], 'movement_type': key[2],
+                    'company_id': movement['company_id'], 'movement_count': 0,
+                    'quantity_in': 0, 'quantity_out': 0, 'net_quantity': 0,
+                    'closing_quantity': None, 'last_movement_at': None,
+                }
+            bucket['movement_count'] += 1
+            bucket['quantity_in'] += max(change, 0)
+            bucket['quantity_out'] += max(-change, 0)
+            bucket['net_quantity'] += change
+            if bucket['last_movement_at'] is None or created_at >= bucket['last_movement_at']:
+                bucket['closing_quantity'] = movement['new_quantity']
+                bucket['last_movement_at'] = created_at
+        if buckets:
+            cls._upsert(session, list(buckets.values()))
+
+    @classmethod
+    def _upsert(cls, session, rows):
+        table = cls.__table__
+        dialect = session.get_bind().dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            for row in rows:
+                cls._update_or_insert(session, row)
+            return
+
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table)
+        excluded = statement.excluded
+        is_later = excluded.last_movement_at >= table.c.last_movement_at
+        changes = {field: table.c[field] + excluded[field] for field in cls.COUNTER_FIELDS}
+        changes['closing_quantity'] = case((is_later, excluded.closing_quantity), else_=table.c.closing_quantity)
+        changes['last_movement_at'] = case((is_later, excluded.last_movement_at), else_=table.c.last_movement_at)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['product_id', 'day', 'movement_type'], set_=changes
+        ), rows)
+
+    @classmethod
+    def _update_or_insert(cls, session, row):
+        table = cls.__table__
+        is_later = table.c.last_movement_at <= row['last_movement_at']
+        changes = {field: table.c[field] + row[field] for field in cls.COUNTER_FIELDS}
+        changes['closing_quantity'] = case((is_later, row['closing_quantity']), else_=table.c.closing_quantity)
+        changes['last_movement_at'] = case((is_later, row['last_movement_at']), else_=table.c.last_movement_at)
+        updated = session.execute(table.update().where(
+            table.c.product_id == row['product_id'],
+            table.c.day == row['day'],
+            table.c.movement_type == row['movement_type']
+        ).values(**changes)).rowcount
+        if not updated:
+            session.execute(table.insert().values(**row))
+
+    @classmethod
+    def rebuild(cls, company_id):
+        """Recompute a company's rollup from raw movement history (used by the backfill)."""
+        movements = StockMovement.__table__
+        day = func.date(movements.c.created_at)
+        change = movements.c.new_quantity - movements.c.previous_quantity
+        ranked = db.select(
+            movements.c.product_id, movements.c.company_id, movements.c.movement_type,
+            movements.c.new_quantity, movements.c.created_at, day.label('day'), change.label('change'),
+            func.row_number().over(
+                partition_by=(movements.c.product_id, day, movements.c.movement_type),
+                order_by=(movements.c.created_at.desc(), movements.c.id.desc())
+            ).label('position')
+        ).where(movements.c.company_id == company_id).subquery()
+
+        totals = db.select(
+            ranked.c.product_id, ranked.c.day, ranked.c.movement_type,
+            func.count(),
+            func.sum(case((ranked.c.change > 0, ranked.c.change), else_=0)),
+            func.sum(case((ranked.c.change < 0, -ranked.c.change), else_=0)),
+            func.sum(ranked.c.change),
+            func.max(case((ranked.c.position == 1, ranked.c.new_quantity))),
+            func.max(ranked.c.created_at),
+            ranked.c.company_id
+        ).group_by(ranked.c.product_id, ranked.c.day, ranked.c.movement_type, ranked.c.company_id)
+
+        table = cls.__table__
+        db.session.execute(table.delete().where(table.c.company_id == company_id))
+        db.session.execute(table.insert().from_select(
+            ['product_id', 'day', 'movement_type', 'movement_count', 'quantity_in', 'quantity_out',
+             'net_quantity', 'closing_quantity', 'last_movement_at', 'company_id'],
+            totals
+        ))
+        db.session.commit()
+
+    @classmethod
+    def daily_series(cls, product_id, since):
+        """One point per day from `since`: closing stock plus the day's in/out totals."""
+        rows = cls.query.filter(cls.product_id == product_id, cls.day >= since).order_by(
+            cls.day, cls.last_movement_at
+        ).all()
+        series = {}
+        for row in rows:
+            point = series.setdefault(row.day, {'date': row.day.strftime('%Y-%m-%d'), 'in': 0, 'out': 0})
+            point['in'] += row.quantity_in
+            point['out'] += row.quantity_out
+            # Rows are ordered by time, so the last one seen holds the day's closing stock
+            point['quantity'] = row.closing_quantity
+            point['movement_type'] = row.movement_type
+        return list(series.values())
+
+    @classmethod
+    def summary_by_type(cls, company_id, since):
+        """Movement counts and net quantity per type from `since`, read from the rollup."""
+        return db.session.query(
+            cls.movement_type,
+            func.sum(cls.movement_count).label('count'),
+            func.sum(cls.net_quantity).label('total_quantity')
+        ).filter(
+            cls.company_id == company_id,
+            cls.day >= since
+        ).group_by(cls.movement_type).all()
+
+
+class StockCount(db.Model):
+    """A submitted cycle count (stock take) with its variance totals"""
+    __tablename__ = 'stock_counts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    reference = db.Column(db.String(100), nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), default='posted')  # posted, no_variance
+    line_count = db.Column(db.Integer, default=0)
+    variance_line_count = db.Column(db.Integer, default=0)
+    surplus_quantity = db.Column(db.Integer, default=0)     # Counted above system stock
+    shrinkage_quantity = db.Column(db.Integer, default=0)   # Counted below system stock
+    variance_value = db.Column(db.Float, default=0.0)       # Net variance at cost
+    counted_by = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+
+    lines = db.relationship('StockCountLine', backref='stock_count', lazy='dynamic',
+                            cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'reference': self.reference,
+            'status': self.status,
+            'line_count': self.line_count,
+            'variance_line_count': self.variance_line_count,
+            'surplus_quantity': self.surplus_quantity,
+            'shrinkage_quantity': self.shrinkage_quantity,
+            'variance_value': round(self.variance_value or 0.0, 2),
+            'counted_by': self.counted_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f"<StockCount {self.id} lines={self.line_count} variances={self.variance_line_count}>"
+
+
+class StockCountLine(db.Model):
+    """One counted product within a StockCount"""
+    __tablename__ = 'stock_count_lines'
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_count_id = db.Column(db.Integer, db.ForeignKey('stock_counts.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    expected_quantity = db.Column(db.Integer, nullable=False)  # System stock when the count was posted
+    counted_quantity = db.Column(db.Integer, nullable=False)
+    variance = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=True)
+    variance_value = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'expected_quantity': self.expected_quantity,
+            'counted_quantity': self.counted_quantity,
+            'variance': self.variance,
+            'variance_value': self.variance_value
+        }
+
+
+# Full-text product search indexes, created alongside the products table.
+# PostgreSQL gets trigram GIN indexes; SQLite gets an FTS5 table kept in sync by triggers.
+PRODUCT_SEARCH_DDL = {
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (product_name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_products_code_trgm ON products USING gin (product_code gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_products_barcode_trgm ON products USING gin (barcode gin_trgm_ops)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "product_name, product_code, barcode, brand, company_id, "
+        "content='products', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, product_name, product_code, barcode, brand, company_id) "
+        "VALUES (new.id, new.product_name, new.product_code, new.barcode, new.brand, new.company_id); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name, product_code, barcode, brand, company_id) "
+        "VALUES ('delete', old.id, old.product_name, old.product_code, old.barcode, old.brand, old.company_id); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_au "
+        "AFTER UPDATE OF product_name, product_code, barcode, brand, company_id ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name, product_code, barcode, brand, company_id) "
+        "VALUES ('delete', old.id, old.product_name, old.product_code, old.barcode, old.brand, old.company_id); "
+        "INSERT INTO products_fts(rowid, product_name, product_code, barcode, brand, company_id) "
+        "VALUES (new.id, new.product_name, new.product_code, new.barcode, new.brand, new.company_id); END",
+    ],
+}
+
+for _dialect, _statements in PRODUCT_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Product.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+
+
+def stock_status_for(quantity, reorder_level, max_stock_level):
+    """Classify a stock level the same way as Product.stock_status_expression()."""
+    quantity = quantity or 0
+    if quantity <= 0:
+        return 'out_of_stock'
+    if reorder_level is not None and quantity <= reorder_level:
+        return 'low_stock'
+    if max_stock_level is not None and quantity > max_stock_level:
+        return 'overstocked'
+    return 'normal'
+
+
+class InventoryValuation(db.Model):
+    """Per-company inventory valuation summary, kept current on every product write"""
+    __tablename__ = 'inventory_valuations'
+
+    STATUS_COUNT_FIELDS = {
+        'out_of_stock': 'out_of_stock_count',
+        'low_stock': 'low_stock_count',
+        'overstocked': 'overstocked_count',
+        'normal': 'normal_count',
+    }
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, unique=True, index=True)
+    cost_value = db.Column(db.Float, nullable=False, default=0.0)
+    retail_value = db.Column(db.Float, nullable=False, default=0.0)
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    out_of_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    low_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    overstocked_count = db.Column(db.Integer, nullable=False, default=0)
+    normal_count = db.Column(db.Integer, nullable=False, default=0)
+    rebuilt_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def in_stock_count(self):
+        return self.total_products - self.out_of_stock_count
+
+    def to_dict(self):
+        return {
+            'cost_value': self.cost_value,
+            'retail_value': self.retail_value,
+            'total_products': self.total_products,
+            'in_stock_count': self.in_stock_count,
+            'out_of_stock_count': self.out_of_stock_count,
+            'low_stock_count': self.low_stock_count,
+            'overstocked_count': self.overstocked_count,
+            'normal_count': self.normal_count,
+        }
+
+    @classmethod
+    def for_company(cls, company_id):
+        """Return the company's summary row, building it from SQL if it is missing."""
+        summary = cls.query.filter_by(company_id=company_id).first()
+        if summary is None:
+            summary = cls.rebuild(company_id)
+        return summary
+
+    @classmethod
+    def compute(cls, company_id):
+        """Aggregate valuation and stock-status counts straight from the products table."""
+        return Product.get_stock_summary(company_id)
+
+    @classmethod
+    def rebuild(cls, company_id):
+        """
+        Recompute the summary row for a company from the products table and save it
+        in a short transaction of its own, so a read that finds the row missing
+        stores it for every later read without committing the caller's pending work.
+        """
+        values = cls.compute(company_id)
+        try:
+            with db.engine.begin() as connection:
+                cls._store(connection, company_id, values)
+        except IntegrityError:
+            pass  # Another worker built the row first; theirs is just as fresh
+        summary = cls.query.filter_by(company_id=company_id).first()
+        return summary if summary is not None else cls(company_id=company_id, **values)
+
+    @classmethod
+    def refresh(cls, session, company_id):
+        """Recompute the summary row for a company inside the caller's transaction."""
+        cls._store(session, company_id, cls.compute(company_id))
+
+    @classmethod
+    def seed(cls, session, company_id):
+        """Create the summary row for a newly flushed company, leaving an existing row alone."""
+        cls._store(session, company_id, cls.compute(company_id), replace=False)
+
+    @classmethod
+    def _store(cls, executor, company_id, values, replace=True):
+        """Insert a company's summary row, or overwrite the existing one when `replace` is set."""
+        table = cls.__table__
+        now = datetime.utcnow()
+        row = dict(values, company_id=company_id, rebuilt_at=now, updated_at=now)
+        dialect = executor.dialect.name if hasattr(executor, 'dialect') else executor.get_bind().dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            exists = executor.execute(
+                db.select(table.c.id).where(table.c.company_id == company_id)).first() is not None
+            if not exists:
+                executor.execute(table.insert().values(**row))
+            elif replace:
+                executor.execute(table.update().where(table.c.company_id == company_id).values(**row))
+            return
+
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table).values(**row)
+        if replace:
+            statement = statement.on_conflict_do_update(index_elements=['company_id'], set_={
+                field: statement.excluded[field] for field in row if field != 'company_id'})
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=['company_id'])
+        executor.execute(statement)
+
+    @classmethod
+    def apply_delta(cls, session, company_id, delta):
+        """
+        Add a valuation delta to the summary row inside the caller's transaction.
+        When the company has no row yet, it is built from SQL before this
+        transaction commits instead, so the delta is never lost.
+        """
+        table = cls.__table__
+        changes = {field: table.c[field] + amount for field, amount in delta.items() if amount}
+        if not changes:
+            return
+        changes['updated_at'] = datetime.utcnow()
+        updated = session.execute(table.update().where(table.c.company_id == company_id).values(**changes)).rowcount
+        if not updated:
+            cls.invalidate(session, company_id)
+
+    @classmethod
+    def invalidate(cls, session, company_id):
+        """Rebuild the summary row from SQL before the caller's transaction commits."""
+        session.info.setdefault('inventory_valuations_stale', set()).add(company_id)
+
+    @classmethod
+    def mark_stale(cls, session, company_id):
+        """Invalidate a company's summary after a bulk write that bypassed the ORM."""
+        cls.invalidate(session, company_id)
+        session.info.setdefault('inventory_changed_companies', set()).add(company_id)
+        # The barcode/SKU lookup cache and low-stock set cannot see Core writes either
+        session.info.setdefault('product_lookup_stale', set()).add(company_id)
+        session.info.setdefault('stock_alerts_stale', set()).add(company_id)
+        # Bulk writes are when a tenant's dashboards are worth warming again straight away
+        session.info.setdefault('dashboard_bulk_writes', set()).add(company_id)
+
+    def __repr__(self):
+        return f"<InventoryValuation company={self.company_id} cost={self.cost_value}>"
+
+
+class StockAlert(db.Model):
+    """Membership of the per-tenant low-stock set, changed only when stock crosses a threshold"""
+    __tablename__ = 'stock_alerts'
+    __table_args__ = (
+        db.Index('ix_stock_alerts_company_status', 'company_id', 'status'),
+    )
+
+    STATUSES = ('out_of_stock', 'low_stock')
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False)  # 'low_stock' or 'out_of_stock'
+    raised_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # When it entered the set
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+
+    @classmethod
+    def status_for(cls, values):
+        """Alert status for a snapshot of product fields, or None when it is outside the set."""
+        if values['is_active'] is False or values['company_id'] is None:
+            return None
+        status = stock_status_for(values['quantity'], values['reorder_level'], None)
+        return status if status in cls.STATUSES else None
+
+    @classmethod
+    def apply(cls, session, changes):
+        """Write set membership changes: dicts of product_id, company_id and status (None leaves)."""
+        table = cls.__table__
+        leaving = [change['product_id'] for change in changes if change['status'] is None]
+        now = datetime.utcnow()
+        entering = [
+            {'product_id': change['product_id'], 'company_id': change['company_id'],
+             'status': change['status'], 'raised_at': now, 'updated_at': now}
+            for change in changes if change['status'] is not None
+        ]
+        if leaving:
+            session.execute(table.delete().where(table.c.product_id.in_(leaving)))
+        if not entering:
+            return
+
+        dialect = session.get_bind().dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            for row in entering:
+                updated = session.execute(table.update().where(table.c.product_id == row['product_id']).values(
+                    status=row['status'], company_id=row['company_id'], updated_at=now)).rowcount
+                if not updated:
+                    session.execute(table.insert().values(**row))
+            return
+
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table)
+        # A low -> out change keeps raised_at: the product has needed reordering since then
+        session.execute(statement.on_conflict_do_update(index_elements=['product_id'], set_={
+            'status': statement.excluded.status,
+            'company_id': statement.excluded.company_id,
+            'updated_at': statement.excluded.updated_at,
+        }), entering)
+
+    @classmethod
+    def rebuild(cls, session, company_id):
+        """
+        Recompute a company's set from the products table inside the caller's
+        transaction. Only the difference is written, so members that stay keep their
+        raised_at, and products that entered or left get their reorder or cleared
+        event just as a threshold crossing through the ORM would.
+        """
+        table = cls.__table__
+        products = Product.__table__
+        columns = (products.c.id, products.c.company_id, products.c.product_code, products.c.product_name,
+                   products.c.quantity, products.c.reorder_level)
+        members = dict(session.execute(
+            db.select(table.c.product_id, table.c.status).where(table.c.company_id == company_id)
+        ).all())
+        status = case((products.c.quantity <= 0, 'out_of_stock'), else_='low_stock')
+        needing = session.execute(db.select(*columns, status.label('status')).where(
+            products.c.company_id == company_id,
+            products.c.is_active == True,
+            db.or_(products.c.quantity <= 0, products.c.quantity <= products.c.reorder_level)
+        )).all()
+
+        changes = []
+        events = []
+        for row in needing:
+            values = dict(row._mapping)
+            status = values.pop('status')
+            changes.append(_stock_alert_change(values, members.pop(values['id'], None), status, events))
+        if members:
+            # Left the set: restocked, reorder level lowered, deactivated or moved to another company
+            leaving = session.execute(db.select(*columns).where(products.c.id.in_(list(members)))).all()
+            for row in leaving:
+                values = dict(row._mapping, company_id=company_id)
+                changes.append(_stock_alert_change(values, members[values['id']], None, events))
+        _apply_stock_alert_changes(session, changes, events)
+
+    def __repr__(self):
+        return f"<StockAlert product={self.product_id} {self.status}>"
+
+
+class DemandForecast(db.Model):
+    """Latest nightly demand forecast and stocking levels for one product"""
+    __tablename__ = 'demand_forecasts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False, unique=True)
+    method = db.Column(db.String(20), nullable=False)  # 'ses' or 'moving_average'
+    daily_demand = db.Column(db.Float, nullable=False, default=0.0)  # Forecast units per day
+    demand_std = db.Column(db.Float, nullable=False, default=0.0)  # Std deviation of daily demand
+    safety_stock = db.Column(db.Float, nullable=False, default=0.0)
+    reorder_level = db.Column(db.Integer, nullable=False, default=0)  # Suggested reorder point
+    max_stock_level = db.Column(db.Integer, nullable=False, default=0)  # Suggested order-up-to level
+    velocity_band = db.Column(db.String(10), nullable=True)  # 'fast', 'normal' or 'slow' within the tenant
+    history_days = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+
+    product = db.relationship('Product', backref=db.backref(
+        'demand_forecast', uselist=False, cascade='all, delete-orphan', passive_deletes=True))
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'method': self.method,
+            'daily_demand': round(self.daily_demand, 3),
+            'demand_std': round(self.demand_std, 3),
+            'safety_stock': round(self.safety_stock, 2),
+            'reorder_level': self.reorder_level,
+            'max_stock_level': self.max_stock_level,
+            'velocity_band': self.velocity_band,
+            'history_days': self.history_days,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+    def __repr__(self):
+        return f"<DemandForecast product={self.product_id} {self.daily_demand:.2f}/day>"
+
+
+class CostLayer(db.Model):
+    """One receipt of stock at its unit cost; outbound movements consume layers oldest first"""
+    __tablename__ = 'cost_layers'
+    __table_args__ = (
+        db.Index('ix_cost_layers_product_open', 'product_id', 'remaining'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    movement_type = db.Column(db.String(50), nullable=True)  # Movement that received the stock; 'opening' when seeded
+    unit_cost = db.Column(db.Float, nullable=False, default=0.0)
+    quantity = db.Column(db.Integer, nullable=False)
+    remaining = db.Column(db.Integer, nullable=False)
+    start_position = db.Column(db.Integer, nullable=False, default=0)  # Units the product had received before this layer
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+
+    product = db.relationship('Product', backref=db.backref(
+        'cost_layers', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True))
+
+    def to_dict(self, remaining=None):
+        remaining = self.remaining if remaining is None else remaining
+        return {
+            'id': self.id,
+            'movement_type': self.movement_type,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'unit_cost': self.unit_cost,
+            'quantity': self.quantity,
+            'remaining': remaining,
+            'value': round(remaining * self.unit_cost, 2)
+        }
+
+    def __repr__(self):
+        return f"<CostLayer product={self.product_id} {self.remaining}/{self.quantity} @ {self.unit_cost}>"
+
+
+class ProductCost(db.Model):
+    """Running cost position of one product: cumulative receipts and cost of goods sold per method"""
+    __tablename__ = 'product_costs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False, unique=True)
+    units_in = db.Column(db.Integer, nullable=False, default=0)
+    units_out = db.Column(db.Integer, nullable=False, default=0)
+    cost_in = db.Column(db.Float, nullable=False, default=0.0)
+    cogs_fifo = db.Column(db.Float, nullable=False, default=0.0)
+    cogs_average = db.Column(db.Float, nullable=False, default=0.0)
+    average_cost = db.Column(db.Float, nullable=False, default=0.0)  # Weighted-average unit cost on hand
+    # Provisional cost charged for units issued beyond the stock on record, trued up by the next receipt
+    backlog_fifo_cost = db.Column(db.Float, nullable=False, default=0.0)
+    backlog_average_cost = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False, index=True)
+
+    product = db.relationship('Product', backref=db.backref(
+        'cost', uselist=False, cascade='all, delete-orphan', passive_deletes=True))
+
+    STATE_FIELDS = ('units_in', 'units_out', 'cost_in', 'cogs_fifo', 'cogs_average', 'average_cost',
+                    'backlog_fifo_cost', 'backlog_average_cost')
+
+    @property
+    def on_hand(self):
+        return self.units_in - self.units_out
+
+    def value(self, method='fifo'):
+        """Inventory value: everything received less everything issued under `method`."""
+        return self.cost_in - (self.cogs_fifo if method == 'fifo' else self.cogs_average)
+
+    def __repr__(self):
+        return f"<ProductCost product={self.product_id} on_hand={self.on_hand} avg={self.average_cost:.2f}>"
+
+
+class ProductCostDaily(db.Model):
+    """End-of-day copy of a product's cumulative cost position, written on days it moved"""
+    __tablename__ = 'product_cost_daily'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'day', name='uq_product_cost_daily'),
+        db.Index('ix_product_cost_daily_company_day', 'company_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    units_in = db.Column(db.Integer, nullable=False, default=0)
+    units_out = db.Column(db.Integer, nullable=False, default=0)
+    cost_in = db.Column(db.Float, nullable=False, default=0.0)
+    cogs_fifo = db.Column(db.Float, nullable=False, default=0.0)
+    cogs_average = db.Column(db.Float, nullable=False, default=0.0)
+    average_cost = db.Column(db.Float, nullable=False, default=0.0)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+
+    SNAPSHOT_FIELDS = ('units_in', 'units_out', 'cost_in', 'cogs_fifo', 'cogs_average', 'average_cost')
+
+    def __repr__(self):
+        return f"<ProductCostDaily product={self.product_id} {self.day}>"
+
+
+# Fields that feed a product's contribution to the valuation summary
+VALUATION_FIELDS = ('company_id', 'is_active', 'quantity', 'price', 'cost_price',
+                    'reorder_level', 'max_stock_level')
+
+
+def _valuation_contribution(values):
+    """Return (company_id, contribution dict) for a snapshot of product fields."""
+    if values['is_active'] is False or values['company_id'] is None:
+        return values['company_id'], {}
+    quantity = values['quantity'] or 0
+    status = stock_status_for(quantity, values['reorder_level'], values['max_stock_level'])
+    return values['company_id'], {
+        'cost_value': (values['cost_price'] or 0) * quantity,
+        'retail_value': (values['price'] or 0) * quantity,
+        'total_products': 1,
+        InventoryValuation.STATUS_COUNT_FIELDS[status]: 1,
+    }
+
+
+def _value_or_default(field, value):
+    """Resolve a pending insert's value, falling back to the column's scalar default."""
+    if value is not None:
+        return value
+    default = Product.__table__.c[field].default
+    return default.arg if default is not None and default.is_scalar else None
+
+
+def _merge_contribution(deltas, company_id, contribution, sign):
+    if company_id is None:
+        return
+    delta = deltas.setdefault(company_id, {})
+    for field, amount in contribution.items():
+        delta[field] = delta.get(field, 0) + sign * amount
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_inventory_valuation(session, flush_context, instances):
+    """Apply product inserts, edits and deletes to the valuation summary in the same transaction."""
+    deltas = {}
+    stale = set()
+
+    for product in session.new:
+        if isinstance(product, Product):
+            snapshot = {field: _value_or_default(field, getattr(product, field))
+                        for field in VALUATION_FIELDS}
+            _merge_contribution(deltas, *_valuation_contribution(snapshot), 1)
+
+    for product in session.deleted:
+        if isinstance(product, Product):
+            state = sa_inspect(product)
+            snapshot = {field: state.committed_state.get(field, getattr(product, field))
+                        for field in VALUATION_FIELDS}
+            if any(value is NO_VALUE for value in snapshot.values()):
+                stale.add(product.company_id)
+                continue
+            _merge_contribution(deltas, *_valuation_contribution(snapshot), -1)
+
+    for product in session.dirty:
+        if not isinstance(product, Product):
+            continue
+        state = sa_inspect(product)
+        if not any(field in state.committed_state for field in VALUATION_FIELDS):
+            continue
+        current = {field: getattr(product, field) for field in VALUATION_FIELDS}
+        previous = {field: state.committed_state.get(field, current[field]) for field in VALUATION_FIELDS}
+        if any(value is NO_VALUE for value in previous.values()):
+            stale.update({current['company_id'], previous['company_id']} - {None, NO_VALUE})
+            continue
+        _merge_contribution(deltas, *_valuation_contribution(previous), -1)
+        _merge_contribution(deltas, *_valuation_contribution(current), 1)
+
+    for company_id in stale:
+        InventoryValuation.invalidate(session, company_id)
+        deltas.pop(company_id, None)
+    for company_id, delta in deltas.items():
+        InventoryValuation.apply_delta(session, company_id, delta)
+
+    if stale or deltas:
+        session.info.setdefault('inventory_changed_companies', set()).update(stale, deltas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_stock_movements(session, flush_context):
+    """Add movements inserted through the ORM to the daily rollup and cost layers in the same transaction."""
+    movements = []
+    # Insertion order (by id) is the order cost layers are consumed in
+    for movement in sorted((obj for obj in session.new if isinstance(obj, StockMovement)), key=lambda m: m.id):
+        values = sa_inspect(movement).dict  # created_at may be a server default not loaded yet
+        movements.append({
+            'product_id': values['product_id'],
+            'company_id': values['company_id'],
+            'movement_type': values['movement_type'],
+            'previous_quantity': values.get('previous_quantity') or 0,
+            'new_quantity': values.get('new_quantity') or 0,
+            'unit_cost': values.get('unit_cost'),
+            'created_at': values.get('created_at'),
+        })
+    if movements:
+        StockMovementDaily.record(session, movements)
+        from utils.cost_layers import CostLayers
+        CostLayers.record(session, movements)
+
+
+@event.listens_for(Session, 'after_flush')
+def _seed_inventory_valuations(session, flush_context):
+    """Give every newly created company its valuation summary row."""
+    from models.company import Company
+    for company in session.new:
+        if isinstance(company, Company):
+            InventoryValuation.seed(session, company.id)
+
+
+def _rebuild_stale_inventory_valuations(session):
+    """Rebuild the summaries this transaction left stale or found missing."""
+    for company_id in session.info.pop('inventory_valuations_stale', ()):
+        InventoryValuation.refresh(session, company_id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _rebuild_inventory_valuations_after_flush(session, flush_context):
+    # The flushed products are in the table now; a row found missing is built with them
+    _rebuild_stale_inventory_valuations(session)
+
+
+@event.listens_for(Session, 'before_commit')
+def _rebuild_inventory_valuations_before_commit(session):
+    # Core writes marked stale since the last flush; the final flush's deltas land on the rebuilt row
+    _rebuild_stale_inventory_valuations(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_inventory_stats(session):
+    """Drop cached inventory statistics for every tenant whose stock changed."""
+    companies = session.info.pop('inventory_changed_companies', None)
+    if not companies:
+        return
+    from utils.inventory_stats import InventoryStats
+    for company_id in companies:
+        InventoryStats.invalidate(company_id)
+
+
+# Fields that feed the compact barcode/SKU lookup records served to the tills
+LOOKUP_FIELDS = ('company_id', 'is_active', 'product_code', 'barcode', 'product_name',
+                 'price', 'tax_rate', 'quantity')
+
+
+def _stage_lookup_change(session, company_id, remove=(), entries=None):
+    """Queue lookup-cache field removals and writes for one company until commit."""
+    staged = session.info.setdefault('product_lookup_changes', {}).setdefault(
+        company_id, {'remove': set(), 'set': {}})
+    for field in remove:
+        staged['set'].pop(field, None)
+        staged['remove'].add(field)
+    for field, record in (entries or {}).items():
+        staged['remove'].discard(field)
+        staged['set'][field] = record
+
+
+def pre_flush_values(state, fields):
+    """Field values as they were before this flush; NO_VALUE where they were never loaded."""
+    previous = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if history.deleted:
+            previous[field] = history.deleted[0]
+        elif field in state.committed_state:
+            previous[field] = state.committed_state[field]  # NO_VALUE if set while expired
+        else:
+            previous[field] = state.dict.get(field, NO_VALUE)
+    return previous
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_product_lookup(session, flush_context):
+    """Record which barcode/SKU lookup entries this flush added, changed or retired."""
+    from utils.cache_manager import ProductLookupCache
+
+    for product in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(product, Product):
+            continue
+        state = sa_inspect(product)
+        deleted = product in session.deleted
+        if not deleted and not any(state.attrs[field].history.has_changes() for field in LOOKUP_FIELDS):
+            continue
+
+        if product not in session.new:
+            # Drop the entries under the pre-flush codes, so renamed codes and moved products vanish
+            previous = pre_flush_values(state, ('company_id', 'product_code', 'barcode'))
+            if NO_VALUE in previous.values():
+                company_id = previous['company_id']
+                if company_id is NO_VALUE:
+                    company_id = product.company_id
+                session.info.setdefault('product_lookup_stale', set()).add(company_id)
+                continue
+            _stage_lookup_change(session, previous['company_id'], remove=ProductLookupCache.fields_for(
+                previous['product_code'], previous['barcode']))
+        if deleted:
+            continue
+
+        fields = ProductLookupCache.fields_for(product.product_code, product.barcode)
+        if product.is_active is False:
+            _stage_lookup_change(session, product.company_id, remove=fields)
+        else:
+            record = ProductLookupCache.record_for(product)
+            _stage_lookup_change(session, product.company_id, entries=dict.fromkeys(fields, record))
+
+
+# Fields that decide whether a product belongs in the low-stock set
+ALERT_FIELDS = ('company_id', 'is_active', 'quantity', 'reorder_level')
+
+
+def _stock_alert_change(values, previous_status, status, events):
+    """Return the set change for a product and queue its reorder or cleared event, if it crossed a threshold."""
+    if previous_status == status:
+        return None
+    events.append({
+        'event': 'reorder' if status else 'cleared',
+        'company_id': values['company_id'],
+        'product_id': values['id'],
+        'sku': values['product_code'],
+        'name': values['product_name'],
+        'quantity': values['quantity'],
+        'reorder_level': values['reorder_level'],
+        'previous_status': previous_status,
+        'status': status,
+        'occurred_at': datetime.utcnow().isoformat()
+    })
+    return {'product_id': values['id'], 'company_id': values['company_id'], 'status': status}
+
+
+def _apply_stock_alert_changes(session, changes, events):
+    changes = [change for change in changes if change is not None]
+    if changes:
+        StockAlert.apply(session, changes)
+    if events:
+        session.info.setdefault('stock_alert_events', []).extend(events)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_stock_alerts(session, flush_context):
+    """Move products in and out of the low-stock set as this flush crosses their thresholds."""
+    changes = []
+    events = []
+    pending = []
+    for product in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(product, Product):
+            continue
+        state = sa_inspect(product)
+        if product in session.deleted:
+            changes.append({'product_id': product.id, 'company_id': None, 'status': None})
+            continue
+        is_new = product in session.new
+        if not is_new and not any(state.attrs[field].history.has_changes() for field in ALERT_FIELDS):
+            continue
+
+        values = {field: _value_or_default(field, getattr(product, field))
+                  for field in ALERT_FIELDS + ('id', 'product_code', 'product_name')}
+        if is_new:
+            previous_status = None
+        else:
+            previous = pre_flush_values(state, ALERT_FIELDS)
+            previous_status = NO_VALUE if NO_VALUE in previous.values() else StockAlert.status_for(previous)
+        pending.append((values, previous_status))
+
+    # Fields assigned while expired have no history; the set itself says where they were
+    unknown = [values['id'] for values, previous_status in pending if previous_status is NO_VALUE]
+    members = {}
+    if unknown:
+        table = StockAlert.__table__
+        members = dict(session.execute(
+            db.select(table.c.product_id, table.c.status).where(table.c.product_id.in_(unknown))
+        ).all())
+    for values, previous_status in pending:
+        if previous_status is NO_VALUE:
+            previous_status = members.get(values['id'])
+        changes.append(_stock_alert_change(values, previous_status, StockAlert.status_for(values), events))
+    _apply_stock_alert_changes(session, changes, events)
+
+
+def track_stock_updates(session, changes):
+    """
+    Mirror the product flush hooks for quantity changes written with Core.
+    `changes` yields (row, delta) pairs, where each row holds the product's
+    columns after the update (see StockLedger); the previous quantity is
+    derived from the delta. Valuation deltas are summed and applied once per
+    company, and threshold crossings update the low-stock set.
+    """
+    from utils.cache_manager import ProductLookupCache
+
+    deltas = {}
+    alert_changes = []
+    alert_events = []
+    for row, delta in changes:
+        values = dict(row._mapping)
+        previous = dict(values, quantity=values['quantity'] - delta)
+        _merge_contribution(deltas, *_valuation_contribution(previous), -1)
+        _merge_contribution(deltas, *_valuation_contribution(values), 1)
+        alert_changes.append(_stock_alert_change(
+            values, StockAlert.status_for(previous), StockAlert.status_for(values), alert_events))
+
+        if values['is_active'] is not False:
+            fields = ProductLookupCache.fields_for(values['product_code'], values['barcode'])
+            record = ProductLookupCache.record_for(row)
+            _stage_lookup_change(session, values['company_id'], entries=dict.fromkeys(fields, record))
+
+    for company_id, delta in deltas.items():
+        InventoryValuation.apply_delta(session, company_id, delta)
+    if deltas:
+        session.info.setdefault('inventory_changed_companies', set()).update(deltas)
+    _apply_stock_alert_changes(session, alert_changes, alert_events)
+
+
+@event.listens_for(Session, 'after_commit')
+def _sync_product_lookup(session):
+    """Push committed product changes into the shared barcode/SKU lookup cache."""
+    changes = session.info.pop('product_lookup_changes', None)
+    stale = session.info.pop('product_lookup_stale', None)
+    if not changes and not stale:
+        return
+    from utils.cache_manager import ProductLookupCache
+    for company_id in stale or ():
+        ProductLookupCache.invalidate(company_id)
+    for company_id, staged in (changes or {}).items():
+        if company_id not in (stale or ()):
+            ProductLookupCache.apply(company_id, staged['remove'], staged['set'])
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_stale_stock_alerts(session):
+    """Rebuild the low-stock set of companies whose products were bulk-written with Core."""
+    for company_id in session.info.pop('stock_alerts_stale', ()):
+        StockAlert.rebuild(session, company_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_stock_alert_events(session):
+    """Hand committed reorder/cleared events to subscribers."""
+    events = session.info.pop('stock_alert_events', None)
+    if not events:
+        return
+    from utils.stock_alerts import StockAlerts
+    StockAlerts.dispatch(events)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_inventory_changes(session):
+    session.info.pop('inventory_changed_companies', None)
+    session.info.pop('product_lookup_changes', None)
+    session.info.pop('product_lookup_stale', None)
+    session.info.pop('stock_alerts_stale', None)
+    session.info.pop('inventory_valuations_stale', None)
+    session.info.pop('stock_alert_events', None)
+
+
 class Category(db.Model):
     """Product categories for better organization"""
     __tablename__ = 'categories'
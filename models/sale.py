@@ -1,6 +1,13 @@
 # models/sale.py
+from datetime import datetime
+
+from sqlalchemy import event, func
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
 
 from models import db  # ✅ Use shared SQLAlchemy instance
+from models.product import pre_flush_values
 
 class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -40,3 +47,162 @@ class Sale(db.Model):
 
     def __repr__(self):
         return f"<Sale {self.product_name} by {self.username}>"
+
+
+class ProductSalesDaily(db.Model):
+    """Units and revenue per product name for one day, maintained as sales are written"""
+    __tablename__ = 'product_sales_daily'
+    __table_args__ = (
+        db.UniqueConstraint('company_id', 'product_name', 'day', name='uq_product_sales_daily'),
+        db.Index('ix_product_sales_daily_company_day', 'company_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=False)
+    product_name = db.Column(db.String(100), nullable=False)  # Sales reference products by name
+    day = db.Column(db.Date, nullable=False)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    COUNTER_FIELDS = ('sale_count', 'units', 'revenue')
+    SALE_FIELDS = ('company_id', 'product_name', 'quantity', 'price', 'subtotal', 'total_amount',
+                   'timestamp', 'date_created')
+
+    @staticmethod
+    def contribution(values):
+        """(company_id, product_name, day) key and counters one sale adds, or None if it is not ranked."""
+        if values.get('company_id') is None or not values.get('product_name'):
+            return None
+        sold_at = values.get('date_created') or values.get('timestamp') or datetime.utcnow()
+        quantity = values.get('quantity') or 0
+        revenue = values.get('total_amount')
+        if revenue is None:
+            revenue = values.get('subtotal')
+        if revenue is None:
+            revenue = (values.get('price') or 0) * quantity
+        return (values['company_id'], values['product_name'], sold_at.date()), (1, quantity, revenue)
+
+    @classmethod
+    def record(cls, session, sales, sign=1):
+        """Fold sales (dicts of Sale columns) into their daily rows; sign=-1 takes them back out."""
+        buckets = {}
+        for values in sales:
+            contribution = cls.contribution(values)
+            if contribution is None:
+                continue
+            key, counters = contribution
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    'company_id': key[0], 'product_name': key[1], 'day': key[2],
+                    'sale_count': 0, 'units': 0, 'revenue': 0.0,
+                }
+            for field, value in zip(cls.COUNTER_FIELDS, counters):
+                bucket[field] += sign * value
+        if buckets:
+            cls._apply(session, list(buckets.values()))
+
+    @classmethod
+    def _apply(cls, session, rows):
+        table = cls.__table__
+        dialect = session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            statement = upsert(table)
+            changes = {field: table.c[field] + statement.excluded[field] for field in cls.COUNTER_FIELDS}
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['company_id', 'product_name', 'day'], set_=changes
+            ), rows)
+        else:
+            for row in rows:
+                updated = session.execute(table.update().where(
+                    table.c.company_id == row['company_id'],
+                    table.c.product_name == row['product_name'],
+                    table.c.day == row['day']
+                ).values(**{field: table.c[field] + row[field] for field in cls.COUNTER_FIELDS})).rowcount
+                if not updated:
+                    session.execute(table.insert().values(**row))
+
+        # Days whose sales were all edited away or deleted drop out of the ranking
+        if any(row['sale_count'] < 0 for row in rows):
+            companies = {row['company_id'] for row in rows}
+            session.execute(table.delete().where(table.c.company_id.in_(companies), table.c.sale_count <= 0))
+
+    @classmethod
+    def rebuild(cls, company_id, session=None):
+        """Recompute a company's rollup from the sales table; the caller commits."""
+        session = session or db.session
+        sales = Sale.__table__
+        day = func.date(func.coalesce(sales.c.date_created, sales.c.timestamp))
+        revenue = func.coalesce(sales.c.total_amount, sales.c.subtotal,
+                                sales.c.price * sales.c.quantity, 0)
+        totals = db.select(
+            sales.c.company_id, sales.c.product_name, day,
+            func.count(), func.coalesce(func.sum(sales.c.quantity), 0), func.sum(revenue)
+        ).where(
+            sales.c.company_id == company_id,
+            sales.c.product_name.isnot(None),
+            sales.c.product_name != '',
+            day.isnot(None)
+        ).group_by(sales.c.company_id, sales.c.product_name, day)
+
+        table = cls.__table__
+        session.execute(table.delete().where(table.c.company_id == company_id))
+        session.execute(table.insert().from_select(
+            ['company_id', 'product_name', 'day', 'sale_count', 'units', 'revenue'], totals
+        ))
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_sales(session, flush_context):
+    """Keep the daily sales rollup in step with sales written, edited or deleted through the ORM."""
+    added = []
+    removed = []
+    stale = set()
+    for sale in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(sale, Sale):
+            continue
+        state = sa_inspect(sale)
+        if sale in session.new:
+            added.append(dict(state.dict))  # date_created may be a server default not loaded yet
+            continue
+        deleted = sale in session.deleted
+        if not deleted and not any(state.attrs[field].history.has_changes()
+                                   for field in ProductSalesDaily.SALE_FIELDS):
+            continue
+        previous = pre_flush_values(state, ProductSalesDaily.SALE_FIELDS)
+        if any(value is NO_VALUE for value in previous.values()):
+            # Changed or deleted without its old values loaded: recount the company before commit
+            stale.update(value for value in (previous['company_id'], state.dict.get('company_id'))
+                         if value not in (None, NO_VALUE))
+            continue
+        removed.append(previous)
+        if not deleted:
+            added.append(dict(previous, **{field: state.dict.get(field) for field in ProductSalesDaily.SALE_FIELDS
+                                           if field in state.dict}))
+
+    if removed:
+        ProductSalesDaily.record(session, removed, sign=-1)
+    if added:
+        ProductSalesDaily.record(session, added)
+    if stale:
+        session.info.setdefault('sales_rollup_stale', set()).update(stale)
+
+
+@event.listens_for(Session, 'before_commit')
+def _rebuild_stale_sales_rollup(session):
+    """Recount companies whose sales changed without their previous values loaded."""
+    # commit() only flushes after this hook, and the flush is what marks companies stale
+    if any(isinstance(obj, Sale) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.flush()
+    for company_id in session.info.pop('sales_rollup_stale', ()):
+        ProductSalesDaily.rebuild(company_id, session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_sales_rollup_changes(session):
+    session.info.pop('sales_rollup_stale', None)
@@ -108,15 +108,11 @@ class APIKeyManagementResource(BaseAPIResource):
 class CustomersAPIResource(BaseAPIResource):
     """Customer management API"""
     
+    cache_tables = ('customers',)
+    
     @api_auth_required(['read'])
     def get(self, customer_id=None):
-        """Get customers or specific customer"""
-        # Check cache first
-        cache_key = f"customers:{g.company.id}:{customer_id or 'all'}"
-        cached_data = APIResponseCache.get_api_response('customers', request.args, g.company.id)
-        if cached_data:
-            return cached_data
-        
+        """Get customers or specific customer (conditional and cached by BaseAPIResource)"""
         if customer_id:
             customer = Customer.query.filter_by(
                 id=customer_id,
@@ -140,9 +136,7 @@ class CustomersAPIResource(BaseAPIResource):
                 'updated_at': customer.updated_at.isoformat() if customer.updated_at else None
             }
             
-            response = APIResponse.success(data)
-            APIResponseCache.set_api_response('customers', request.args, g.company.id, response)
-            return response
+            return APIResponse.success(data)
         
         else:
             # List customers with pagination
@@ -171,15 +165,12 @@ class CustomersAPIResource(BaseAPIResource):
                 'country': customer.country
             } for customer in customers.items]
             
-            response = APIResponse.paginated(
+            return APIResponse.paginated(
                 data=data,
                 page=page,
                 per_page=per_page,
                 total=customers.total
             )
-            
-            APIResponseCache.set_api_response('customers', request.args, g.company.id, response)
-            return response
     
     @api_auth_required(['write'])
     def post(self):
@@ -279,14 +270,11 @@ class CustomersAPIResource(BaseAPIResource):
 class ProductsAPIResource(BaseAPIResource):
     """Product management API"""
     
+    cache_tables = ('products',)
+    
     @api_auth_required(['read'])
     def get(self, product_id=None):
-        """Get products or specific product"""
-        # Check cache
-        cached_data = APIResponseCache.get_api_response('products', request.args, g.company.id)
-        if cached_data:
-            return cached_data
-        
+        """Get products or specific product (conditional and cached by BaseAPIResource)"""
         if product_id:
             product = Product.query.filter_by(
                 id=product_id,
@@ -312,9 +300,7 @@ class ProductsAPIResource(BaseAPIResource):
                 'updated_at': product.updated_at.isoformat() if product.updated_at else None
             }
             
-            response = APIResponse.success(data)
-            APIResponseCache.set_api_response('products', request.args, g.company.id, response)
-            return response
+            return APIResponse.success(data)
         
         else:
             # List products with filtering
@@ -353,15 +339,12 @@ class ProductsAPIResource(BaseAPIResource):
                 'is_active': product.is_active
             } for product in products.items]
             
-            response = APIResponse.paginated(
+            return APIResponse.paginated(
                 data=data,
                 page=page,
                 per_page=per_page,
                 total=products.total
             )
-            
-            APIResponseCache.set_api_response('products', request.args, g.company.id, response)
-            return response
     
     @api_auth_required(['write'])
     def post(self):
@@ -417,14 +400,11 @@ class ProductsAPIResource(BaseAPIResource):
 class InvoicesAPIResource(BaseAPIResource):
     """Invoice management API"""
     
+    cache_tables = ('invoices', 'customers')  # Invoices carry their customer's name
+    
     @api_auth_required(['read'])
     def get(self, invoice_id=None):
-        """Get invoices or specific invoice"""
-        # Check cache
-        cached_data = APIResponseCache.get_api_response('invoices', request.args, g.company.id)
-        if cached_data:
-            return cached_data
-        
+        """Get invoices or specific invoice (conditional and cached by BaseAPIResource)"""
         if invoice_id:
             invoice = Invoice.query.filter_by(
                 id=invoice_id,
@@ -450,9 +430,7 @@ class InvoicesAPIResource(BaseAPIResource):
                 'updated_at': invoice.updated_at.isoformat() if invoice.updated_at else None
             }
             
-            response = APIResponse.success(data)
-            APIResponseCache.set_api_response('invoices', request.args, g.company.id, response)
-            return response
+            return APIResponse.success(data)
         
         else:
             # List invoices with filtering
@@ -491,15 +469,12 @@ class InvoicesAPIResource(BaseAPIResource):
                 'total_amount': float(invoice.total_amount) if invoice.total_amount else None
             } for invoice in invoices.items]
             
-            response = APIResponse.paginated(
+            return APIResponse.paginated(
                 data=data,
                 page=page,
                 per_page=per_page,
                 total=invoices.total
             )
-            
-            APIResponseCache.set_api_response('invoices', request.args, g.company.id, response)
-            return response
 
 
 # Analytics and Reporting APIs
@@ -572,18 +547,16 @@ class AnalyticsAPIResource(BaseAPIResource):
     
     def _get_inventory_analytics(self):
         """Get inventory analytics"""
-        # Low stock products
-        low_stock_products = Product.query.filter(
-            Product.company_id == g.company.id,
-            Product.quantity_in_stock <= Product.reorder_level
-        ).count()
+        # Low stock products, counted from the maintained low-stock set
+        from utils.stock_alerts import StockAlerts
+        low_stock_products = sum(StockAlerts.counts(g.company.id).values())
         
         # Total inventory value
         from sqlalchemy import func
         from extensions import db
         
         inventory_value = db.session.query(
-            func.sum(Product.quantity_in_stock * Product.cost_price)
+            func.sum(Product.quantity * Product.cost_price)
         ).filter(
             Product.company_id == g.company.id,
             Product.cost_price.isnot(None)
@@ -25,9 +25,12 @@ from models.product import Product
 from models.employee import Employee
 from utils.permissions import has_permission
 from utils.cache_manager import redis_manager
+from utils.sales_leaderboard import SalesLeaderboard, LeaderboardError, MAX_WINDOW_DAYS
 
 bi_bp = Blueprint('business_intelligence', __name__, url_prefix='/bi')
 
+TOP_PRODUCTS_MAX_LIMIT = 100
+
 # ============================================================================
 # DASHBOARD MANAGEMENT
 # ============================================================================
@@ -65,7 +68,10 @@ def view_dashboard(dashboard_id):
         if widget.is_visible:
             widget_data = widget.to_dict()
             # Fetch actual data for the widget
-            widget_data['data'] = get_widget_data(widget)
+            try:
+                widget_data['data'] = get_widget_data(widget)
+            except LeaderboardError as e:
+                widget_data['data'] = {'error': str(e)}
             widgets_data.append(widget_data)
     
     return render_template('bi/dashboard_view.html',
@@ -170,6 +176,8 @@ def get_widget_data_api(widget_id):
     try:
         data = get_widget_data(widget)
         return jsonify(data)
+    except LeaderboardError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -509,6 +517,8 @@ def get_widget_data(widget):
             return execute_custom_sql(widget.chart_config['sql'])
         else:
             return {'error': 'Unknown data source'}
+    except LeaderboardError:
+        raise  # Invalid widget filters; callers answer 400
     except Exception as e:
         return {'error': str(e)}
 
@@ -531,13 +541,16 @@ def get_sales_summary_data(filters):
 
 def get_top_products_data(filters):
     """Get top selling products data"""
-    limit = filters.get('limit', 10)
+    try:
+        limit = max(1, min(int(filters.get('limit', 10)), TOP_PRODUCTS_MAX_LIMIT))
+        days = max(1, min(int(filters.get('days', 30)), MAX_WINDOW_DAYS))
+    except (TypeError, ValueError):
+        raise LeaderboardError('Top products widget needs whole-number days and limit filters')
     
-    # This would need to be implemented based on your sale items structure
-    # For now, returning mock data
+    top_sellers = SalesLeaderboard.top(current_user.company_id, days=days, limit=limit)
     return {
-        'labels': ['Product A', 'Product B', 'Product C'],
-        'data': [150, 120, 90]
+        'labels': [product['product_name'] for product in top_sellers],
+        'data': [product['units'] for product in top_sellers]
     }
 
 def get_revenue_trend_data(filters):
@@ -8,6 +8,7 @@ from forms.crm_forms import (LeadForm, CustomerForm, OpportunityForm, CRMActivit
                             CRMTaskForm, CRMNoteForm, CRMSearchForm, ConvertLeadForm)
 from extensions import db
 import json
+from utils.dashboard_warmer import DashboardAggregates
 
 # Create CRM blueprint
 crm_bp = Blueprint('crm', __name__, url_prefix='/crm')
@@ -18,52 +19,8 @@ crm_bp = Blueprint('crm', __name__, url_prefix='/crm')
 @login_required
 def dashboard():
     """CRM Dashboard with key metrics and recent activity"""
-    # Get date ranges for analytics
-    today = datetime.utcnow().date()
-    this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    
-    # Lead metrics
-    total_leads = Lead.query.filter_by(company_id=current_user.company_id).count()
-    new_leads_this_month = Lead.query.filter(
-        Lead.company_id == current_user.company_id,
-        Lead.created_at >= this_month_start
-    ).count()
-    
-    qualified_leads = Lead.query.filter(
-        Lead.company_id == current_user.company_id,
-        Lead.qualification_status.in_(['marketing_qualified', 'sales_qualified'])
-    ).count()
-    
-    # Customer metrics
-    total_customers = Customer.query.filter_by(company_id=current_user.company_id).count()
-    active_customers = Customer.query.filter_by(
-        company_id=current_user.company_id,
-        customer_status='active'
-    ).count()
-    
-    # Opportunity metrics
-    open_opportunities = Opportunity.query.filter_by(
-        company_id=current_user.company_id,
-        status='open'
-    ).all()
-    
-    total_pipeline_value = sum(opp.estimated_value for opp in open_opportunities)
-    weighted_pipeline = sum(opp.estimated_value * (opp.probability / 100) for opp in open_opportunities)
-    
-    opportunities_this_month = Opportunity.query.filter(
-        Opportunity.company_id == current_user.company_id,
-        Opportunity.created_at >= this_month_start
-    ).count()
-    
-    # Won/Lost opportunities this month
-    won_opportunities = Opportunity.query.filter(
-        Opportunity.company_id == current_user.company_id,
-        Opportunity.stage == 'closed_won',
-        Opportunity.updated_at >= this_month_start
-    ).all()
-    
-    revenue_this_month = sum(opp.estimated_value for opp in won_opportunities)
+    # Lead, customer and pipeline figures, cached for the day and kept warm for active companies
+    metrics = DashboardAggregates.crm(current_user.company_id)
     
     # Recent activities
     recent_activities = CRMActivity.query.filter_by(
@@ -84,41 +41,23 @@ def dashboard():
         CRMTask.due_date < datetime.utcnow()
     ).count()
     
-    # Sales pipeline by stage
-    pipeline_data = db.session.query(
-        Opportunity.stage,
-        func.count(Opportunity.id).label('count'),
-        func.sum(Opportunity.estimated_value).label('value')
-    ).filter_by(
-        company_id=current_user.company_id,
-        status='open'
-    ).group_by(Opportunity.stage).all()
-    
-    # Lead conversion rate
-    converted_leads = Lead.query.filter_by(
-        company_id=current_user.company_id,
-        lead_status='converted'
-    ).count()
-    
-    conversion_rate = (converted_leads / total_leads * 100) if total_leads > 0 else 0
-    
     return render_template('crm/dashboard.html',
                          # Metrics
-                         total_leads=total_leads,
-                         new_leads_this_month=new_leads_this_month,
-                         qualified_leads=qualified_leads,
-                         total_customers=total_customers,
-                         active_customers=active_customers,
-                         total_pipeline_value=total_pipeline_value,
-                         weighted_pipeline=weighted_pipeline,
-                         opportunities_this_month=opportunities_this_month,
-                         revenue_this_month=revenue_this_month,
-                         conversion_rate=conversion_rate,
+                         total_leads=metrics['total_leads'],
+                         new_leads_this_month=metrics['new_leads_this_month'],
+                         qualified_leads=metrics['qualified_leads'],
+                         total_customers=metrics['total_customers'],
+                         active_customers=metrics['active_customers'],
+                         total_pipeline_value=metrics['total_pipeline_value'],
+                         weighted_pipeline=metrics['weighted_pipeline'],
+                         opportunities_this_month=metrics['opportunities_this_month'],
+                         revenue_this_month=metrics['revenue_this_month'],
+                         conversion_rate=metrics['conversion_rate'],
                          overdue_tasks=overdue_tasks,
                          # Data
                          recent_activities=recent_activities,
                          upcoming_tasks=upcoming_tasks,
-                         pipeline_data=pipeline_data)
+                         pipeline_data=metrics['pipeline_data'])
 
 # ================== LEADS ==================
 
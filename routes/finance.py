@@ -11,9 +11,10 @@ from forms.finance_forms import (ChartOfAccountsForm, InvoiceForm, PaymentForm,
                                 BudgetPeriodForm, BudgetItemForm, RecurringTransactionForm,
                                 FinancialReportForm, SearchForm, QuickPaymentForm)
 from sqlalchemy import func, and_, or_, desc, asc
-from datetime import datetime, date, timedelta
+from datetime import datetime
 from decimal import Decimal
 import json
+from utils.dashboard_warmer import DashboardAggregates
 
 finance_bp = Blueprint('finance', __name__, url_prefix='/finance')
 
@@ -24,29 +25,8 @@ def dashboard():
     """Finance dashboard with key metrics and charts"""
     company_id = current_user.company_id
     
-    # Key Financial Metrics
-    total_revenue = db.session.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.company_id == company_id,
-        Invoice.status == 'paid'
-    ).scalar() or 0
-    
-    total_expenses = db.session.query(func.sum(Expense.amount)).filter(
-        Expense.company_id == company_id,
-        Expense.status == 'approved'
-    ).scalar() or 0
-    
-    outstanding_invoices = db.session.query(func.sum(Invoice.total_amount - Invoice.paid_amount)).filter(
-        Invoice.company_id == company_id,
-        Invoice.status.in_(['sent', 'overdue']),
-        Invoice.total_amount > Invoice.paid_amount
-    ).scalar() or 0
-    
-    overdue_invoices = Invoice.query.filter(
-        Invoice.company_id == company_id,
-        Invoice.status.in_(['sent', 'overdue']),
-        Invoice.due_date < date.today(),
-        Invoice.total_amount > Invoice.paid_amount
-    ).count()
+    # Key Financial Metrics, cached for the day and kept warm for active companies
+    metrics = DashboardAggregates.finance(company_id)
     
     # Recent Transactions
     recent_invoices = Invoice.query.filter_by(company_id=company_id).order_by(desc(Invoice.created_at)).limit(5).all()
@@ -57,10 +37,10 @@ def dashboard():
     quick_payment_form = QuickPaymentForm(company_id=company_id)
     
     return render_template('finance/dashboard.html',
-                         total_revenue=total_revenue,
-                         total_expenses=total_expenses,
-                         outstanding_invoices=outstanding_invoices,
-                         overdue_invoices=overdue_invoices,
+                         total_revenue=metrics['total_revenue'],
+                         total_expenses=metrics['total_expenses'],
+                         outstanding_invoices=metrics['outstanding_invoices'],
+                         overdue_invoices=metrics['overdue_invoices'],
                          recent_invoices=recent_invoices,
                          recent_expenses=recent_expenses,
                          recent_payments=recent_payments,
@@ -615,40 +595,8 @@ def api_dashboard_metrics():
     """API endpoint for dashboard metrics"""
     company_id = current_user.company_id
     
-    # Monthly revenue trend (last 12 months)
-    monthly_revenue = []
-    for i in range(12):
-        month_start = date.today().replace(day=1) - timedelta(days=31*i)
-        month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        
-        revenue = db.session.query(func.sum(Invoice.total_amount)).filter(
-            Invoice.company_id == company_id,
-            Invoice.status == 'paid',
-            Invoice.invoice_date.between(month_start, month_end)
-        ).scalar() or 0
-        
-        monthly_revenue.append({
-            'month': month_start.strftime('%Y-%m'),
-            'revenue': float(revenue)
-        })
-    
-    monthly_revenue.reverse()
-    
-    # Expense breakdown by category
-    expense_categories = db.session.query(
-        ExpenseCategory.name,
-        func.sum(Expense.amount).label('total')
-    ).join(Expense).filter(
-        Expense.company_id == company_id,
-        Expense.status == 'approved'
-    ).group_by(ExpenseCategory.name).all()
-    
-    category_data = [{'category': cat.name, 'amount': float(cat.total)} for cat in expense_categories]
-    
-    return jsonify({
-        'monthly_revenue': monthly_revenue,
-        'expense_categories': category_data
-    })
+    # Monthly revenue trend (last 12 months) and expense breakdown by category
+    return jsonify(DashboardAggregates.finance_trends(company_id))
 
 # Helper functions for report generation
 def generate_profit_loss_data(company_id, start_date, end_date):
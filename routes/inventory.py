@@ -1,16 +1,25 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
-from models.product import Product, StockMovement, Category, Supplier
+from models.product import Product, StockMovement, StockMovementDaily, StockCount, Category, Supplier
 from models.sale import Sale
 from models.user import User
 from models.company import Company
 from forms.inventory_forms import (ProductForm, StockAdjustmentForm, CategoryForm, 
                                  SupplierForm, BulkUploadForm, InventorySearchForm)
 from extensions import db
+from utils.inventory_stats import InventoryStats
+from utils.product_search import ProductSearch
+from utils.cache_manager import ProductLookupCache
+from utils.stock_ledger import StockLedger, StockLedgerError
+from utils.stock_count import StockCountService, StockCountError, rows_from_request
+from utils.stock_alerts import StockAlerts
+from utils.sales_leaderboard import SalesLeaderboard
+from utils.cost_layers import CostLayers, CostingError
+from utils.catalogue_classification import CatalogueClassifier
+from utils.inventory_export import (csv_response, parse_date_range, product_export_rows,
+                                    stock_movement_rows, PRODUCT_EXPORT_HEADER, STOCK_MOVEMENT_HEADER)
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, desc, or_
-import csv
-import io
 import os
 from werkzeug.utils import secure_filename
 import pandas as pd
@@ -23,38 +32,24 @@ def dashboard():
     """Main inventory dashboard with key metrics"""
     company_id = current_user.company_id
     
-    # Get basic inventory stats
-    total_products = Product.query.filter_by(company_id=company_id, is_active=True).count()
+    # Stock-status counts and valuation from the shared statistics service
+    stats = InventoryStats.get(company_id)
+    total_products = stats['total_products']
+    total_inventory_value = stats['cost_value']
     total_categories = Category.query.filter_by(company_id=company_id, is_active=True).count()
     total_suppliers = Supplier.query.filter_by(company_id=company_id, is_active=True).count()
     
-    # Calculate inventory value
-    products = Product.query.filter_by(company_id=company_id, is_active=True).all()
-    total_inventory_value = sum(p.current_value() for p in products)
-    
-    # Low stock alerts
-    low_stock_products = [p for p in products if p.is_low_stock()]
-    
-    # Out of stock products
-    out_of_stock_products = [p for p in products if p.quantity <= 0]
+    # Low stock alerts from the maintained set (only the first few are listed on the dashboard)
+    low_stock_products = StockAlerts.products(company_id, 'low_stock', limit=5)
+    out_of_stock_products = StockAlerts.products(company_id, 'out_of_stock', limit=5)
     
     # Recent stock movements
     recent_movements = StockMovement.query.join(Product).filter(
         Product.company_id == company_id
     ).order_by(desc(StockMovement.created_at)).limit(10).all()
     
-    # Top selling products (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    top_products = db.session.query(
-        Product.id,
-        Product.product_name,
-        func.sum(Sale.quantity).label('total_sold')
-    ).join(Sale, Product.product_name == Sale.product_name).filter(
-        Product.company_id == company_id,
-        Sale.date_created >= thirty_days_ago
-    ).group_by(Product.id, Product.product_name).order_by(
-        desc(func.sum(Sale.quantity))
-    ).limit(5).all()
+    # Top selling products (last 30 days), read from the daily sales rollup
+    top_products = SalesLeaderboard.top(company_id, days=30, limit=5)
     
     # Category distribution
     category_stats = db.session.query(
@@ -73,6 +68,8 @@ def dashboard():
                          total_inventory_value=total_inventory_value,
                          low_stock_products=low_stock_products,
                          out_of_stock_products=out_of_stock_products,
+                         low_stock_count=stats['needs_reorder'],  # At or below reorder level, out of stock included
+                         out_of_stock_count=stats['out_of_stock'],
                          recent_movements=recent_movements,
                          top_products=top_products,
                          category_stats=category_stats)
@@ -177,13 +174,15 @@ def add_product():
             if form.quantity.data > 0:
                 stock_movement = StockMovement(
                     product_id=product.id,
+                    company_id=current_user.company_id,
                     movement_type='initial_stock',
-                    quantity_change=form.quantity.data,
-                    quantity_after=form.quantity.data,
+                    quantity=form.quantity.data,
+                    previous_quantity=0,
+                    new_quantity=form.quantity.data,
                     unit_cost=form.cost_price.data,
                     reference='Initial Stock',
                     notes='Initial product stock entry',
-                    created_by=current_user.id
+                    created_by=current_user.username
                 )
                 db.session.add(stock_movement)
             
@@ -282,49 +281,74 @@ def adjust_stock():
                 company_id=current_user.company_id
             ).first_or_404()
             
-            old_quantity = product.quantity
             adjustment_type = form.adjustment_type.data
             adjustment_quantity = form.quantity.data
+            movement = {
+                'movement_type': f'adjustment_{adjustment_type}',
+                'unit_cost': form.unit_cost.data,
+                'reference': form.reference.data,
+                'notes': form.notes.data,
+                'created_by': current_user.username
+            }
             
-            # Calculate new quantity
-            if adjustment_type == 'add':
-                new_quantity = old_quantity + adjustment_quantity
-                quantity_change = adjustment_quantity
-            elif adjustment_type == 'remove':
-                new_quantity = max(0, old_quantity - adjustment_quantity)
-                quantity_change = -(old_quantity - new_quantity)
-            else:  # set
-                new_quantity = adjustment_quantity
-                quantity_change = new_quantity - old_quantity
-            
-            # Update product quantity
-            product.quantity = new_quantity
-            product.updated_at = datetime.utcnow()
-            
-            # Create stock movement record
-            movement = StockMovement(
-                product_id=product.id,
-                movement_type=f'adjustment_{adjustment_type}',
-                quantity_change=quantity_change,
-                quantity_after=new_quantity,
-                unit_cost=form.unit_cost.data,
-                reference=form.reference.data,
-                notes=form.notes.data,
-                created_by=current_user.id
-            )
+            # Apply the change atomically so concurrent sales are never overwritten
+            if adjustment_type == 'set':
+                change = StockLedger.set_quantity(current_user.company_id, product.id,
+                                                  adjustment_quantity, **movement)
+            else:
+                delta = adjustment_quantity if adjustment_type == 'add' else -adjustment_quantity
+                change = StockLedger.adjust(current_user.company_id, product.id, delta, **movement)
             
-            db.session.add(movement)
             db.session.commit()
             
-            flash(f'Stock adjusted for "{product.product_name}". New quantity: {new_quantity}', 'success')
+            flash(f'Stock adjusted for "{product.product_name}". New quantity: {change.new_quantity}', 'success')
             return redirect(url_for('inventory.products'))
             
+        except StockLedgerError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
         except Exception as e:
             db.session.rollback()
             flash(f'Error adjusting stock: {str(e)}', 'error')
     
     return render_template('inventory/adjust_stock.html', form=form)
 
+@inventory_bp.route('/api/stock-counts', methods=['POST'])
+@login_required
+def api_submit_stock_count():
+    """Post a cycle count of many products from a JSON or CSV payload"""
+    try:
+        rows, reference, notes = rows_from_request(request)
+        stock_count, variances, errors = StockCountService.post(
+            current_user.company_id,
+            rows,
+            reference=reference,
+            notes=notes,
+            counted_by=current_user.username
+        )
+        db.session.commit()
+    except StockCountError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error posting stock count: {str(e)}'}), 500
+    
+    return jsonify(StockCountService.summary(stock_count, variances, errors)), 201
+
+@inventory_bp.route('/api/stock-counts/<int:count_id>')
+@login_required
+def api_stock_count_detail(count_id):
+    """Totals and every line of a posted cycle count"""
+    stock_count = StockCount.query.filter_by(
+        id=count_id,
+        company_id=current_user.company_id
+    ).first_or_404()
+    
+    data = stock_count.to_dict()
+    data['lines'] = StockCountService.lines(stock_count)
+    return jsonify(data)
+
 @inventory_bp.route('/categories')
 @login_required
 def categories():
@@ -419,18 +443,18 @@ def add_supplier():
 @inventory_bp.route('/reports')
 @login_required
 def reports():
-    """Inventory reports and analytics"""
+    """Inventory reports and analytics, optionally narrowed to an ABC and/or XYZ class"""
     company_id = current_user.company_id
+    abc_class = request.args.get('abc')
+    xyz_class = request.args.get('xyz')
     
     # Low stock report
-    low_stock_products = Product.query.filter_by(
-        company_id=company_id, 
-        is_active=True
+    low_stock_products = CatalogueClassifier.filter(
+        StockAlerts.products_query(company_id), abc_class, xyz_class
     ).all()
-    low_stock_products = [p for p in low_stock_products if p.is_low_stock()]
     
     # Inventory valuation by category
-    category_valuation = db.session.query(
+    category_valuation = CatalogueClassifier.filter(db.session.query(
         Product.category,
         func.sum(Product.quantity * Product.cost_price).label('total_cost_value'),
         func.sum(Product.quantity * Product.price).label('total_selling_value'),
@@ -439,77 +463,59 @@ def reports():
         Product.company_id == company_id,
         Product.is_active == True,
         Product.category.isnot(None)
-    ).group_by(Product.category).all()
+    ), abc_class, xyz_class).group_by(Product.category).all()
+    
+    # Products and stock value per ABC/XYZ cell
+    class_summary = CatalogueClassifier.summary(company_id, abc_class, xyz_class)
     
     # Stock movement summary (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    stock_movements = db.session.query(
-        StockMovement.movement_type,
-        func.count(StockMovement.id).label('count'),
-        func.sum(StockMovement.quantity_change).label('total_quantity')
-    ).join(Product).filter(
-        Product.company_id == company_id,
-        StockMovement.created_at >= thirty_days_ago
-    ).group_by(StockMovement.movement_type).all()
+    thirty_days_ago = (datetime.utcnow() - timedelta(days=30)).date()
+    stock_movements = StockMovementDaily.summary_by_type(company_id, thirty_days_ago)
     
     return render_template('inventory/reports.html',
                          low_stock_products=low_stock_products,
                          category_valuation=category_valuation,
+                         class_summary=class_summary,
+                         abc_class=abc_class,
+                         xyz_class=xyz_class,
                          stock_movements=stock_movements)
 
 @inventory_bp.route('/export/products')
 @login_required
 def export_products():
-    """Export products to CSV"""
-    products = Product.query.filter_by(
-        company_id=current_user.company_id,
-        is_active=True
-    ).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'Product Code', 'Product Name', 'Category', 'Brand', 'Supplier',
-        'Price', 'Cost Price', 'Quantity', 'Reorder Level', 'Location',
-        'Barcode', 'Weight', 'Dimensions', 'Description', 'Tax Rate',
-        'Expiry Date', 'Created Date'
-    ])
-    
-    # Write product data
-    for product in products:
-        writer.writerow([
-            product.product_code,
-            product.product_name,
-            product.category or '',
-            product.brand or '',
-            product.supplier or '',
-            product.price,
-            product.cost_price or '',
-            product.quantity,
-            product.reorder_level,
-            product.location or '',
-            product.barcode or '',
-            product.weight or '',
-            product.dimensions or '',
-            product.description or '',
-            product.tax_rate,
-            product.expiry_date.strftime('%Y-%m-%d') if product.expiry_date else '',
-            product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    output.seek(0)
-    
-    # Create response
-    response = send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'products_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    """Export products to CSV, streamed row by row (add ?gzip=1 to compress)"""
+    filename = f'products_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return csv_response(
+        filename,
+        PRODUCT_EXPORT_HEADER,
+        product_export_rows(current_user.company_id),
+        compress=request.args.get('gzip', type=int) == 1
+    )
+
+@inventory_bp.route('/export/stock-movements')
+@login_required
+def export_stock_movements():
+    """Export the full stock movement history to CSV with optional date filters"""
+    try:
+        date_from, date_to = parse_date_range(request.args.get('date_from'), request.args.get('date_to'))
+    except ValueError:
+        flash('Invalid date range. Use YYYY-MM-DD.', 'error')
+        return redirect(url_for('inventory.reports'))
+    
+    filename = f'stock_movements_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    rows = stock_movement_rows(
+        current_user.company_id,
+        date_from=date_from,
+        date_to=date_to,
+        product_id=request.args.get('product', type=int),
+        movement_type=request.args.get('type')
+    )
+    return csv_response(
+        filename,
+        STOCK_MOVEMENT_HEADER,
+        rows,
+        compress=request.args.get('gzip', type=int) == 1
     )
-    
-    return response
 
 @inventory_bp.route('/api/product/<int:product_id>/stock-chart')
 @login_required
@@ -520,41 +526,108 @@ def product_stock_chart(product_id):
         company_id=current_user.company_id
     ).first_or_404()
     
-    # Get stock movements for the last 90 days
-    ninety_days_ago = datetime.utcnow() - timedelta(days=90)
-    movements = StockMovement.query.filter(
-        StockMovement.product_id == product_id,
-        StockMovement.created_at >= ninety_days_ago
-    ).order_by(StockMovement.created_at).all()
-    
-    # Build chart data
-    chart_data = []
-    for movement in movements:
-        chart_data.append({
-            'date': movement.created_at.strftime('%Y-%m-%d'),
-            'quantity': movement.quantity_after,
-            'movement_type': movement.movement_type
-        })
+    # Daily closing stock for the last 90 days, read from the rollup instead of raw history
+    ninety_days_ago = (datetime.utcnow() - timedelta(days=90)).date()
+    chart_data = StockMovementDaily.daily_series(product.id, ninety_days_ago)
     
     return jsonify(chart_data)
 
+@inventory_bp.route('/api/product/<int:product_id>/cost-layers')
+@login_required
+def product_cost_layers(product_id):
+    """FIFO cost layers holding a product's stock, now or at the end of ?as_of=YYYY-MM-DD"""
+    product = Product.query.filter_by(
+        id=product_id,
+        company_id=current_user.company_id
+    ).first_or_404()
+    
+    try:
+        as_of = datetime.strptime(request.args['as_of'], '%Y-%m-%d').date() if request.args.get('as_of') else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    cost = product.cost
+    return jsonify({
+        'product_id': product.id,
+        'average_cost': cost.average_cost if cost else None,
+        'layers': CostLayers.layers(product.id, as_of)
+    })
+
+@inventory_bp.route('/api/valuation')
+@login_required
+def inventory_valuation():
+    """Stock value under ?method=fifo|average, now or at the end of ?as_of=YYYY-MM-DD"""
+    try:
+        as_of = datetime.strptime(request.args['as_of'], '%Y-%m-%d').date() if request.args.get('as_of') else None
+        return jsonify(CostLayers.valuation(current_user.company_id, as_of, request.args.get('method', 'fifo')))
+    except CostingError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+@inventory_bp.route('/api/cogs')
+@login_required
+def cost_of_goods_sold():
+    """Cost of goods issued between ?date_from and ?date_to (inclusive, default last 30 days)"""
+    today = datetime.utcnow().date()
+    try:
+        date_from, date_to = parse_date_range(request.args.get('date_from'), request.args.get('date_to'))
+        start = date_from.date() if date_from else today - timedelta(days=29)
+        end = (date_to - timedelta(days=1)).date() if date_to else today
+        return jsonify(CostLayers.cogs(current_user.company_id, start, end, request.args.get('method', 'fifo')))
+    except CostingError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+@inventory_bp.route('/api/classification')
+@login_required
+def catalogue_classification():
+    """Product count and stock value per ABC/XYZ cell, optionally filtered by ?abc= and ?xyz="""
+    rows = CatalogueClassifier.summary(current_user.company_id, request.args.get('abc'), request.args.get('xyz'))
+    return jsonify([{
+        'abc_class': row.abc_class,
+        'xyz_class': row.xyz_class,
+        'product_count': row.product_count,
+        'total_quantity': int(row.total_quantity),
+        'total_cost_value': float(row.total_cost_value),
+        'total_selling_value': float(row.total_selling_value)
+    } for row in rows])
+
+@inventory_bp.route('/api/products/search')
+@login_required
+def api_product_search():
+    """Type-ahead product search for the POS and inventory screens"""
+    products = ProductSearch.search(
+        current_user.company_id,
+        request.args.get('q', ''),
+        limit=request.args.get('limit', 10, type=int)
+    )
+    
+    return jsonify([ProductSearch.to_result(p) for p in products])
+
+@inventory_bp.route('/api/products/scan/<path:code>')
+@login_required
+def api_product_scan(code):
+    """Resolve a scanned barcode or SKU from the shared lookup cache"""
+    record = ProductLookupCache.lookup(current_user.company_id, code)
+    if record is None:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    return jsonify(record)
+
 @inventory_bp.route('/api/dashboard/metrics')
 @login_required
 def dashboard_metrics():
     """API endpoint for dashboard metrics"""
-    company_id = current_user.company_id
-    
-    # Calculate key metrics
-    total_products = Product.query.filter_by(company_id=company_id, is_active=True).count()
-    
-    products = Product.query.filter_by(company_id=company_id, is_active=True).all()
-    total_value = sum(p.current_value() for p in products)
-    low_stock_count = len([p for p in products if p.is_low_stock()])
-    out_of_stock_count = len([p for p in products if p.quantity <= 0])
+    stats = InventoryStats.get(current_user.company_id)
     
     return jsonify({
-        'total_products': total_products,
-        'total_value': round(total_value, 2),
-        'low_stock_count': low_stock_count,
-        'out_of_stock_count': out_of_stock_count
+        'total_products': stats['total_products'],
+        'total_value': stats['cost_value'],
+        'retail_value': stats['retail_value'],
+        'in_stock_count': stats['in_stock'],
+        'low_stock_count': stats['needs_reorder'],
+        'out_of_stock_count': stats['out_of_stock'],
+        'overstocked_count': stats['overstocked']
     })
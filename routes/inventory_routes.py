@@ -3,20 +3,31 @@ Inventory Management Routes for RahaSoft ERP
 Comprehensive business-ready inventory system with full functionality
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, false
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 import os
-import csv
-import io
 import json
 
-from models.product import Product, StockMovement, Category, Supplier
+from models.product import Product, StockMovement, StockMovementDaily, Category, Supplier
 from models.company import Company
 from models.sale import Sale
+from models.api_framework import DataImportJob
 from extensions import db
+from utils.inventory_stats import InventoryStats
+from utils.product_import import start_product_import, error_report_rows, ERROR_REPORT_HEADER
+from utils.product_search import ProductSearch
+from utils.cache_manager import ProductLookupCache
+from utils.stock_ledger import StockLedger, StockLedgerError
+from utils.inventory_export import (csv_response, parse_date_range, stock_report_rows, low_stock_rows,
+                                    stock_movement_rows, STOCK_REPORT_HEADER, LOW_STOCK_HEADER,
+                                    STOCK_MOVEMENT_HEADER)
+from utils.pagination import keyset_paginate, InvalidCursor
+from utils.sales_leaderboard import SalesLeaderboard, LeaderboardError
+from utils.catalogue_classification import CatalogueClassifier
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 
@@ -47,6 +58,14 @@ def get_company_id():
     
     return company.id if company else None
 
+def get_company_import_job(job_id):
+    """Get an import job belonging to the current user's company"""
+    return DataImportJob.query.filter_by(
+        id=job_id,
+        company_id=get_company_id(),
+        job_type='products'
+    ).first_or_404()
+
 @inventory_bp.route('/')
 @login_required
 def dashboard():
@@ -56,36 +75,23 @@ def dashboard():
         flash('No company found. Please contact administrator.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    # Get all products for the company
-    products = get_company_products()
-    
-    # Calculate statistics
-    total_products = products.count()
-    in_stock_products = products.filter(Product.quantity > 0).count()
-    low_stock_products = len(Product.get_low_stock_products(company_id))
-    out_of_stock_products = products.filter(Product.quantity <= 0).count()
-    
-    # Calculate inventory value
-    inventory_value = Product.get_inventory_value(company_id)
+    # Stock-status counts and valuation from the shared statistics service
+    stats = InventoryStats.get(company_id)
+    total_products = stats['total_products']
+    in_stock_products = stats['in_stock']
+    low_stock_products = stats['needs_reorder']
+    out_of_stock_products = stats['out_of_stock']
+    inventory_value = {'cost_value': stats['cost_value'], 'retail_value': stats['retail_value']}
     
     # Get recent stock movements
     recent_movements = StockMovement.query.filter_by(company_id=company_id)\
-        .order_by(StockMovement.timestamp.desc()).limit(10).all()
+        .order_by(StockMovement.created_at.desc(), StockMovement.id.desc()).limit(10).all()
     
     # Get products expiring soon (next 30 days)
     expiring_products = Product.get_expiring_products(company_id, days=30)
     
-    # Get top selling products (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    top_selling = db.session.query(
-        Product.name,
-        func.sum(Sale.quantity).label('total_sold')
-    ).join(Sale, Product.id == Sale.product_id)\
-     .filter(Sale.company_id == company_id)\
-     .filter(Sale.date_created >= thirty_days_ago)\
-     .group_by(Product.id, Product.name)\
-     .order_by(func.sum(Sale.quantity).desc())\
-     .limit(5).all()
+    # Get top selling products (last 30 days) from the daily sales rollup
+    top_selling = SalesLeaderboard.top(company_id, days=30, limit=5)
     
     # Get categories
     categories = Category.query.filter_by(company_id=company_id).all()
@@ -106,64 +112,89 @@ def dashboard():
                          categories=categories,
                          suppliers=suppliers)
 
-@inventory_bp.route('/products')
-@login_required
-def products():
-    """Display all products with filtering and sorting"""
-    company_id = get_company_id()
-    if not company_id:
-        flash('No company found. Please contact administrator.', 'error')
-        return redirect(url_for('main.dashboard'))
-    
-    # Get filter parameters
-    category_id = request.args.get('category', type=int)
-    supplier_id = request.args.get('supplier', type=int)
-    stock_status = request.args.get('status')
-    search = request.args.get('search', '')
-    sort_by = request.args.get('sort', 'name')
-    order = request.args.get('order', 'asc')
-    
-    # Base query
-    query = get_company_products()
+# Listing sort options: each maps to non-null columns plus the id tie-breaker used as the page key
+PRODUCT_SORTS = {
+    'name': (Product.product_name, Product.id),
+    'sku': (Product.product_code, Product.id),
+    'price': (Product.price, Product.id),
+    'quantity': (Product.quantity, Product.id),
+    'created_at': (Product.created_at, Product.id),
+}
+MOVEMENT_SORT = (StockMovement.created_at, StockMovement.id)
+MAX_API_PAGE_SIZE = 100
+
+def filter_products(company_id, args):
+    """Apply the product listing filters from request args"""
+    query = Product.query.filter_by(company_id=company_id)
     
-    # Apply filters
+    # Products store their category and supplier by name
+    category_id = args.get('category', type=int)
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        category = Category.query.filter_by(id=category_id, company_id=company_id).first()
+        # An unknown or foreign id matches nothing rather than the uncategorised products
+        query = query.filter(Product.category == category.name if category else false())
     
+    supplier_id = args.get('supplier', type=int)
     if supplier_id:
-        query = query.filter(Product.supplier_id == supplier_id)
+        supplier = Supplier.query.filter_by(id=supplier_id, company_id=company_id).first()
+        query = query.filter(Product.supplier == supplier.name if supplier else false())
     
+    search = args.get('search', '')
     if search:
         query = query.filter(or_(
-            Product.name.ilike(f'%{search}%'),
-            Product.sku.ilike(f'%{search}%'),
+            Product.product_name.ilike(f'%{search}%'),
+            Product.product_code.ilike(f'%{search}%'),
             Product.barcode.ilike(f'%{search}%'),
             Product.brand.ilike(f'%{search}%')
         ))
     
-    if stock_status:
-        if stock_status == 'in_stock':
-            query = query.filter(Product.quantity > Product.reorder_level)
-        elif stock_status == 'low_stock':
-            query = query.filter(and_(
-                Product.quantity > 0,
-                Product.quantity <= Product.reorder_level
-            ))
-        elif stock_status == 'out_of_stock':
-            query = query.filter(Product.quantity <= 0)
-    
-    # Apply sorting
-    if hasattr(Product, sort_by):
-        if order == 'desc':
-            query = query.order_by(getattr(Product, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Product, sort_by))
-    
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    products = query.paginate(
-        page=page, per_page=20, error_out=False
+    stock_status = args.get('status')
+    if stock_status == 'in_stock':
+        query = query.filter(Product.quantity > Product.reorder_level)
+    elif stock_status == 'low_stock':
+        query = query.filter(and_(
+            Product.quantity > 0,
+            Product.quantity <= Product.reorder_level
+        ))
+    elif stock_status == 'out_of_stock':
+        query = query.filter(Product.quantity <= 0)
+    
+    return CatalogueClassifier.filter(query, args.get('abc'), args.get('xyz'))
+
+def paginate_products(company_id, args, per_page=20, with_total=True):
+    """Return (page, sort, order) for the product listing"""
+    sort_by = args.get('sort', 'name')
+    if sort_by not in PRODUCT_SORTS:
+        sort_by = 'name'
+    order = 'desc' if args.get('order') == 'desc' else 'asc'
+    
+    page = keyset_paginate(
+        filter_products(company_id, args),
+        f'products:{sort_by}:{order}',
+        PRODUCT_SORTS[sort_by],
+        descending=order == 'desc',
+        cursor=args.get('cursor'),
+        per_page=per_page,
+        with_total=with_total
     )
+    return page, sort_by, order
+
+@inventory_bp.route('/products')
+@login_required
+def products():
+    """Display all products with filtering and sorting"""
+    company_id = get_company_id()
+    if not company_id:
+        flash('No company found. Please contact administrator.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    try:
+        products, sort_by, order = paginate_products(company_id, request.args)
+    except InvalidCursor:
+        flash('That page link has expired. Showing the first page.', 'warning')
+        args = request.args.to_dict()
+        args.pop('cursor', None)
+        return redirect(url_for('inventory.products', **args))
     
     # Get categories and suppliers for filters
     categories = Category.query.filter_by(company_id=company_id).all()
@@ -174,10 +205,10 @@ def products():
                          products=products,
                          categories=categories,
                          suppliers=suppliers,
-                         current_category=category_id,
-                         current_supplier=supplier_id,
-                         current_status=stock_status,
-                         current_search=search,
+                         current_category=request.args.get('category', type=int),
+                         current_supplier=request.args.get('supplier', type=int),
+                         current_status=request.args.get('status'),
+                         current_search=request.args.get('search', ''),
                          current_sort=sort_by,
                          current_order=order)
 
@@ -227,9 +258,11 @@ def add_product():
                     company_id=company_id,
                     movement_type='in',
                     quantity=product.quantity,
+                    previous_quantity=0,
+                    new_quantity=product.quantity,
                     reference='Initial Stock',
-                    notes=f'Initial stock for product {product.name}',
-                    user_id=current_user.id
+                    notes=f'Initial stock for product {product.product_name}',
+                    created_by=current_user.username
                 )
                 db.session.add(stock_movement)
                 db.session.commit()
@@ -264,7 +297,7 @@ def product_detail(product_id):
     
     # Get stock movements for this product
     stock_movements = StockMovement.query.filter_by(product_id=product_id)\
-        .order_by(StockMovement.timestamp.desc()).limit(20).all()
+        .order_by(StockMovement.created_at.desc(), StockMovement.id.desc()).limit(20).all()
     
     # Get sales history for this product
     sales_history = Sale.query.filter_by(product_id=product_id)\
@@ -365,56 +398,69 @@ def delete_product(product_id):
         flash(f'Error deleting product: {str(e)}', 'error')
         return redirect(url_for('inventory.product_detail', product_id=product_id))
 
-@inventory_bp.route('/stock-movements')
-@login_required
-def stock_movements():
-    """View stock movements"""
-    company_id = get_company_id()
-    if not company_id:
-        flash('No company found. Please contact administrator.', 'error')
-        return redirect(url_for('main.dashboard'))
-    
-    # Get filter parameters
-    product_id = request.args.get('product', type=int)
-    movement_type = request.args.get('type')
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
+def filter_stock_movements(company_id, args):
+    """Apply the stock movement listing filters from request args"""
+    query = StockMovement.query.filter_by(company_id=company_id)\
+        .options(joinedload(StockMovement.product))
     
-    # Base query
-    query = StockMovement.query.filter_by(company_id=company_id)
-    
-    # Apply filters
+    product_id = args.get('product', type=int)
     if product_id:
         query = query.filter(StockMovement.product_id == product_id)
     
+    movement_type = args.get('type')
     if movement_type:
         query = query.filter(StockMovement.movement_type == movement_type)
     
+    date_from, date_to = parse_date_range(args.get('date_from'), args.get('date_to'))
     if date_from:
-        date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-        query = query.filter(StockMovement.timestamp >= date_from_obj)
-    
+        query = query.filter(StockMovement.created_at >= date_from)
     if date_to:
-        date_to_obj = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-        query = query.filter(StockMovement.timestamp < date_to_obj)
+        query = query.filter(StockMovement.created_at < date_to)
     
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    movements = query.order_by(StockMovement.timestamp.desc()).paginate(
-        page=page, per_page=50, error_out=False
+    return query
+
+def paginate_stock_movements(company_id, args, per_page=50, with_total=True):
+    """Newest movements first, keyed on (created_at, id)"""
+    return keyset_paginate(
+        filter_stock_movements(company_id, args),
+        'stock_movements:created_at:desc',
+        MOVEMENT_SORT,
+        descending=True,
+        cursor=args.get('cursor'),
+        per_page=per_page,
+        with_total=with_total
     )
+
+@inventory_bp.route('/stock-movements')
+@login_required
+def stock_movements():
+    """View stock movements"""
+    company_id = get_company_id()
+    if not company_id:
+        flash('No company found. Please contact administrator.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    try:
+        movements = paginate_stock_movements(company_id, request.args)
+    except InvalidCursor:
+        flash('That page link has expired. Showing the first page.', 'warning')
+        args = request.args.to_dict()
+        args.pop('cursor', None)
+        return redirect(url_for('inventory.stock_movements', **args))
     
     # Get products for filter
-    products = get_company_products().all()
+    products = Product.query.filter_by(company_id=company_id)\
+        .with_entities(Product.id, Product.product_name, Product.product_code)\
+        .order_by(Product.product_name).all()
     
     return render_template('inventory/stock_movements.html',
                          title='Stock Movements',
                          movements=movements,
                          products=products,
-                         current_product=product_id,
-                         current_type=movement_type,
-                         current_date_from=date_from,
-                         current_date_to=date_to)
+                         current_product=request.args.get('product', type=int),
+                         current_type=request.args.get('type'),
+                         current_date_from=request.args.get('date_from'),
+                         current_date_to=request.args.get('date_to'))
 
 @inventory_bp.route('/stock-movements/add', methods=['GET', 'POST'])
 @login_required
@@ -434,40 +480,39 @@ def add_stock_movement():
             notes = request.form.get('notes', '')
             
             # Get product
-            product = Product.query.get(product_id)
-            if not product or product.company_id != company_id:
+            product = Product.query.filter_by(id=product_id, company_id=company_id).first()
+            if not product:
                 flash('Invalid product selected.', 'error')
                 return redirect(url_for('inventory.add_stock_movement'))
             
-            # Update product quantity
+            movement = {
+                'movement_type': movement_type,
+                'reference': reference,
+                'notes': notes,
+                'created_by': current_user.username
+            }
+            
+            # Update product quantity atomically; 'out' refuses to go below zero
             if movement_type == 'in':
-                product.quantity += quantity
+                StockLedger.adjust(company_id, product_id, quantity, **movement)
             elif movement_type == 'out':
-                if product.quantity < quantity:
-                    flash('Insufficient stock quantity.', 'error')
-                    return redirect(url_for('inventory.add_stock_movement'))
-                product.quantity -= quantity
+                StockLedger.adjust(company_id, product_id, -quantity, **movement)
             elif movement_type == 'adjustment':
                 # For adjustments, quantity is the new total quantity
-                product.quantity = quantity
-            
-            # Create stock movement record
-            stock_movement = StockMovement(
-                product_id=product_id,
-                company_id=company_id,
-                movement_type=movement_type,
-                quantity=quantity,
-                reference=reference,
-                notes=notes,
-                user_id=current_user.id
-            )
+                StockLedger.set_quantity(company_id, product_id, quantity, **movement)
+            else:
+                flash('Invalid movement type.', 'error')
+                return redirect(url_for('inventory.add_stock_movement'))
             
-            db.session.add(stock_movement)
             db.session.commit()
             
             flash('Stock movement recorded successfully!', 'success')
             return redirect(url_for('inventory.stock_movements'))
             
+        except StockLedgerError as e:
+            db.session.rollback()
+            flash(str(e), 'error')
+            return redirect(url_for('inventory.add_stock_movement'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error recording stock movement: {str(e)}', 'error')
@@ -726,15 +771,8 @@ def reports():
      .all()
     
     # Stock movements summary (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    movement_summary = db.session.query(
-        StockMovement.movement_type,
-        func.count(StockMovement.id).label('count'),
-        func.sum(StockMovement.quantity).label('total_quantity')
-    ).filter(StockMovement.company_id == company_id)\
-     .filter(StockMovement.timestamp >= thirty_days_ago)\
-     .group_by(StockMovement.movement_type)\
-     .all()
+    thirty_days_ago = (datetime.utcnow() - timedelta(days=30)).date()
+    movement_summary = StockMovementDaily.summary_by_type(company_id, thirty_days_ago)
     
     return render_template('inventory/reports.html',
                          title='Inventory Reports',
@@ -746,81 +784,50 @@ def reports():
 @inventory_bp.route('/reports/export/<report_type>')
 @login_required
 def export_report(report_type):
-    """Export reports to CSV"""
+    """Export reports to CSV, streamed row by row (add ?gzip=1 to compress)"""
     company_id = get_company_id()
     if not company_id:
         flash('No company found. Please contact administrator.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
     if report_type == 'products':
-        writer.writerow(['SKU', 'Name', 'Category', 'Supplier', 'Price', 'Cost', 'Quantity', 'Stock Status'])
-        products = get_company_products().all()
-        for product in products:
-            writer.writerow([
-                product.sku,
-                product.name,
-                product.category.name if product.category else '',
-                product.supplier.name if product.supplier else '',
-                product.price,
-                product.cost,
-                product.quantity,
-                product.get_stock_status()
-            ])
+        header, rows = STOCK_REPORT_HEADER, stock_report_rows(company_id)
         filename = 'products_report.csv'
         
     elif report_type == 'low_stock':
-        writer.writerow(['SKU', 'Name', 'Current Stock', 'Reorder Level', 'Supplier'])
-        products = Product.get_low_stock_products(company_id)
-        for product in products:
-            writer.writerow([
-                product.sku,
-                product.name,
-                product.quantity,
-                product.reorder_level,
-                product.supplier.name if product.supplier else ''
-            ])
+        header, rows = LOW_STOCK_HEADER, low_stock_rows(company_id)
         filename = 'low_stock_report.csv'
         
     elif report_type == 'stock_movements':
-        writer.writerow(['Date', 'Product', 'Movement Type', 'Quantity', 'Reference', 'User'])
-        movements = StockMovement.query.filter_by(company_id=company_id)\
-            .order_by(StockMovement.timestamp.desc()).limit(1000).all()
-        for movement in movements:
-            writer.writerow([
-                movement.timestamp.strftime('%Y-%m-%d %H:%M'),
-                movement.product.name,
-                movement.movement_type,
-                movement.quantity,
-                movement.reference,
-                movement.user.full_name if movement.user else ''
-            ])
+        try:
+            date_from, date_to = parse_date_range(request.args.get('date_from'), request.args.get('date_to'))
+        except ValueError:
+            flash('Invalid date range. Use YYYY-MM-DD.', 'error')
+            return redirect(url_for('inventory.reports'))
+        header = STOCK_MOVEMENT_HEADER
+        rows = stock_movement_rows(
+            company_id,
+            date_from=date_from,
+            date_to=date_to,
+            product_id=request.args.get('product', type=int),
+            movement_type=request.args.get('type')
+        )
         filename = 'stock_movements_report.csv'
     
     else:
         flash('Invalid report type.', 'error')
         return redirect(url_for('inventory.reports'))
     
-    # Create file-like object
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    output.close()
-    
-    return send_file(
-        mem,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='text/csv'
-    )
+    return csv_response(filename, header, rows, compress=request.args.get('gzip', type=int) == 1)
 
 @inventory_bp.route('/import')
 @login_required
 def import_products():
     """Import products from CSV/Excel"""
-    return render_template('inventory/import.html', title='Import Products')
+    job = None
+    if request.args.get('job_id', type=int):
+        job = get_company_import_job(request.args.get('job_id', type=int))
+    return render_template('inventory/import.html', title='Import Products', job=job)
 
 @inventory_bp.route('/import/upload', methods=['POST'])
 @login_required
@@ -842,103 +849,9 @@ def upload_import():
     
     if file and allowed_file(file.filename):
         try:
-            # Read CSV content
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_input = csv.DictReader(stream)
-            
-            success_count = 0
-            error_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(csv_input, start=2):
-                try:
-                    # Validate required fields
-                    if not row.get('name') or not row.get('sku'):
-                        errors.append(f"Row {row_num}: Name and SKU are required")
-                        error_count += 1
-                        continue
-                    
-                    # Check if product with SKU already exists
-                    existing = Product.query.filter_by(
-                        sku=row['sku'], 
-                        company_id=company_id
-                    ).first()
-                    
-                    if existing:
-                        errors.append(f"Row {row_num}: Product with SKU '{row['sku']}' already exists")
-                        error_count += 1
-                        continue
-                    
-                    # Get or create category
-                    category_id = None
-                    if row.get('category'):
-                        category = Category.query.filter_by(
-                            name=row['category'],
-                            company_id=company_id
-                        ).first()
-                        if not category:
-                            category = Category(
-                                name=row['category'],
-                                company_id=company_id
-                            )
-                            db.session.add(category)
-                            db.session.flush()
-                        category_id = category.id
-                    
-                    # Get or create supplier
-                    supplier_id = None
-                    if row.get('supplier'):
-                        supplier = Supplier.query.filter_by(
-                            name=row['supplier'],
-                            company_id=company_id
-                        ).first()
-                        if not supplier:
-                            supplier = Supplier(
-                                name=row['supplier'],
-                                company_id=company_id
-                            )
-                            db.session.add(supplier)
-                            db.session.flush()
-                        supplier_id = supplier.id
-                    
-                    # Create product
-                    product = Product(
-                        name=row['name'],
-                        sku=row['sku'],
-                        description=row.get('description', ''),
-                        price=float(row.get('price', 0)),
-                        cost=float(row.get('cost', 0)),
-                        quantity=int(row.get('quantity', 0)),
-                        company_id=company_id,
-                        category_id=category_id,
-                        supplier_id=supplier_id,
-                        brand=row.get('brand', ''),
-                        reorder_level=int(row.get('reorder_level', 0)),
-                        max_stock_level=int(row.get('max_stock_level', 0)),
-                        location=row.get('location', ''),
-                        barcode=row.get('barcode', ''),
-                        weight=float(row.get('weight', 0)) if row.get('weight') else None,
-                        dimensions=row.get('dimensions', ''),
-                        tax_rate=float(row.get('tax_rate', 0))
-                    )
-                    
-                    db.session.add(product)
-                    success_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-                    error_count += 1
-                    continue
-            
-            db.session.commit()
-            
-            if success_count > 0:
-                flash(f'Successfully imported {success_count} products.', 'success')
-            
-            if error_count > 0:
-                flash(f'{error_count} products failed to import. Check errors below.', 'warning')
-                for error in errors[:10]:  # Show first 10 errors
-                    flash(error, 'error')
+            job = start_product_import(file, company_id, current_user.id)
+            flash(f'Import started for {job.file_name}. Progress is shown below.', 'info')
+            return redirect(url_for('inventory.import_products', job_id=job.id))
             
         except Exception as e:
             db.session.rollback()
@@ -949,17 +862,38 @@ def upload_import():
     
     return redirect(url_for('inventory.import_products'))
 
+@inventory_bp.route('/import/jobs/<int:job_id>')
+@login_required
+def import_job_status(job_id):
+    """Live progress of a product import job"""
+    job = get_company_import_job(job_id)
+    
+    return jsonify({
+        'id': job.id,
+        'file_name': job.file_name,
+        'status': job.status,
+        'total_records': job.total_records,
+        'processed_records': job.processed_records,
+        'successful_records': job.successful_records,
+        'failed_records': job.failed_records,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        'error_report_url': url_for('inventory.import_job_errors', job_id=job.id) if job.error_log else None
+    })
+
+@inventory_bp.route('/import/jobs/<int:job_id>/errors')
+@login_required
+def import_job_errors(job_id):
+    """Download the rows that failed to import as CSV"""
+    job = get_company_import_job(job_id)
+    return csv_response(f'import_{job.id}_errors.csv', ERROR_REPORT_HEADER, error_report_rows(job))
+
 # API endpoints for AJAX calls
 @inventory_bp.route('/api/product/<int:product_id>/stock-status')
 @login_required
 def api_product_stock_status(product_id):
     """Get product stock status via API"""
-    product = Product.query.get_or_404(product_id)
-    
-    # Check access
-    company_id = get_company_id()
-    if product.company_id != company_id:
-        return jsonify({'error': 'Access denied'}), 403
+    product = Product.query.filter_by(id=product_id, company_id=get_company_id()).first_or_404()
     
     return jsonify({
         'quantity': product.quantity,
@@ -968,6 +902,104 @@ def api_product_stock_status(product_id):
         'is_out_of_stock': product.is_out_of_stock()
     })
 
+@inventory_bp.route('/api/products')
+@login_required
+def api_products():
+    """Product listing via API, paged with the cursor from the previous response"""
+    company_id = get_company_id()
+    if not company_id:
+        return jsonify({'error': 'No company found'}), 400
+    
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_API_PAGE_SIZE)
+    try:
+        page, sort_by, order = paginate_products(
+            company_id, request.args, per_page=per_page,
+            with_total=request.args.get('include_total') in ('1', 'true')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'products': [
+            dict(ProductSearch.to_result(p), category=p.category, status=p.get_stock_status())
+            for p in page.items
+        ],
+        'sort': sort_by,
+        'order': order,
+        'pagination': page.meta()
+    })
+
+@inventory_bp.route('/api/top-sellers')
+@login_required
+def api_top_sellers():
+    """Best sellers over the last `days` days (up to 90), ranked by units or revenue"""
+    company_id = get_company_id()
+    if not company_id:
+        return jsonify({'error': 'No company found'}), 400
+    
+    days = request.args.get('days', 30, type=int)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_API_PAGE_SIZE)
+    rank_by = request.args.get('rank_by', 'units')
+    try:
+        top_sellers = SalesLeaderboard.top(company_id, days=days, limit=limit, rank_by=rank_by)
+    except LeaderboardError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'days': days, 'rank_by': rank_by, 'products': top_sellers})
+
+@inventory_bp.route('/api/stock-movements')
+@login_required
+def api_stock_movements():
+    """Stock movement history via API, newest first"""
+    company_id = get_company_id()
+    if not company_id:
+        return jsonify({'error': 'No company found'}), 400
+    
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), MAX_API_PAGE_SIZE)
+    try:
+        page = paginate_stock_movements(
+            company_id, request.args, per_page=per_page,
+            with_total=request.args.get('include_total') in ('1', 'true')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    return jsonify({
+        'movements': [
+            {
+                'id': m.id,
+                'product_id': m.product_id,
+                'sku': m.product.product_code,
+                'name': m.product.product_name,
+                'movement_type': m.movement_type,
+                'quantity': m.quantity,
+                'previous_quantity': m.previous_quantity,
+                'new_quantity': m.new_quantity,
+                'reference': m.reference,
+                'created_by': m.created_by,
+                'created_at': m.created_at.isoformat() if m.created_at else None
+            }
+            for m in page.items
+        ],
+        'pagination': page.meta()
+    })
+
+@inventory_bp.route('/api/products/scan/<path:code>')
+@login_required
+def api_product_scan(code):
+    """Resolve a scanned barcode or SKU without touching the database"""
+    company_id = get_company_id()
+    if not company_id:
+        return jsonify({'error': 'No company found'}), 400
+    
+    record = ProductLookupCache.lookup(company_id, code)
+    if record is None:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    return jsonify(record)
+
 @inventory_bp.route('/api/products/search')
 @login_required
 def api_product_search():
@@ -976,20 +1008,10 @@ def api_product_search():
     if not company_id:
         return jsonify({'error': 'No company found'}), 400
     
-    query = request.args.get('q', '')
-    if len(query) < 2:
-        return jsonify([])
-    
-    products = get_company_products().filter(or_(
-        Product.name.ilike(f'%{query}%'),
-        Product.sku.ilike(f'%{query}%'),
-        Product.barcode.ilike(f'%{query}%')
-    )).limit(10).all()
-    
-    return jsonify([{
-        'id': p.id,
-        'name': p.name,
-        'sku': p.sku,
-        'price': p.price,
-        'quantity': p.quantity
-    } for p in products])
+    products = ProductSearch.search(
+        company_id,
+        request.args.get('q', ''),
+        limit=request.args.get('limit', 10, type=int)
+    )
+    
+    return jsonify([ProductSearch.to_result(p) for p in products])
@@ -22,10 +22,11 @@ import re
 import string
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, session, current_app, abort, jsonify, redirect, url_for, flash
+from flask import request, session, current_app, abort, jsonify, redirect, url_for, flash, g
 from flask_login import current_user
 import ipaddress
 import logging
+from utils.threat_scanner import ThreatScanner, SQL_INJECTION, XSS, PATH_TRAVERSAL, MAX_DEPTH, MAX_BYTES
 
 # Configure security logging
 security_logger = logging.getLogger('security')
@@ -46,6 +47,12 @@ class SecurityEnhancer:
         # Set secure configuration
         self.configure_security_settings(app)
         
+        # Compile the input threat scanner once
+        self.threat_scanner = ThreatScanner(
+            max_depth=app.config.get('SECURITY_SCAN_MAX_DEPTH', MAX_DEPTH),
+            max_bytes=app.config.get('SECURITY_SCAN_MAX_BYTES', MAX_BYTES),
+        )
+        
         # Add security headers
         self.add_security_headers(app)
         
@@ -217,21 +224,27 @@ class SecurityEnhancer:
         """Implement rate limiting per IP"""
         client_ip = self.get_client_ip()
         
-        # Use Redis for distributed rate limiting if available
+        # Redis, or the local cache backend when Redis is unreachable
         try:
             from utils.cache_manager import redis_manager
+            redis_client = redis_manager.get_client()
+            if redis_client is None:
+                return False
+            
+            # One atomic counter per IP per minute; the window starts with its first request
             key = f"rate_limit:{client_ip}"
-            current_requests = redis_manager.get(key) or 0
+            pipe = redis_client.pipeline()
+            pipe.incr(key)
+            pipe.ttl(key)
+            current_requests, ttl = pipe.execute()
+            if ttl < 0:
+                redis_client.expire(key, 60)
             
-            if int(current_requests) > 100:  # 100 requests per minute
+            if current_requests > 100:  # 100 requests per minute
                 return True
             
-            # Increment counter
-            redis_manager.setex(key, 60, int(current_requests) + 1)
-            
-        except Exception:
-            # Fallback to in-memory rate limiting
-            pass
+        except Exception as e:
+            security_logger.warning(f"Rate limit check failed: {e}")
         
         return False
     
@@ -283,139 +296,27 @@ class SecurityEnhancer:
             return True
         return False
     
+    def scan_request(self):
+        """Scan the request inputs once; the detectors below share the result"""
+        if 'threat_scan' not in g:
+            scanner = getattr(self, 'threat_scanner', None) or ThreatScanner()
+            g.threat_scan = scanner.scan_request(request)
+            if g.threat_scan.limit_hit:
+                self.log_security_event('security_scan_limit', request.remote_addr,
+                                        f"Scan stopped at {g.threat_scan.limit_hit} limit on {request.path}")
+        return g.threat_scan
+    
     def detect_sql_injection(self):
         """Detect SQL injection attempts"""
-        sql_patterns = [
-            r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)",
-            r"((\%27)|(\'))\s*((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
-            r"((\%27)|(\'))\s*((\%4F)|o|(\%6F))((\%72)|r|(\%52))",
-            r"\b(OR|AND)\b\s+\d+\s*=\s*\d+",
-            r"UNION\s+(ALL\s+)?SELECT",
-            r"\b(INFORMATION_SCHEMA|SYSOBJECTS|SYSCOLUMNS)\b",
-            r"((\%3D)|(=))[^\n]*((\%27)|(\'))",
-            r"\b(waitfor|delay)\b\s+\d+",
-            r"((\%3C)|<)((\%2F)|\/)*[a-z0-9\%]+((\%3E)|>)",
-            r"((\%3C)|<)((\%69)|i|(\%49))((\%6D)|m|(\%4D))((\%67)|g|(\%47))[^\n]+((\%3E)|>)",
-        ]
-        
-        # Check all input sources
-        inputs_to_check = []
-        
-        # Query parameters
-        for key, value in request.args.items():
-            inputs_to_check.append(value)
-        
-        # Form data
-        if request.form:
-            for key, value in request.form.items():
-                inputs_to_check.append(value)
-        
-        # JSON data
-        if request.is_json and request.json:
-            inputs_to_check.extend(self.extract_json_values(request.json))
-        
-        # Check URL path
-        inputs_to_check.append(request.path)
-        
-        for input_value in inputs_to_check:
-            if isinstance(input_value, str):
-                for pattern in sql_patterns:
-                    if re.search(pattern, input_value, re.IGNORECASE):
-                        return True
-        
-        return False
+        return SQL_INJECTION in self.scan_request()
     
     def detect_xss_attempt(self):
         """Detect XSS attempts"""
-        xss_patterns = [
-            r"<script[^>]*>.*?</script>",
-            r"javascript:",
-            r"on\w+\s*=",
-            r"<iframe[^>]*>.*?</iframe>",
-            r"<object[^>]*>.*?</object>",
-            r"<embed[^>]*>.*?</embed>",
-            r"<form[^>]*>.*?</form>",
-            r"<input[^>]*>",
-            r"<img[^>]*src\s*=\s*[\"']?javascript:",
-            r"<body[^>]*onload\s*=",
-            r"document\.cookie",
-            r"document\.write",
-            r"window\.location",
-            r"eval\s*\(",
-            r"alert\s*\(",
-            r"confirm\s*\(",
-            r"prompt\s*\(",
-        ]
-        
-        # Check all input sources (similar to SQL injection)
-        inputs_to_check = []
-        
-        for key, value in request.args.items():
-            inputs_to_check.append(value)
-        
-        if request.form:
-            for key, value in request.form.items():
-                inputs_to_check.append(value)
-        
-        if request.is_json and request.json:
-            inputs_to_check.extend(self.extract_json_values(request.json))
-        
-        for input_value in inputs_to_check:
-            if isinstance(input_value, str):
-                for pattern in xss_patterns:
-                    if re.search(pattern, input_value, re.IGNORECASE):
-                        return True
-        
-        return False
+        return XSS in self.scan_request()
     
     def detect_path_traversal(self):
         """Detect path traversal attempts"""
-        path_patterns = [
-            r"\.\.\/",
-            r"\.\.\\",
-            r"%2e%2e%2f",
-            r"%2e%2e\\",
-            r"..%2f",
-            r"..%5c",
-            r"%252e%252e%252f",
-            r"..%252f",
-            r"..%c0%af",
-            r"..%c1%9c",
-        ]
-        
-        # Check URL path and parameters
-        inputs_to_check = [request.path]
-        inputs_to_check.extend(request.args.values())
-        
-        if request.form:
-            inputs_to_check.extend(request.form.values())
-        
-        for input_value in inputs_to_check:
-            if isinstance(input_value, str):
-                for pattern in path_patterns:
-                    if re.search(pattern, input_value, re.IGNORECASE):
-                        return True
-        
-        return False
-    
-    def extract_json_values(self, json_data):
-        """Recursively extract all string values from JSON"""
-        values = []
-        
-        if isinstance(json_data, dict):
-            for value in json_data.values():
-                if isinstance(value, str):
-                    values.append(value)
-                elif isinstance(value, (dict, list)):
-                    values.extend(self.extract_json_values(value))
-        elif isinstance(json_data, list):
-            for item in json_data:
-                if isinstance(item, str):
-                    values.append(item)
-                elif isinstance(item, (dict, list)):
-                    values.extend(self.extract_json_values(item))
-        
-        return values
+        return PATH_TRAVERSAL in self.scan_request()
     
     def get_client_ip(self):
         """Get real client IP address"""
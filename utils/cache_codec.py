@@ -0,0 +1,248 @@
+"""
+Cache Codecs for RahaSoft ERP
+Turns cached values into compact bytes and back. Structured data (dicts, lists
+and JSON scalars) goes through orjson, msgpack or the standard json module;
+anything else is pickled and signed with the app's secret key so a tampered
+cache entry is rejected instead of unpickled. Payloads above a size threshold
+are compressed with lz4 or zlib. Every value starts with a two-byte header
+naming its codec and compression, so decoding never has to guess.
+"""
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+HEADER_SIZE = 2
+HEADER_LIMIT = 0x10  # Header bytes stay below this; values written before headers never start so low
+STRUCTURED_TYPES = (dict, list, str, int, float, bool, type(None))
+COMPRESS_MIN_BYTES = 1024
+
+
+class CodecError(ValueError):
+    """A cached value could not be encoded or decoded"""
+
+
+class Codec:
+    """Serializer registered under a one-byte id"""
+
+    id = None
+    name = None
+
+    def encode(self, value):
+        raise NotImplementedError
+
+    def decode(self, data):
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    """Standard library JSON; always available"""
+
+    id = 1
+    name = 'json'
+
+    def encode(self, value):
+        return json.dumps(value, default=str, separators=(',', ':')).encode()
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """orjson: several times faster than json, same output shape"""
+
+    id = 2
+    name = 'orjson'
+
+    def encode(self, value):
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """msgpack: binary and smaller than JSON for numeric payloads"""
+
+    id = 3
+    name = 'msgpack'
+
+    def encode(self, value):
+        return msgpack.packb(value, default=str, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class SignedPickleCodec(Codec):
+    """Pickle behind an HMAC-SHA256 signature, checked before anything is unpickled"""
+
+    id = 4
+    name = 'pickle'
+    SIGNATURE_SIZE = 32
+
+    def __init__(self, secret_key=None):
+        # Without a configured key each process signs with its own, so entries only round-trip locally
+        self.key = secret_key.encode() if isinstance(secret_key, str) else (secret_key or os.urandom(32))
+
+    def encode(self, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return hmac.new(self.key, data, hashlib.sha256).digest() + data
+
+    def decode(self, data):
+        signature, data = data[:self.SIGNATURE_SIZE], data[self.SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, hmac.new(self.key, data, hashlib.sha256).digest()):
+            raise CodecError('Cached pickle has an invalid signature')
+        return pickle.loads(data)
+
+
+class Compressor:
+    """Compression registered under a one-byte id"""
+
+    id = None
+    name = None
+
+    def compress(self, data):
+        raise NotImplementedError
+
+    def decompress(self, data):
+        raise NotImplementedError
+
+
+class NoCompression(Compressor):
+    id = 0
+    name = 'none'
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+
+class ZlibCompressor(Compressor):
+    id = 1
+    name = 'zlib'
+    LEVEL = 1  # Cache payloads favour speed; higher levels gain little on JSON
+
+    def compress(self, data):
+        return zlib.compress(data, self.LEVEL)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class LZ4Compressor(Compressor):
+    id = 2
+    name = 'lz4'
+
+    def compress(self, data):
+        return lz4.frame.compress(data)
+
+    def decompress(self, data):
+        return lz4.frame.decompress(data)
+
+
+CODECS = {}
+COMPRESSORS = {}
+
+
+def register_codec(codec):
+    """Make a codec available for encoding by name and for decoding by id."""
+    if not 0 < codec.id < HEADER_LIMIT:
+        raise CodecError(f'Codec ids must be between 1 and {HEADER_LIMIT - 1}')
+    CODECS[codec.id] = codec
+    return codec
+
+
+def register_compressor(compressor):
+    """Make a compressor available for encoding by name and for decoding by id."""
+    if not 0 <= compressor.id < HEADER_LIMIT:
+        raise CodecError(f'Compressor ids must be between 0 and {HEADER_LIMIT - 1}')
+    COMPRESSORS[compressor.id] = compressor
+    return compressor
+
+
+register_codec(JSONCodec())
+register_codec(SignedPickleCodec())
+if orjson is not None:
+    register_codec(OrjsonCodec())
+if msgpack is not None:
+    register_codec(MsgpackCodec())
+register_compressor(NoCompression())
+register_compressor(ZlibCompressor())
+if lz4 is not None:
+    register_compressor(LZ4Compressor())
+
+
+def _by_name(registry, name, kind):
+    for entry in registry.values():
+        if entry.name == name:
+            return entry
+    available = ', '.join(sorted(entry.name for entry in registry.values()))
+    raise CodecError(f"Unknown or unavailable {kind} '{name}'; available: {available}")
+
+
+class CacheCodec:
+    """Encodes values with the configured codecs and decodes anything carrying a known header"""
+
+    def __init__(self, structured=None, compression=None, compress_min_bytes=COMPRESS_MIN_BYTES):
+        self.configure(structured, compression, compress_min_bytes)
+
+    def configure(self, structured=None, compression=None, compress_min_bytes=COMPRESS_MIN_BYTES,
+                  secret_key=None):
+        """Pick codecs by name; None means the fastest installed one."""
+        self.structured = _by_name(CODECS, structured or ('orjson' if orjson else 'json'), 'codec')
+        self.compressor = _by_name(COMPRESSORS, compression or ('lz4' if lz4 else 'zlib'), 'compression')
+        self.compress_min_bytes = compress_min_bytes
+        if secret_key is not None:
+            register_codec(SignedPickleCodec(secret_key))
+        self.binary = CODECS[SignedPickleCodec.id]
+
+    def encode(self, value):
+        """Header plus payload bytes for a value."""
+        codec = self.binary
+        data = None
+        if isinstance(value, STRUCTURED_TYPES):
+            try:
+                codec, data = self.structured, self.structured.encode(value)
+            except (TypeError, ValueError, OverflowError):
+                codec = self.binary  # e.g. integers too large for orjson
+        if data is None:
+            data = codec.encode(value)
+
+        compressor = COMPRESSORS[NoCompression.id]
+        if len(data) >= self.compress_min_bytes and self.compressor.id != NoCompression.id:
+            compressed = self.compressor.compress(data)
+            if len(compressed) < len(data):
+                compressor, data = self.compressor, compressed
+        return bytes((codec.id, compressor.id)) + data
+
+    def decode(self, data):
+        """Value for bytes produced by encode; plain JSON text from before headers is still read."""
+        if isinstance(data, str):
+            data = data.encode('latin1')
+        if not data or data[0] >= HEADER_LIMIT:
+            return json.loads(data)
+        codec, compressor = CODECS.get(data[0]), COMPRESSORS.get(data[1])
+        if codec is None or compressor is None:
+            raise CodecError(f'Cached value uses codec {data[0]} / compression {data[1]}, '
+                             f'which this process does not have')
+        return codec.decode(compressor.decompress(data[HEADER_SIZE:]))
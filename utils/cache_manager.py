@@ -1,15 +1,29 @@
 """
 Redis Caching Layer for RahaSoft ERP
-Provides enterprise-grade caching for performance optimization
+Provides enterprise-grade caching for performance optimization.
+Reads go through a small in-process LRU (L1) before Redis (L2); workers keep
+their L1 copies coherent by publishing invalidations on a Redis channel.
+Without a reachable Redis the local backend in utils.local_cache takes its place.
 """
 import redis
 import json
-import pickle
+import os
+import socket
 import hashlib
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import current_app, request, g
 from extensions import db
+from utils.cache_codec import CacheCodec, COMPRESS_MIN_BYTES
+from utils.cache_metrics import CacheMetrics, FLUSH_INTERVAL
+from utils.local_cache import LocalRedis, MemoryStore, SQLiteStore, DEFAULT_MAX_BYTES
 
 # Redis Connection Manager
 class RedisManager:
@@ -17,31 +31,80 @@ class RedisManager:
     
     def __init__(self):
         self.redis_client = None
+        self.binary_client = None  # Same server without response decoding, for encoded cache values
         self.is_enabled = False
+        self.is_local = False
     
     def init_app(self, app):
-        """Initialize Redis with Flask app"""
-        try:
-            redis_url = app.config.get('REDIS_URL', 'redis://localhost:6379/0')
-            self.redis_client = redis.from_url(
-                redis_url,
-                decode_responses=True,
-                health_check_interval=30
-            )
-            
-            # Test connection
-            self.redis_client.ping()
-            self.is_enabled = True
-            
-            app.logger.info("Redis connection established successfully")
-            
-        except Exception as e:
-            app.logger.warning(f"Redis connection failed: {e}. Caching disabled.")
-            self.is_enabled = False
+        """
+        Initialize Redis with Flask app.
+        CACHE_BACKEND 'auto' (default) falls back to the local backend when Redis
+        cannot be reached, 'redis' disables caching instead and 'local' skips Redis.
+        """
+        backend = app.config.get('CACHE_BACKEND', 'auto')
+        connected = False
+        if backend != 'local':
+            try:
+                redis_url = app.config.get('REDIS_URL', 'redis://localhost:6379/0')
+                self.redis_client = redis.from_url(
+                    redis_url,
+                    decode_responses=True,
+                    health_check_interval=30
+                )
+                
+                self.binary_client = redis.from_url(redis_url, health_check_interval=30)
+                
+                # Test connection
+                self.redis_client.ping()
+                self.is_enabled = True
+                self.is_local = False
+                connected = True
+                
+                app.logger.info("Redis connection established successfully")
+                
+            except Exception as e:
+                if backend == 'redis':
+                    app.logger.warning(f"Redis connection failed: {e}. Caching disabled.")
+                    self.is_enabled = False
+                    return
+                app.logger.warning(f"Redis connection failed: {e}. Using the local cache backend.")
+        
+        if not connected:
+            self._init_local(app)
+        
+        cache.local.configure(
+            max_bytes=app.config.get('CACHE_L1_MAX_BYTES', CacheConfig.L1_MAX_BYTES),
+            max_ttl=app.config.get('CACHE_L1_TTL', CacheConfig.L1_MAX_TTL)
+        )
+        cache.codec.configure(
+            structured=app.config.get('CACHE_CODEC'),
+            compression=app.config.get('CACHE_COMPRESSION'),
+            compress_min_bytes=app.config.get('CACHE_COMPRESS_MIN_BYTES', COMPRESS_MIN_BYTES),
+            secret_key=app.config.get('SECRET_KEY')
+        )
+        cache.metrics.configure(
+            enabled=app.config.get('CACHE_METRICS', True),
+            flush_interval=app.config.get('CACHE_METRICS_INTERVAL', FLUSH_INTERVAL)
+        )
+    
+    def _init_local(self, app):
+        """Serve the cache from this host: a SQLite file shared by workers if CACHE_LOCAL_PATH is set"""
+        max_bytes = app.config.get('CACHE_LOCAL_MAX_BYTES', DEFAULT_MAX_BYTES)
+        path = app.config.get('CACHE_LOCAL_PATH')
+        store = SQLiteStore(path, max_bytes) if path else MemoryStore(max_bytes)
+        self.redis_client = LocalRedis(store, decode_responses=True)
+        self.binary_client = LocalRedis(store)
+        self.is_enabled = True
+        self.is_local = True
+        app.logger.info(f"Local cache backend enabled ({path or 'in-process'})")
     
     def get_client(self):
         """Get Redis client if available"""
         return self.redis_client if self.is_enabled else None
+    
+    def get_binary_client(self):
+        """Get the bytes-returning Redis client if available"""
+        return self.binary_client if self.is_enabled else None
 
 
 # Global Redis manager instance
@@ -68,6 +131,8 @@ class CacheConfig:
     PREFIX_SESSION = "session:"
     PREFIX_API = "api:"
     PREFIX_SEARCH = "search:"
+    PREFIX_NAMESPACE = "ns:"
+    PREFIX_LOCK = "lock:"
     
     # Cache categories for bulk invalidation
     CATEGORY_USER_DATA = "user_data"
@@ -76,13 +141,146 @@ class CacheConfig:
     CATEGORY_INVENTORY = "inventory"
     CATEGORY_CRM = "crm"
     CATEGORY_ANALYTICS = "analytics"
+    
+    # Categories a tenant's data writes invalidate
+    TENANT_CATEGORIES = (CATEGORY_COMPANY_DATA, CATEGORY_FINANCIAL, CATEGORY_INVENTORY, CATEGORY_CRM)
+    SCAN_BATCH = 500  # Keys per SCAN step and per DEL in pattern deletes
+    
+    # Recomputation of cached function results
+    LOCK_TIMEOUT = 30      # Longest one worker holds the recompute lock
+    LOCK_POLL_INTERVAL = 0.05
+    EARLY_EXPIRATION_BETA = 1.0  # 0 disables probabilistic early recomputation
+    
+    # In-process L1 tier
+    L1_MAX_BYTES = 32 * 1024 * 1024  # Per worker
+    L1_MAX_TTL = 60        # Longest a worker serves a value without going back to Redis
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    INVALIDATION_MAX_KEYS = 1000  # Larger invalidations tell workers to drop their whole L1
+    LISTENER_RETRY = 30    # Seconds before resubscribing after the listener fails
+
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU bounded by a byte budget, with a TTL per entry.
+    Values are held in their serialized form so callers never share objects.
+    """
+    
+    ENTRY_OVERHEAD = 120  # Rough bytes per entry for the dict slot, tuple and expiry
+    
+    def __init__(self, max_bytes=CacheConfig.L1_MAX_BYTES, max_ttl=CacheConfig.L1_MAX_TTL, on_evict=None):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.on_evict = on_evict  # Called with each key dropped for space
+        self.size = 0
+        self.evictions = 0
+        self.generation = 0  # Bumped by every removal so in-flight loads can tell they raced one
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def configure(self, max_bytes, max_ttl):
+        """Apply new limits, dropping current entries."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.max_ttl = max_ttl
+            self._clear()
+    
+    def get(self, key):
+        """Serialized value for key, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key, value, ttl, generation=None):
+        """
+        Store a serialized value for at most ttl seconds (capped at max_ttl).
+        A value read before an invalidation arrived (generation has moved on) is not stored.
+        """
+        ttl = min(ttl, self.max_ttl)
+        size = len(key) + len(value) + self.ENTRY_OVERHEAD
+        evicted = []
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._remove(key)
+            # One entry may not take more than an eighth of the budget
+            if ttl <= 0 or size * 8 > self.max_bytes:
+                return False
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted_key, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+                evicted.append(evicted_key)
+        if self.on_evict is not None:
+            for evicted_key in evicted:
+                self.on_evict(evicted_key)
+        return True
+    
+    def delete(self, *keys):
+        """Drop keys from this worker."""
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._remove(key)
+    
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._clear()
+    
+    def _clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size = 0
+    
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+    
+    def __len__(self):
+        return len(self._entries)
 
 
 class CacheManager:
-    """Advanced cache management with Redis"""
+    """
+    Advanced cache management with Redis.
+    Values read from Redis are kept in a per-process L1 for up to CacheConfig.L1_MAX_TTL
+    (never past the Redis expiry). The L1 is only used while this process is
+    subscribed to the invalidation channel, so a worker that cannot hear other
+    workers' writes falls back to reading Redis every time.
+    
+    Entries stored with a company_id and category live in that tenant's versioned
+    namespace: invalidating it is one INCR, and the old entries age out by TTL.
+    """
     
     def __init__(self):
-        self.redis = redis_manager.get_client()
+        self.metrics = CacheMetrics(lambda: redis_manager.get_client())
+        self.local = LocalCache(on_evict=self.metrics.evicted)
+        self.codec = CacheCodec()
+        self.tier_counts = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+        self._host = socket.gethostname()
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._retry_at = 0
+    
+    @property
+    def redis(self):
+        """Resolve the client lazily so instances created at import see init_app()"""
+        return redis_manager.get_client()
+    
+    @property
+    def redis_binary(self):
+        """Client for encoded values, which are bytes"""
+        return redis_manager.get_binary_client()
     
     def _generate_key(self, key_parts):
         """Generate cache key from parts"""
@@ -92,73 +290,354 @@ class CacheManager:
             key = str(key_parts)
         return key
     
-    def _add_category_tracking(self, key, category):
-        """Add key to category set for bulk operations"""
-        if self.redis and category:
-            category_key = f"category:{category}"
-            self.redis.sadd(category_key, key)
-            # Set category TTL to prevent infinite growth
-            self.redis.expire(category_key, CacheConfig.TTL_VERY_LONG)
+    @staticmethod
+    def _namespace_key(company_id, category):
+        return f"{CacheConfig.PREFIX_NAMESPACE}{company_id}:{category}"
+    
+    def namespace_version(self, company_id, category):
+        """Current version of a tenant's category namespace; '0' until first invalidated"""
+        namespace_key = self._namespace_key(company_id, category)
+        local = self._local_tier()
+        if local is None:
+            return self.redis.get(namespace_key) or '0'
+        
+        version = local.get(namespace_key)
+        if version is None:
+            generation = local.generation
+            version = self.redis.get(namespace_key) or '0'
+            local.set(namespace_key, version, local.max_ttl, generation)
+        return version
     
-    def set(self, key, value, ttl=CacheConfig.TTL_MEDIUM, category=None):
-        """Set cache value with optional category tracking"""
+    def _resolve_key(self, key, company_id=None, category=None):
+        """Redis key for an entry, inside the tenant's current namespace when scoped"""
+        cache_key = self._generate_key(key)
+        if company_id is None or category is None:
+            return cache_key
+        version = self.namespace_version(company_id, category)
+        return f"{self._namespace_key(company_id, category)}:{version}:{cache_key}"
+    
+    def _resolve_keys(self, keys, company_id=None, category=None):
+        """Redis keys for several entries of one scope, looking the namespace version up once"""
+        cache_keys = [self._generate_key(key) for key in keys]
+        if company_id is None or category is None:
+            return cache_keys
+        prefix = f"{self._namespace_key(company_id, category)}:{self.namespace_version(company_id, category)}:"
+        return [prefix + cache_key for cache_key in cache_keys]
+    
+    def invalidate_namespace(self, company_id, *categories):
+        """Invalidate a tenant's entries in the given categories by bumping their versions"""
         if not self.redis:
             return False
         
         try:
-            cache_key = self._generate_key(key)
+            # Versions never expire: a reset would bring entries from an old version back
+            namespace_keys = [self._namespace_key(company_id, category) for category in categories]
+            self.local.delete(*namespace_keys)
+            pipe = self.redis.pipeline(transaction=False)
+            for namespace_key in namespace_keys:
+                pipe.incr(namespace_key)
+            self._publish_invalidation(pipe, namespace_keys)
+            pipe.execute()
+            return True
+        except Exception as e:
+            current_app.logger.error(f"Cache namespace invalidation error: {e}")
+            return False
+    
+    def _delete_keys(self, keys):
+        """Delete keys from Redis and every worker's L1; returns how many existed"""
+        self.local.delete(*keys)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*keys)
+        self._publish_invalidation(pipe, keys)
+        return pipe.execute()[0]
+    
+    def _add_category_tracking(self, pipe, keys, category):
+        """Queue adding keys to the category set for bulk operations on a pipeline"""
+        if category:
+            category_key = f"category:{category}"
+            pipe.sadd(category_key, *keys)
+            # Set category TTL to prevent infinite growth
+            pipe.expire(category_key, CacheConfig.TTL_VERY_LONG)
+    
+    def _serialize(self, value):
+        """Encode value with a header naming its codec and compression"""
+        return self.codec.encode(value)
+    
+    def _deserialize(self, value):
+        """Decode a value using the codec named in its header"""
+        return self.codec.decode(value)
+    
+    # L1 tier and cross-worker invalidation
+    @property
+    def _origin(self):
+        """Identifies this process on the invalidation channel (the pid changes across forks)"""
+        return f"{self._host}:{os.getpid()}:{id(self)}"
+    
+    def _local_tier(self):
+        """The L1 cache if this process is hearing invalidations, otherwise None"""
+        # The local backend is already in-process (or a shared file the workers read directly)
+        if not self.local.max_bytes or redis_manager.is_local:
+            return None
+        listener = self._listener
+        if listener is not None and listener.is_alive() and self._listener_pid == os.getpid():
+            return self.local
+        return self.local if self._start_listener() else None
+    
+    def _start_listener(self):
+        """Subscribe to the invalidation channel on a background thread."""
+        with self._listener_lock:
+            listener = self._listener
+            if listener is not None and listener.is_alive() and self._listener_pid == os.getpid():
+                return True
+            if time.monotonic() < self._retry_at or not self.redis:
+                return False
             
-            # Serialize value based on type
-            if isinstance(value, (dict, list)):
-                serialized_value = json.dumps(value, default=str)
+            # Anything cached while not listening (or inherited over a fork) may be stale
+            self.local.clear()
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{CacheConfig.INVALIDATION_CHANNEL: self._on_invalidation})
+                # Wait for the subscription to be confirmed so no later write goes unheard
+                pubsub.get_message(timeout=1.0)
+                self._listener = pubsub.run_in_thread(
+                    sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+                )
+                self._listener_pid = os.getpid()
+                return True
+            except redis.RedisError as e:
+                logging.getLogger(__name__).warning(f"Cache invalidation listener unavailable: {e}")
+                self._retry_at = time.monotonic() + CacheConfig.LISTENER_RETRY
+                return False
+    
+    def _on_invalidation(self, message):
+        """Drop keys another worker changed."""
+        try:
+            payload = json.loads(message['data'])
+            if payload.get('origin') == self._origin:
+                return
+            keys = payload.get('keys')
+            if keys is None:
+                self.local.clear()
             else:
-                serialized_value = pickle.dumps(value)
-            
-            # Set with TTL
-            result = self.redis.setex(cache_key, ttl, serialized_value)
-            
-            # Add to category tracking
-            self._add_category_tracking(cache_key, category)
-            
-            return result
+                self.local.delete(*keys)
+        except (ValueError, TypeError, AttributeError):
+            self.local.clear()
+    
+    def _on_listener_error(self, error, pubsub, thread):
+        """Stop serving from L1 until resubscribed; messages may have been missed."""
+        logging.getLogger(__name__).warning(f"Cache invalidation listener stopped: {error}")
+        thread.stop()
+        self._retry_at = time.monotonic() + CacheConfig.LISTENER_RETRY
+        self.local.clear()
+    
+    def _publish_invalidation(self, pipe, keys):
+        """Queue an invalidation for other workers on a pipeline; None means everything."""
+        if keys is not None and len(keys) > CacheConfig.INVALIDATION_MAX_KEYS:
+            keys = None
+        pipe.publish(CacheConfig.INVALIDATION_CHANNEL, json.dumps({
+            'origin': self._origin,
+            'keys': list(keys) if keys is not None else None
+        }))
+    
+    def _count(self, name):
+        # Unlocked increments can drop the odd count under threads; fine for ratios
+        self.tier_counts[name] += 1
+    
+    def tier_stats(self):
+        """Hits, misses and hit ratio for each tier, plus the L1's size in this process"""
+        counts = dict(self.tier_counts)
+        
+        def ratio(hits, misses):
+            total = hits + misses
+            return round(hits / total * 100, 2) if total else 0
+        
+        listener = self._listener
+        return {
+            'l1': {
+                'active': bool(listener is not None and listener.is_alive() and self._listener_pid == os.getpid()),
+                'hits': counts['l1_hits'],
+                'misses': counts['l1_misses'],
+                'hit_ratio': ratio(counts['l1_hits'], counts['l1_misses']),
+                'entries': len(self.local),
+                'bytes': self.local.size,
+                'max_bytes': self.local.max_bytes,
+                'evictions': self.local.evictions
+            },
+            'l2': {
+                'hits': counts['l2_hits'],
+                'misses': counts['l2_misses'],
+                'hit_ratio': ratio(counts['l2_hits'], counts['l2_misses'])
+            },
+            'overall_hit_ratio': ratio(
+                counts['l1_hits'] + counts['l2_hits'],
+                counts['l2_misses']
+            )
+        }
+    
+    def _fetch(self, cache_keys):
+        """Raw values for keys, from this worker's L1 where possible and one MGET for the rest"""
+        local = self._local_tier()
+        values = [None] * len(cache_keys)
+        missing = []
+        for position, cache_key in enumerate(cache_keys):
+            if local is not None:
+                value = local.get(cache_key)
+                if value is not None:
+                    self._count('l1_hits')
+                    values[position] = value
+                    continue
+                self._count('l1_misses')
+            missing.append(position)
+        if not missing:
+            return values
+        
+        names = [cache_keys[position] for position in missing]
+        pipe = self.redis_binary.pipeline(transaction=False)
+        pipe.mget(names)
+        if local is not None:
+            generation = local.generation
+            for name in names:
+                pipe.pttl(name)
+        replies = pipe.execute()
+        for index, (position, value) in enumerate(zip(missing, replies[0])):
+            if value is None:
+                self._count('l2_misses')
+                continue
+            self._count('l2_hits')
+            values[position] = value
+            if local is not None and replies[1 + index] != -2:
+                # Keys without an expiry (-1) are held for the L1 maximum
+                ttl_ms = replies[1 + index]
+                local.set(cache_keys[position], value, ttl_ms / 1000 if ttl_ms > 0 else local.max_ttl, generation)
+        return values
+    
+    def _store(self, entries, ttl, category, company_id):
+        """Write (key, encoded value) pairs, their category tracking and one invalidation in a pipeline"""
+        local = self._local_tier()
+        generation = local.generation if local is not None else None
+        cache_keys = [cache_key for cache_key, _ in entries]
+        
+        # Set with TTL and tell other workers to drop their copies
+        pipe = self.redis_binary.pipeline(transaction=False)
+        for cache_key, serialized_value in entries:
+            pipe.setex(cache_key, ttl, serialized_value)
+        # Add to category tracking; tenant entries are invalidated through their namespace
+        if company_id is None:
+            self._add_category_tracking(pipe, cache_keys, category)
+        self._publish_invalidation(pipe, cache_keys)
+        results = pipe.execute()[:len(entries)]
+        
+        if local is not None:
+            for cache_key, serialized_value in entries:
+                local.set(cache_key, serialized_value, ttl, generation)
+        return all(results)
+    
+    def set(self, key, value, ttl=CacheConfig.TTL_MEDIUM, category=None, company_id=None):
+        """Set cache value, in the tenant's namespace when company_id is given, else with category tracking"""
+        if not self.redis:
+            return False
+        
+        started = time.perf_counter()
+        try:
+            cache_key = self._resolve_key(key, company_id, category)
+            serialized_value = self._serialize(value)
+            stored = self._store([(cache_key, serialized_value)], ttl, category, company_id)
+            self.metrics.observe('set', [cache_key], category, time.perf_counter() - started, [serialized_value])
+            return stored
         except Exception as e:
+            self.metrics.error('set', [self._generate_key(key)], category)
             current_app.logger.error(f"Cache set error: {e}")
             return False
     
-    def get(self, key):
-        """Get cache value"""
+    def set_many(self, mapping, ttl=CacheConfig.TTL_MEDIUM, category=None, company_id=None):
+        """Set several values of one scope in a single round trip"""
+        if not self.redis or not mapping:
+            return False
+        
+        started = time.perf_counter()
+        try:
+            cache_keys = self._resolve_keys(list(mapping), company_id, category)
+            entries = [(cache_key, self._serialize(value)) for cache_key, value in zip(cache_keys, mapping.values())]
+            stored = self._store(entries, ttl, category, company_id)
+            self.metrics.observe('set', cache_keys, category, time.perf_counter() - started,
+                                 [serialized_value for _, serialized_value in entries])
+            return stored
+        except Exception as e:
+            self.metrics.error('set', [self._generate_key(key) for key in mapping], category)
+            current_app.logger.error(f"Cache set_many error: {e}")
+            return False
+    
+    def get(self, key, company_id=None, category=None):
+        """Get cache value, from this worker's L1 when possible"""
         if not self.redis:
             return None
         
+        started = time.perf_counter()
         try:
-            cache_key = self._generate_key(key)
-            value = self.redis.get(cache_key)
-            
-            if value is None:
-                return None
-            
-            # Try JSON first, then pickle
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return pickle.loads(value.encode('latin1'))
-                
+            cache_key = self._resolve_key(key, company_id, category)
+            raw = self._fetch([cache_key])[0]
+            value = self._deserialize(raw) if raw is not None else None
+            self.metrics.observe('get', [cache_key], category, time.perf_counter() - started, [raw])
+            return value
         except Exception as e:
+            self.metrics.error('get', [self._generate_key(key)], category)
             current_app.logger.error(f"Cache get error: {e}")
             return None
     
-    def delete(self, key):
+    def get_many(self, keys, company_id=None, category=None):
+        """Get several values of one scope in a single round trip; returns {key: value} for the keys found"""
+        if not self.redis or not keys:
+            return {}
+        
+        started = time.perf_counter()
+        keys = list(keys)
+        try:
+            cache_keys = self._resolve_keys(keys, company_id, category)
+            values = self._fetch(cache_keys)
+            found = {
+                self._generate_key(key): self._deserialize(value)
+                for key, value in zip(keys, values) if value is not None
+            }
+            self.metrics.observe('get', cache_keys, category, time.perf_counter() - started, values)
+            return found
+        except Exception as e:
+            self.metrics.error('get', [self._generate_key(key) for key in keys], category)
+            current_app.logger.error(f"Cache get_many error: {e}")
+            return {}
+    
+    def delete(self, key, company_id=None, category=None):
         """Delete cache key"""
         if not self.redis:
             return False
         
+        started = time.perf_counter()
         try:
-            cache_key = self._generate_key(key)
-            return self.redis.delete(cache_key) > 0
+            cache_key = self._resolve_key(key, company_id, category)
+            deleted = self._delete_keys([cache_key]) > 0
+            self.metrics.observe('delete', [cache_key], category, time.perf_counter() - started)
+            return deleted
         except Exception as e:
+            self.metrics.error('delete', [self._generate_key(key)], category)
             current_app.logger.error(f"Cache delete error: {e}")
             return False
     
+    def delete_many(self, keys, company_id=None, category=None):
+        """Delete several keys of one scope in a single round trip; returns how many existed"""
+        if not self.redis or not keys:
+            return 0
+        
+        started = time.perf_counter()
+        keys = list(keys)
+        try:
+            cache_keys = self._resolve_keys(keys, company_id, category)
+            deleted = self._delete_keys(cache_keys)
+            self.metrics.observe('delete', cache_keys, category, time.perf_counter() - started)
+            return deleted
+        except Exception as e:
+            self.metrics.error('delete', [self._generate_key(key) for key in keys], category)
+            current_app.logger.error(f"Cache delete_many error: {e}")
+            return 0
+    
     def invalidate_category(self, category):
         """Invalidate all keys in a category"""
         if not self.redis:
@@ -169,9 +648,8 @@ class CacheManager:
             keys = self.redis.smembers(category_key)
             
             if keys:
-                # Delete all keys in category
-                self.redis.delete(*keys)
-                # Clear category set
+                # Delete all keys in category, then clear the category set
+                self._delete_keys(list(keys))
                 self.redis.delete(category_key)
                 
             return True
@@ -179,25 +657,25 @@ class CacheManager:
             current_app.logger.error(f"Cache category invalidation error: {e}")
             return False
     
-    def exists(self, key):
+    def exists(self, key, company_id=None, category=None):
         """Check if key exists in cache"""
         if not self.redis:
             return False
         
         try:
-            cache_key = self._generate_key(key)
+            cache_key = self._resolve_key(key, company_id, category)
             return self.redis.exists(cache_key) > 0
         except Exception as e:
             current_app.logger.error(f"Cache exists check error: {e}")
             return False
     
-    def extend_ttl(self, key, ttl):
+    def extend_ttl(self, key, ttl, company_id=None, category=None):
         """Extend TTL for existing key"""
         if not self.redis:
             return False
         
         try:
-            cache_key = self._generate_key(key)
+            cache_key = self._resolve_key(key, company_id, category)
             return self.redis.expire(cache_key, ttl)
         except Exception as e:
             current_app.logger.error(f"Cache TTL extension error: {e}")
@@ -209,14 +687,153 @@ cache = CacheManager()
 
 
 # Caching Decorators
-def cached(ttl=CacheConfig.TTL_MEDIUM, category=None, key_generator=None):
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+LocalRedis.register_script(
+    _RELEASE_LOCK_SCRIPT,
+    lambda client, keys, args: client.delete(keys[0]) if client.get(keys[0]) == args[0] else 0
+)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Flight:
+    """One in-process recomputation that other threads wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _acquire_lock(cache_key, timeout):
+    """Take the cross-worker recompute lock for a key; returns a release token or None"""
+    token = uuid.uuid4().hex
+    if cache.redis.set(f"{CacheConfig.PREFIX_LOCK}{cache_key}", token, nx=True, px=int(timeout * 1000)):
+        return token
+    return None
+
+
+def _release_lock(cache_key, token):
+    """Release the lock only if it is still ours (it may have timed out and been retaken)"""
+    try:
+        cache.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"{CacheConfig.PREFIX_LOCK}{cache_key}", token)
+    except redis.RedisError:
+        pass  # The lock expires on its own
+
+
+def _cached_entry(cache_key):
+    """The envelope stored by `cached`, or None"""
+    entry = cache.get(cache_key)
+    if isinstance(entry, dict) and 'fresh_until' in entry:
+        return entry
+    return None
+
+
+def _compute_and_store(func, args, kwargs, cache_key, ttl, stale_ttl, category):
+    """Run func and store its result with the metadata early expiration needs"""
+    started = time.time()
+    result = func(*args, **kwargs)
+    finished = time.time()
+    # Kept past its freshness for the stale window so it can be served during a refresh
+    cache.set(cache_key, {
+        'value': result,
+        'fresh_until': finished + ttl,
+        'delta': finished - started
+    }, ttl=ttl + stale_ttl, category=category)
+    return result
+
+
+def _compute_once(func, args, kwargs, cache_key, ttl, stale_ttl, category, lock_timeout):
+    """
+    Single-flight recomputation: threads in this process share one call, and
+    across workers only the holder of the Redis lock runs it while the others
+    wait for its result to land in the cache.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(cache_key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[cache_key] = _Flight()
+    
+    if not leader:
+        if not flight.done.wait(lock_timeout):
+            return func(*args, **kwargs)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    
+    try:
+        token = _acquire_lock(cache_key, lock_timeout)
+        if token is None:
+            # Another worker is computing it; wait for its result, then give up waiting
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(CacheConfig.LOCK_POLL_INTERVAL)
+                entry = _cached_entry(cache_key)
+                if entry is not None:
+                    flight.result = entry['value']
+                    return flight.result
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        try:
+            flight.result = _compute_and_store(func, args, kwargs, cache_key, ttl, stale_ttl, category)
+            return flight.result
+        finally:
+            _release_lock(cache_key, token)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+        flight.done.set()
+
+
+def _refresh_in_background(func, args, kwargs, cache_key, ttl, stale_ttl, category, token):
+    """Recompute a stale entry on a daemon thread inside the current app's context"""
+    app = current_app._get_current_object()
+    
+    def refresh():
+        with app.app_context():
+            try:
+                _compute_and_store(func, args, kwargs, cache_key, ttl, stale_ttl, category)
+            except Exception as e:
+                app.logger.error(f"Background cache refresh of {cache_key} failed: {e}")
+            finally:
+                _release_lock(cache_key, token)
+    
+    threading.Thread(target=refresh, name=f"cache-refresh:{cache_key}", daemon=True).start()
+
+
+def cached(ttl=CacheConfig.TTL_MEDIUM, category=None, key_generator=None, stale_ttl=0,
+           early_expiration=CacheConfig.EARLY_EXPIRATION_BETA, lock_timeout=CacheConfig.LOCK_TIMEOUT):
     """
     Decorator for caching function results
     
+    A miss is recomputed once, not once per worker: one caller computes while
+    the rest wait for its result. Before expiry a caller may recompute early,
+    with a probability that grows as expiry nears and with how long the function
+    takes (XFetch), so popular entries are usually refreshed before they lapse.
+    
     Args:
         ttl: Cache time-to-live in seconds
         category: Cache category for bulk invalidation
         key_generator: Custom function to generate cache key
+        stale_ttl: Seconds past ttl an expired result is still served while one
+            worker refreshes it in the background (0 recomputes inline). The
+            refresh runs in an app context without a request.
+        early_expiration: How eagerly to recompute ahead of expiry; 0 disables
+        lock_timeout: Longest one recomputation may hold off the other workers
+    
+    Results are stored as JSON, so tuples come back as lists and other
+    non-JSON values as strings.
     """
     def decorator(func):
         @wraps(func)
@@ -231,16 +848,39 @@ def cached(ttl=CacheConfig.TTL_MEDIUM, category=None, key_generator=None):
                 key_hash = hashlib.md5(args_str.encode()).hexdigest()[:8]
                 cache_key = f"func:{func_name}:{key_hash}"
             
+            if not cache.redis:
+                return func(*args, **kwargs)
+            
             # Try to get from cache
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
+            entry = _cached_entry(cache_key)
+            if entry is None:
+                return _compute_once(func, args, kwargs, cache_key, ttl, stale_ttl, category, lock_timeout)
             
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl=ttl, category=category)
+            now = time.time()
+            fresh_until = entry['fresh_until']
+            if now < fresh_until:
+                # XFetch: -log(u) is exponential, so the odds of refreshing early rise towards expiry
+                early_by = -entry['delta'] * early_expiration * math.log(1.0 - random.random())
+                if now + early_by < fresh_until:
+                    return entry['value']
+            elif not stale_ttl:
+                return _compute_once(func, args, kwargs, cache_key, ttl, stale_ttl, category, lock_timeout)
             
-            return result
+            try:
+                token = _acquire_lock(cache_key, lock_timeout)
+            except redis.RedisError:
+                token = None
+            if token is None:
+                return entry['value']  # Someone else is already refreshing it
+            
+            if now >= fresh_until:
+                # Stale: serve it and let one background refresh replace it
+                _refresh_in_background(func, args, kwargs, cache_key, ttl, stale_ttl, category, token)
+                return entry['value']
+            try:
+                return _compute_and_store(func, args, kwargs, cache_key, ttl, stale_ttl, category)
+            finally:
+                _release_lock(cache_key, token)
         return wrapper
     return decorator
 
@@ -271,12 +911,12 @@ def cache_company_data(company_id, ttl=CacheConfig.TTL_LONG):
         def wrapper(*args, **kwargs):
             cache_key = f"{CacheConfig.PREFIX_COMPANY}{company_id}:{func.__name__}"
             
-            result = cache.get(cache_key)
+            result = cache.get(cache_key, company_id=company_id, category=CacheConfig.CATEGORY_COMPANY_DATA)
             if result is not None:
                 return result
             
             result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl=ttl, category=CacheConfig.CATEGORY_COMPANY_DATA)
+            cache.set(cache_key, result, ttl=ttl, category=CacheConfig.CATEGORY_COMPANY_DATA, company_id=company_id)
             
             return result
         return wrapper
@@ -293,6 +933,13 @@ class UserSessionCache:
         key = f"{CacheConfig.PREFIX_SESSION}{user_id}"
         return cache.get(key)
     
+    @staticmethod
+    def get_user_sessions(user_ids):
+        """Get cached session data for several users in one round trip; {user_id: data} for those cached"""
+        keys = {f"{CacheConfig.PREFIX_SESSION}{user_id}": user_id for user_id in user_ids}
+        found = cache.get_many(keys)
+        return {keys[key]: data for key, data in found.items()}
+    
     @staticmethod
     def set_user_session(user_id, session_data, ttl=CacheConfig.TTL_LONG):
         """Cache user session data"""
@@ -306,6 +953,160 @@ class UserSessionCache:
         return cache.delete(key)
 
 
+class ProductLookupCache:
+    """
+    Per-tenant barcode/SKU -> compact product record map for the tills.
+    Each company gets one Redis hash, loaded in a single query on first use and
+    kept current by the product flush/commit hooks in models.product.
+    """
+    
+    LOADED_FIELD = "__loaded__"
+    TTL = CacheConfig.TTL_LONG
+    
+    @staticmethod
+    def _key(company_id):
+        return f"{CacheConfig.PREFIX_PRODUCT}lookup:{company_id}"
+    
+    @staticmethod
+    def fields_for(sku, barcode):
+        """Hash fields a product occupies: one for its SKU and one for its barcode."""
+        fields = []
+        if sku:
+            fields.append(f"s:{sku}")
+        if barcode:
+            fields.append(f"b:{barcode}")
+        return fields
+    
+    @staticmethod
+    def record_for(product):
+        """Serialized scan record for a product or a row with the same attributes."""
+        return json.dumps({
+            'id': product.id,
+            'name': product.product_name,
+            'sku': product.product_code,
+            'barcode': product.barcode,
+            'price': product.price,
+            'tax_rate': product.tax_rate,
+            'quantity': product.quantity
+        })
+    
+    @staticmethod
+    def lookup(company_id, code):
+        """Resolve a scanned barcode or typed SKU to its record, or None if unknown."""
+        code = (code or '').strip()
+        if not code:
+            return None
+        
+        redis_client = cache.redis
+        if not redis_client:
+            return ProductLookupCache._query(company_id, code)
+        
+        try:
+            key = ProductLookupCache._key(company_id)
+            loaded, by_barcode, by_sku = redis_client.hmget(
+                key, ProductLookupCache.LOADED_FIELD, f"b:{code}", f"s:{code}"
+            )
+            if loaded is None:
+                entries = ProductLookupCache._load(redis_client, company_id)
+                by_barcode, by_sku = entries.get(f"b:{code}"), entries.get(f"s:{code}")
+            raw = by_barcode or by_sku
+            return json.loads(raw) if raw else None
+        except redis.RedisError as e:
+            current_app.logger.error(f"Product lookup cache error: {e}")
+            return ProductLookupCache._query(company_id, code)
+    
+    @staticmethod
+    def _entries(company_id):
+        """Build the full hash contents for a company's active products."""
+        from models.product import Product
+        
+        rows = db.session.execute(
+            db.select(Product.id, Product.product_name, Product.product_code, Product.barcode,
+                      Product.price, Product.tax_rate, Product.quantity)
+            .where(Product.company_id == company_id, Product.is_active == True)
+        )
+        entries = {ProductLookupCache.LOADED_FIELD: datetime.utcnow().isoformat()}
+        for row in rows:
+            record = ProductLookupCache.record_for(row)
+            for field in ProductLookupCache.fields_for(row.product_code, row.barcode):
+                entries[field] = record
+        return entries
+    
+    @staticmethod
+    def _load(redis_client, company_id):
+        """Load a company's map, discarding it if a product commit raced the query."""
+        key = ProductLookupCache._key(company_id)
+        with redis_client.pipeline() as pipe:
+            # Commits bump the version, so WATCH aborts a load that read old rows
+            pipe.watch(f"{key}:version")
+            entries = ProductLookupCache._entries(company_id)
+            try:
+                pipe.multi()
+                pipe.delete(key)
+                pipe.hset(key, mapping=entries)
+                pipe.expire(key, ProductLookupCache.TTL)
+                pipe.execute()
+            except redis.WatchError:
+                pass  # The next scan reloads from the newer data
+        return entries
+    
+    @staticmethod
+    def _query(company_id, code):
+        """Database fallback used when Redis is unavailable."""
+        from models.product import Product
+        
+        product = Product.query.filter(
+            Product.company_id == company_id,
+            Product.is_active == True,
+            db.or_(Product.barcode == code, Product.product_code == code)
+        ).first()
+        return json.loads(ProductLookupCache.record_for(product)) if product else None
+    
+    @staticmethod
+    def apply(company_id, remove, entries):
+        """Apply committed product changes to a company's map if it is loaded."""
+        redis_client = cache.redis
+        if not redis_client:
+            return
+        
+        try:
+            key = ProductLookupCache._key(company_id)
+            pipe = redis_client.pipeline()
+            pipe.incr(f"{key}:version")
+            pipe.hexists(key, ProductLookupCache.LOADED_FIELD)
+            _, loaded = pipe.execute()
+            if not loaded:
+                return  # Nothing cached yet; the next scan loads fresh rows
+            
+            pipe = redis_client.pipeline()
+            if remove:
+                pipe.hdel(key, *remove)
+            if entries:
+                pipe.hset(key, mapping=entries)
+            pipe.execute()
+        except redis.RedisError as e:
+            current_app.logger.error(f"Product lookup cache update error: {e}")
+            ProductLookupCache.invalidate(company_id)
+    
+    @staticmethod
+    def invalidate(company_id):
+        """Drop a company's map so the next scan reloads it."""
+        redis_client = cache.redis
+        if not redis_client:
+            return False
+        
+        try:
+            key = ProductLookupCache._key(company_id)
+            pipe = redis_client.pipeline()
+            pipe.incr(f"{key}:version")
+            pipe.delete(key)
+            pipe.execute()
+            return True
+        except redis.RedisError as e:
+            current_app.logger.error(f"Product lookup cache invalidation error: {e}")
+            return False
+
+
 class AnalyticsCache:
     """Manage analytics data caching"""
     
@@ -314,26 +1115,42 @@ class AnalyticsCache:
         """Get cached dashboard analytics"""
         date_suffix = f":{date_range}" if date_range else ""
         key = f"{CacheConfig.PREFIX_ANALYTICS}dashboard:{company_id}:{user_id}{date_suffix}"
-        return cache.get(key)
+        return cache.get(key, company_id=company_id, category=CacheConfig.CATEGORY_ANALYTICS)
     
     @staticmethod
     def set_dashboard_data(company_id, user_id, data, date_range=None, ttl=CacheConfig.TTL_MEDIUM):
         """Cache dashboard analytics"""
         date_suffix = f":{date_range}" if date_range else ""
         key = f"{CacheConfig.PREFIX_ANALYTICS}dashboard:{company_id}:{user_id}{date_suffix}"
-        return cache.set(key, data, ttl=ttl, category=CacheConfig.CATEGORY_ANALYTICS)
+        return cache.set(key, data, ttl=ttl, category=CacheConfig.CATEGORY_ANALYTICS, company_id=company_id)
     
     @staticmethod
     def get_report_data(report_type, company_id, params_hash):
         """Get cached report data"""
         key = f"{CacheConfig.PREFIX_ANALYTICS}report:{report_type}:{company_id}:{params_hash}"
-        return cache.get(key)
+        return cache.get(key, company_id=company_id, category=CacheConfig.CATEGORY_ANALYTICS)
     
     @staticmethod
     def set_report_data(report_type, company_id, params_hash, data, ttl=CacheConfig.TTL_LONG):
         """Cache report data"""
         key = f"{CacheConfig.PREFIX_ANALYTICS}report:{report_type}:{company_id}:{params_hash}"
-        return cache.set(key, data, ttl=ttl, category=CacheConfig.CATEGORY_ANALYTICS)
+        return cache.set(key, data, ttl=ttl, category=CacheConfig.CATEGORY_ANALYTICS, company_id=company_id)
+    
+    @staticmethod
+    def get_reports(report_types, company_id, params_hash):
+        """Get several cached reports for one dashboard in one round trip; {report_type: data} for those cached"""
+        keys = {f"{CacheConfig.PREFIX_ANALYTICS}report:{report_type}:{company_id}:{params_hash}": report_type
+                for report_type in report_types}
+        found = cache.get_many(keys, company_id=company_id, category=CacheConfig.CATEGORY_ANALYTICS)
+        return {keys[key]: data for key, data in found.items()}
+    
+    @staticmethod
+    def set_reports(company_id, params_hash, reports, ttl=CacheConfig.TTL_LONG):
+        """Cache several reports, keyed by report type, in one round trip"""
+        return cache.set_many({
+            f"{CacheConfig.PREFIX_ANALYTICS}report:{report_type}:{company_id}:{params_hash}": data
+            for report_type, data in reports.items()
+        }, ttl=ttl, category=CacheConfig.CATEGORY_ANALYTICS, company_id=company_id)
 
 
 class SearchCache:
@@ -354,6 +1171,33 @@ class SearchCache:
         return cache.set(key, results, ttl=ttl)
 
 
+# Bumps table versions and dates them strictly after every earlier bump of the
+# tenant, so two writes in the same second still get different Last-Modified times
+_BUMP_VERSIONS_SCRIPT = """
+local latest = tonumber(redis.call('hget', KEYS[1], 'latest:modified') or '0')
+local modified = math.max(latest + 1, tonumber(ARGV[1]))
+for i = 2, #ARGV do
+    redis.call('hincrby', KEYS[1], ARGV[i], 1)
+    redis.call('hset', KEYS[1], ARGV[i] .. ':modified', modified)
+end
+redis.call('hset', KEYS[1], 'latest:modified', modified)
+return modified
+"""
+
+
+def _bump_versions_local(client, keys, args):
+    latest = client.hget(keys[0], 'latest:modified')
+    modified = max(int(latest) + 1 if latest is not None else 0, int(args[0]))
+    for table in args[1:]:
+        client.hincrby(keys[0], table, 1)
+        client.hset(keys[0], f"{table}:modified", modified)
+    client.hset(keys[0], 'latest:modified', modified)
+    return modified
+
+
+LocalRedis.register_script(_BUMP_VERSIONS_SCRIPT, _bump_versions_local)
+
+
 class APIResponseCache:
     """Manage API response caching"""
     
@@ -362,14 +1206,69 @@ class APIResponseCache:
         """Get cached API response"""
         params_hash = hashlib.md5(str(sorted(params.items())).encode()).hexdigest()[:8]
         key = f"{CacheConfig.PREFIX_API}{company_id}:{endpoint}:{params_hash}"
-        return cache.get(key)
+        return cache.get(key, company_id=company_id, category=CacheConfig.CATEGORY_COMPANY_DATA)
     
     @staticmethod
     def set_api_response(endpoint, params, company_id, response, ttl=CacheConfig.TTL_SHORT):
         """Cache API response"""
         params_hash = hashlib.md5(str(sorted(params.items())).encode()).hexdigest()[:8]
         key = f"{CacheConfig.PREFIX_API}{company_id}:{endpoint}:{params_hash}"
-        return cache.set(key, response, ttl=ttl, category=CacheConfig.CATEGORY_COMPANY_DATA)
+        return cache.set(key, response, ttl=ttl, category=CacheConfig.CATEGORY_COMPANY_DATA, company_id=company_id)
+    
+    @staticmethod
+    def _versions_key(company_id):
+        return f"{CacheConfig.PREFIX_API}versions:{company_id}"
+    
+    @staticmethod
+    def data_versions(company_id, tables):
+        """
+        (version, last modified unix time) of a tenant's tables, read in one round trip;
+        None when caching is unavailable. The version changes with every committed write.
+        """
+        if not cache.redis:
+            return None
+        
+        key = APIResponseCache._versions_key(company_id)
+        try:
+            values = cache.redis.hmget(key, [field for table in tables for field in (table, f"{table}:modified")])
+            now = int(time.time())
+            unknown = [table for table, modified in zip(tables, values[1::2]) if modified is None]
+            if unknown:
+                # Nothing written since versions were kept: date the current data from now on
+                cache.redis.hset(key, mapping={f"{table}:modified": now for table in unknown})
+            version = ':'.join(counter or '0' for counter in values[0::2])
+            return version, max(int(modified) if modified is not None else now for modified in values[1::2])
+        except redis.RedisError as e:
+            current_app.logger.error(f"API data version read error: {e}")
+            return None
+    
+    @staticmethod
+    def bump_versions(company_id, tables):
+        """Give a tenant's tables new versions after a write; the hash never expires so versions never repeat"""
+        if not cache.redis:
+            return False
+        
+        key = APIResponseCache._versions_key(company_id)
+        # Dated at least to the next second, so a response served earlier in this second is never still "current"
+        try:
+            cache.redis.eval(_BUMP_VERSIONS_SCRIPT, 1, key, int(time.time()) + 1, *tables)
+            return True
+        except redis.RedisError as e:
+            current_app.logger.error(f"API data version bump error: {e}")
+            return False
+    
+    @staticmethod
+    def get_response(company_id, etag):
+        """Serialized response stored for an ETag: {'body', 'last_modified'}"""
+        return cache.get(f"{CacheConfig.PREFIX_API}{company_id}:response:{etag}",
+                         company_id=company_id, category=CacheConfig.CATEGORY_COMPANY_DATA)
+    
+    @staticmethod
+    def set_response(company_id, etag, body, last_modified, ttl=CacheConfig.TTL_MEDIUM):
+        """Store a serialized response under its ETag; a new data version means a new ETag, so it never goes stale"""
+        return cache.set(f"{CacheConfig.PREFIX_API}{company_id}:response:{etag}",
+                         {'body': body, 'last_modified': last_modified}, ttl=ttl,
+                         category=CacheConfig.CATEGORY_COMPANY_DATA, company_id=company_id)
 
 
 # Cache Warming Functions
@@ -405,14 +1304,13 @@ class CacheWarmer:
                 'settings': user.company.settings
             }
             key = f"{CacheConfig.PREFIX_COMPANY}{user.company.id}"
-            cache.set(key, company_data, category=CacheConfig.CATEGORY_COMPANY_DATA)
+            cache.set(key, company_data, category=CacheConfig.CATEGORY_COMPANY_DATA, company_id=user.company.id)
     
     @staticmethod
     def warm_dashboard_cache(company_id):
-        """Warm up dashboard analytics cache"""
-        # This would trigger calculation and caching of dashboard metrics
-        # Implementation depends on specific analytics functions
-        pass
+        """Warm up dashboard analytics cache; returns the dashboard sections that were computed"""
+        from utils.dashboard_warmer import dashboard_warmer
+        return dashboard_warmer.warm(company_id)
 
 
 # Cache Invalidation Strategies
@@ -422,40 +1320,41 @@ class CacheInvalidator:
     @staticmethod
     def invalidate_user_cache(user_id):
         """Invalidate all cache entries for a user"""
-        patterns = [
-            f"{CacheConfig.PREFIX_USER}{user_id}*",
-            f"{CacheConfig.PREFIX_SESSION}{user_id}*"
-        ]
-        
-        for pattern in patterns:
-            CacheInvalidator._delete_pattern(pattern)
+        # The trailing ':' keeps user 1 from matching user 12's keys
+        cache.delete(f"{CacheConfig.PREFIX_SESSION}{user_id}")
+        CacheInvalidator._delete_pattern(f"{CacheConfig.PREFIX_USER}{user_id}:*")
     
     @staticmethod
     def invalidate_company_cache(company_id):
-        """Invalidate all cache entries for a company"""
-        cache.invalidate_category(CacheConfig.CATEGORY_COMPANY_DATA)
-        cache.invalidate_category(CacheConfig.CATEGORY_FINANCIAL)
-        cache.invalidate_category(CacheConfig.CATEGORY_INVENTORY)
-        cache.invalidate_category(CacheConfig.CATEGORY_CRM)
+        """Invalidate all cache entries for a company, leaving other tenants' entries alone"""
+        cache.invalidate_namespace(company_id, *CacheConfig.TENANT_CATEGORIES)
     
     @staticmethod
-    def invalidate_analytics_cache():
-        """Invalidate analytics cache"""
-        cache.invalidate_category(CacheConfig.CATEGORY_ANALYTICS)
+    def invalidate_analytics_cache(company_id):
+        """Invalidate a company's analytics cache"""
+        cache.invalidate_namespace(company_id, CacheConfig.CATEGORY_ANALYTICS)
     
     @staticmethod
     def _delete_pattern(pattern):
-        """Delete keys matching pattern"""
+        """Delete keys matching pattern, scanning in batches so Redis is never blocked"""
         if not redis_manager.is_enabled:
-            return
+            return 0
         
         try:
             redis_client = redis_manager.get_client()
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
+            deleted = 0
+            batch = []
+            for key in redis_client.scan_iter(match=pattern, count=CacheConfig.SCAN_BATCH):
+                batch.append(key)
+                if len(batch) >= CacheConfig.SCAN_BATCH:
+                    deleted += cache._delete_keys(batch)
+                    batch = []
+            if batch:
+                deleted += cache._delete_keys(batch)
+            return deleted
         except Exception as e:
             current_app.logger.error(f"Pattern deletion error: {e}")
+            return 0
 
 
 # Cache Monitoring
@@ -474,17 +1373,32 @@ class CacheMonitor:
             
             return {
                 'enabled': True,
+                'backend': 'local' if redis_manager.is_local else 'redis',
                 'connected_clients': info.get('connected_clients', 0),
                 'used_memory': info.get('used_memory_human', '0B'),
                 'keyspace_hits': info.get('keyspace_hits', 0),
                 'keyspace_misses': info.get('keyspace_misses', 0),
                 'hit_ratio': CacheMonitor._calculate_hit_ratio(info),
-                'total_keys': sum(db_info.get('keys', 0) for db_key, db_info in info.items() if db_key.startswith('db'))
+                'evicted_keys': info.get('evicted_keys', 0),
+                'total_keys': sum(db_info.get('keys', 0) for db_key, db_info in info.items() if db_key.startswith('db')),
+                'tiers': cache.tier_stats()
             }
         except Exception as e:
             current_app.logger.error(f"Cache stats error: {e}")
             return {'enabled': True, 'error': str(e)}
     
+    @staticmethod
+    def get_key_metrics(days=1):
+        """Hits, misses, latency and size figures per key prefix and category, summed over all workers"""
+        if not redis_manager.is_enabled:
+            return {'enabled': False}
+        
+        try:
+            return cache.metrics.collect(days=days)
+        except Exception as e:
+            current_app.logger.error(f"Cache metrics error: {e}")
+            return {'error': str(e)}
+    
     @staticmethod
     def _calculate_hit_ratio(info):
         """Calculate cache hit ratio"""
@@ -0,0 +1,242 @@
+"""
+Cache Metrics for RahaSoft ERP
+Counts hits, misses, writes, deletes, errors and L1 evictions for every cache
+key prefix (analytics:, search:, ...) and category, with latency histograms for
+reads and writes and a histogram of stored payload sizes. Each worker counts in
+process and every few seconds adds its counts to per-day hashes in the cache
+backend, so a report covers every worker that shares the cache.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+NAMESPACE_PREFIX = "ns:"  # Matches CacheConfig.PREFIX_NAMESPACE
+FLUSH_INTERVAL = 10
+RETENTION_DAYS = 8
+
+
+def _bucket(value, bounds):
+    """Label of the histogram bucket a value falls in."""
+    for bound in bounds:
+        if value <= bound:
+            return str(bound)
+    return 'inf'
+
+
+def _percentile(histogram, bounds, fraction):
+    """Upper bound of the bucket holding the given fraction of observations; None past the last bound."""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    running = 0
+    for label in [str(bound) for bound in bounds] + ['inf']:
+        running += histogram.get(label, 0)
+        if running >= total * fraction:
+            return None if label == 'inf' else float(label)
+    return None
+
+
+class CacheMetrics:
+    """Per-prefix and per-category cache counters, aggregated across workers"""
+
+    KEY_PREFIX = "cache:metrics:"
+
+    def __init__(self, get_client):
+        self.enabled = True
+        self.flush_interval = FLUSH_INTERVAL
+        self._get_client = get_client
+        self._counts = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def configure(self, enabled=True, flush_interval=FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+
+    @staticmethod
+    def groups_for(cache_key, category=None):
+        """The prefix group and, when known, category group a key is counted under."""
+        if cache_key.startswith(NAMESPACE_PREFIX):
+            # ns:{company_id}:{category}:{version}:{key}
+            parts = cache_key.split(':', 4)
+            if len(parts) == 5:
+                category = category or parts[2]
+                cache_key = parts[4]
+        prefix = cache_key.split(':', 1)[0] + ':' if ':' in cache_key else '(none)'
+        if category:
+            return (f"prefix:{prefix}", f"category:{category}")
+        return (f"prefix:{prefix}",)
+
+    def observe(self, operation, cache_keys, category, seconds, values=None):
+        """
+        Count one get, set or delete over cache_keys that took `seconds`.
+        For gets, values are the raw values found (None for a miss); for sets, the encoded payloads.
+        """
+        if not self.enabled:
+            return
+        latency = f"{operation}_ms_le_{_bucket(seconds * 1000, LATENCY_BUCKETS_MS)}"
+        elapsed_us = int(seconds * 1_000_000)
+        touched = set()
+        with self._lock:
+            for position, cache_key in enumerate(cache_keys):
+                groups = self.groups_for(cache_key, category)
+                value = values[position] if values is not None else None
+                for group in groups:
+                    counts = self._counts[group]
+                    counts[f"{operation}_keys"] += 1
+                    if operation == 'get':
+                        counts['hits' if value is not None else 'misses'] += 1
+                        if value is not None:
+                            counts['bytes_read'] += len(value)
+                    elif operation == 'set':
+                        counts['bytes_written'] += len(value)
+                        counts[f"size_le_{_bucket(len(value), SIZE_BUCKETS)}"] += 1
+                touched.update(groups)
+            # A batch is one call, timed once for each group it touched
+            for group in touched:
+                counts = self._counts[group]
+                counts[f"{operation}_calls"] += 1
+                counts[f"{operation}_us"] += elapsed_us
+                counts[latency] += 1
+        self._ensure_flusher()
+
+    def error(self, operation, cache_keys, category=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            for group in {group for cache_key in cache_keys for group in self.groups_for(cache_key, category)}:
+                self._counts[group][f"{operation}_errors"] += 1
+
+    def evicted(self, cache_key):
+        """Count an entry this worker's L1 dropped to stay within its byte budget."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for group in self.groups_for(cache_key):
+                self._counts[group]['l1_evictions'] += 1
+
+    # Aggregation across workers
+    def _day_key(self, day, group=None):
+        return f"{self.KEY_PREFIX}{day.isoformat()}:{group if group is not None else 'groups'}"
+
+    def flush(self):
+        """Add this worker's counts since the last flush to today's shared hashes."""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(Counter)
+        if not counts:
+            return True
+        client = self._get_client()
+        if client is None:
+            return False
+
+        today = date.today()
+        ttl = RETENTION_DAYS * 86400
+        try:
+            pipe = client.pipeline(transaction=False)
+            for group, fields in counts.items():
+                key = self._day_key(today, group)
+                for field, amount in fields.items():
+                    pipe.hincrby(key, field, amount)
+                pipe.expire(key, ttl)
+            pipe.sadd(self._day_key(today), *counts)
+            pipe.expire(self._day_key(today), ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            # Keep the counts for the next attempt
+            with self._lock:
+                for group, fields in counts.items():
+                    self._counts[group].update(fields)
+            logging.getLogger(__name__).warning(f"Cache metrics flush failed: {e}")
+            return False
+
+    def _ensure_flusher(self):
+        """Start this process's flush thread (threads do not survive a fork, so check the pid)."""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=run, name='cache-metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def collect(self, days=1):
+        """
+        Totals over the last `days` days (today included) from every worker, as
+        {'prefixes': {prefix: stats}, 'categories': {category: stats}}.
+        """
+        self.flush()
+        client = self._get_client()
+        report = {'days': days, 'flush_interval': self.flush_interval, 'prefixes': {}, 'categories': {}}
+        if client is None:
+            return report
+
+        today = date.today()
+        day_list = [today - timedelta(days=offset) for offset in range(min(days, RETENTION_DAYS))]
+        pipe = client.pipeline(transaction=False)
+        for day in day_list:
+            pipe.smembers(self._day_key(day))
+        groups_by_day = pipe.execute()
+
+        pipe = client.pipeline(transaction=False)
+        requested = []
+        for day, groups in zip(day_list, groups_by_day):
+            for group in groups:
+                pipe.hgetall(self._day_key(day, group))
+                requested.append(group)
+        totals = defaultdict(Counter)
+        for group, fields in zip(requested, pipe.execute()):
+            totals[group].update({field: int(amount) for field, amount in fields.items()})
+
+        for group, counts in sorted(totals.items()):
+            kind, name = group.split(':', 1)
+            report['prefixes' if kind == 'prefix' else 'categories'][name] = self._summarize(counts)
+        return report
+
+    @staticmethod
+    def _summarize(counts):
+        def histogram(prefix, bounds):
+            return {label: counts.get(f"{prefix}{label}", 0) for label in [str(bound) for bound in bounds] + ['inf']}
+
+        def latency(operation):
+            buckets = histogram(f"{operation}_ms_le_", LATENCY_BUCKETS_MS)
+            calls = counts.get(f"{operation}_calls", 0)
+            return {
+                'calls': calls,
+                'keys': counts.get(f"{operation}_keys", 0),
+                'errors': counts.get(f"{operation}_errors", 0),
+                'avg_ms': round(counts.get(f"{operation}_us", 0) / calls / 1000, 3) if calls else 0,
+                'p50_ms': _percentile(buckets, LATENCY_BUCKETS_MS, 0.5),
+                'p95_ms': _percentile(buckets, LATENCY_BUCKETS_MS, 0.95),
+                'p99_ms': _percentile(buckets, LATENCY_BUCKETS_MS, 0.99),
+                'histogram_ms': buckets,
+            }
+
+        hits, misses = counts.get('hits', 0), counts.get('misses', 0)
+        written = counts.get('set_keys', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses) * 100, 2) if hits + misses else 0,
+            'get': latency('get'),
+            'set': latency('set'),
+            'delete': latency('delete'),
+            'bytes_read': counts.get('bytes_read', 0),
+            'bytes_written': counts.get('bytes_written', 0),
+            'avg_size': round(counts.get('bytes_written', 0) / written) if written else 0,
+            'size_histogram': histogram('size_le_', SIZE_BUCKETS),
+            'l1_evictions': counts.get('l1_evictions', 0),
+        }
@@ -0,0 +1,233 @@
+"""
+Catalogue Classification for RahaSoft ERP
+Classifies a tenant's whole catalogue by revenue contribution (ABC) and weekly
+demand variability (XYZ) in one pass of array operations, and writes back only
+the products whose class changed. The classes are stored on Product so reports
+and listings can filter and aggregate by them through an index.
+"""
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, func, select
+
+from extensions import db
+from models.product import Product
+from models.sale import ProductSalesDaily
+from utils.demand_forecast import DemandForecaster
+
+HISTORY_DAYS = 365
+MIN_SPAN_WEEKS = 4  # A product's first week of demand is judged against at least a month
+ABC_CLASSES = ('A', 'B', 'C')
+XYZ_CLASSES = ('X', 'Y', 'Z')
+
+DEFAULT_OPTIONS = {
+    'abc_thresholds': (0.8, 0.95),  # Cumulative revenue share closing classes A and B
+    'xyz_thresholds': (0.5, 1.0),  # Coefficient of variation of weekly demand closing X and Y
+}
+
+
+class ClassificationError(ValueError):
+    """Invalid classification thresholds"""
+
+
+def _align(product_ids, ids, values, fill):
+    """Spread `values` keyed by `ids` over the sorted `product_ids`; ids outside it are dropped."""
+    aligned = np.full(len(product_ids), fill, dtype=np.float64)
+    if len(product_ids) and len(ids):
+        positions = np.minimum(np.searchsorted(product_ids, ids), len(product_ids) - 1)
+        known = product_ids[positions] == ids
+        aligned[positions[known]] = values[known]
+    return aligned
+
+
+class CatalogueClassifier:
+    """Batch ABC / XYZ classification of every active product in a company"""
+
+    @staticmethod
+    def options(**overrides):
+        """Merge and validate classification thresholds."""
+        options = dict(DEFAULT_OPTIONS, **{key: value for key, value in overrides.items() if value is not None})
+        for name in ('abc_thresholds', 'xyz_thresholds'):
+            low, high = options[name]
+            if not 0 < low <= high:
+                raise ClassificationError(f'{name} must be two increasing positive values')
+        if options['abc_thresholds'][1] > 1:
+            raise ClassificationError('abc_thresholds are revenue shares and cannot exceed 1')
+        return options
+
+    @staticmethod
+    def load_products(company_id):
+        """Active product ids in id order with their stored classes."""
+        rows = db.session.execute(
+            select(Product.id, Product.abc_class, Product.xyz_class)
+            .where(Product.company_id == company_id, Product.is_active == True)
+            .order_by(Product.id)
+        ).all()
+        product_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        return product_ids, [row[1] for row in rows], [row[2] for row in rows]
+
+    @staticmethod
+    def load_revenue(company_id, product_ids, since, until):
+        """Sales revenue per product over [since, until), aligned with `product_ids`, from the daily rollup."""
+        daily = ProductSalesDaily
+        connection = db.session.connection()
+        result = connection.execute(
+            select(Product.id, func.sum(daily.revenue)).join(
+                Product, (Product.company_id == daily.company_id) & (Product.product_name == daily.product_name)
+            ).where(
+                daily.company_id == company_id,
+                daily.day >= since,
+                daily.day < until
+            ).group_by(Product.id)
+        )
+        try:
+            rows = np.array(result.cursor.fetchall(), dtype=np.float64).reshape(-1, 2)
+        finally:
+            result.close()
+
+        return _align(product_ids, rows[:, 0].astype(np.int64), rows[:, 1], 0.0)
+
+    @staticmethod
+    def weekly_cv(history, product_ids):
+        """
+        Coefficient of variation of weekly demand per product, aligned with `product_ids`.
+
+        Weeks are counted back from the end of the window so the latest is always
+        complete; each product is measured from its first week with demand, zero
+        weeks included. Products with no demand get infinity.
+        """
+        weeks = history.history_days // 7
+        if not len(history) or not weeks:
+            return np.full(len(product_ids), np.inf)
+        week = (history.history_days - 1 - history.days) // 7  # 0 = the latest week
+        kept = week < weeks
+        positions, week, quantities = history.positions[kept], week[kept], history.quantities[kept]
+
+        # Merge days into (product, week) totals before taking moments
+        keys, merged = np.unique(positions * weeks + week, return_inverse=True)
+        totals = np.bincount(merged, weights=quantities, minlength=len(keys))
+        key_positions = keys // weeks
+        oldest = np.zeros(len(history), dtype=np.int64)
+        np.maximum.at(oldest, key_positions, keys % weeks)
+        spans = np.clip(oldest + 1, MIN_SPAN_WEEKS, weeks)
+
+        total = np.bincount(key_positions, weights=totals, minlength=len(history))
+        squares = np.bincount(key_positions, weights=totals ** 2, minlength=len(history))
+        mean = total / spans
+        std = np.sqrt(np.maximum(squares / spans - mean ** 2, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            history_cv = np.where(mean > 0, std / mean, np.inf)
+
+        return _align(product_ids, history.product_ids, history_cv, np.inf)
+
+    @staticmethod
+    def classify(product_ids, revenue, cv, **overrides):
+        """Classify aligned arrays of products, revenue and demand CV; returns a DataFrame by product_id."""
+        options = CatalogueClassifier.options(**overrides)
+        total = revenue.sum()
+
+        # Rank by revenue; a product is in A while the share of revenue ranked above it is under the threshold
+        order = np.argsort(-revenue, kind='stable')
+        share = revenue / total if total > 0 else np.zeros(len(revenue))
+        share_before = np.empty(len(revenue))
+        share_before[order] = np.cumsum(share[order]) - share[order]
+        a_limit, b_limit = options['abc_thresholds']
+        abc = np.where(revenue <= 0, 'C', np.where(share_before < a_limit, 'A',
+                                                   np.where(share_before < b_limit, 'B', 'C')))
+
+        x_limit, y_limit = options['xyz_thresholds']
+        xyz = np.where(cv <= x_limit, 'X', np.where(cv <= y_limit, 'Y', 'Z'))
+
+        return pd.DataFrame({
+            'revenue': revenue,
+            'revenue_share': share,
+            'cumulative_share': share_before + share,
+            'demand_cv': cv,
+            'abc_class': abc,
+            'xyz_class': xyz,
+        }, index=pd.Index(product_ids, name='product_id'))
+
+    @staticmethod
+    def save(company_id, classification, abc_classes, xyz_classes):
+        """Write classes only for products whose class changed; the caller commits."""
+        abc = classification['abc_class'].to_numpy()
+        xyz = classification['xyz_class'].to_numpy()
+        changed = (abc != np.array(abc_classes, dtype=object)) | (xyz != np.array(xyz_classes, dtype=object))
+        if not changed.any():
+            return 0
+
+        products = Product.__table__
+        statement = products.update().where(
+            products.c.id == bindparam('class_product_id'),
+            products.c.company_id == bindparam('class_company_id')
+        ).values(abc_class=bindparam('class_abc'), xyz_class=bindparam('class_xyz'))
+        return db.session.execute(statement, [
+            {
+                'class_product_id': int(product_id),
+                'class_company_id': company_id,
+                'class_abc': str(abc_class),
+                'class_xyz': str(xyz_class),
+            }
+            for product_id, abc_class, xyz_class in zip(
+                classification.index[changed], abc[changed], xyz[changed])
+        ]).rowcount
+
+    @staticmethod
+    def run(company_id, history_days=HISTORY_DAYS, until=None, **overrides):
+        """Load, classify and save one tenant in a single transaction; returns a timing summary."""
+        options = CatalogueClassifier.options(**overrides)
+        started = time.perf_counter()
+        until = until or date.today()
+        product_ids, abc_classes, xyz_classes = CatalogueClassifier.load_products(company_id)
+        revenue = CatalogueClassifier.load_revenue(
+            company_id, product_ids, until - timedelta(days=history_days), until)
+        history = DemandForecaster.load_history(company_id, history_days, until)
+        loaded = time.perf_counter()
+        classification = CatalogueClassifier.classify(
+            product_ids, revenue, CatalogueClassifier.weekly_cv(history, product_ids), **options)
+        computed = time.perf_counter()
+        try:
+            changed = CatalogueClassifier.save(company_id, classification, abc_classes, xyz_classes)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return {
+            'company_id': company_id,
+            'products': len(product_ids),
+            'products_changed': changed,
+            'abc': classification['abc_class'].value_counts().reindex(ABC_CLASSES, fill_value=0).to_dict(),
+            'xyz': classification['xyz_class'].value_counts().reindex(XYZ_CLASSES, fill_value=0).to_dict(),
+            'load_seconds': round(loaded - started, 3),
+            'classify_seconds': round(computed - loaded, 3),
+            'save_seconds': round(time.perf_counter() - computed, 3),
+        }
+
+    @staticmethod
+    def summary(company_id, abc_class=None, xyz_class=None):
+        """Product count, units and stock value per (ABC, XYZ) cell, grouped on the class index."""
+        query = db.session.query(
+            Product.abc_class,
+            Product.xyz_class,
+            func.count(Product.id).label('product_count'),
+            func.coalesce(func.sum(Product.quantity), 0).label('total_quantity'),
+            func.coalesce(func.sum(Product.quantity * Product.cost_price), 0).label('total_cost_value'),
+            func.coalesce(func.sum(Product.quantity * Product.price), 0).label('total_selling_value')
+        ).filter(
+            Product.company_id == company_id,
+            Product.is_active == True
+        )
+        query = CatalogueClassifier.filter(query, abc_class, xyz_class)
+        return query.group_by(Product.abc_class, Product.xyz_class).order_by(
+            Product.abc_class, Product.xyz_class).all()
+
+    @staticmethod
+    def filter(query, abc_class=None, xyz_class=None):
+        """Restrict a product query to the given classes; unknown values are ignored."""
+        if abc_class in ABC_CLASSES:
+            query = query.filter(Product.abc_class == abc_class)
+        if xyz_class in XYZ_CLASSES:
+            query = query.filter(Product.xyz_class == xyz_class)
+        return query
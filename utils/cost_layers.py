@@ -0,0 +1,343 @@
+"""
+Cost Layers for RahaSoft ERP
+Keeps FIFO cost layers and a running weighted-average cost for every product,
+updated incrementally as stock movements are written. Each product carries its
+cumulative receipts and cost of goods sold, and an end-of-day copy is kept for
+days it moved, so valuation as of any date and COGS for any period read one
+position per product instead of replaying movement history.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select
+
+from extensions import db
+from models.product import Product, CostLayer, ProductCost, ProductCostDaily
+
+METHODS = ('fifo', 'average')
+
+
+class CostingError(ValueError):
+    """Unknown costing method or invalid period"""
+
+
+class _Costing:
+    """One product's cost position while a batch of movements is applied to it"""
+
+    def __init__(self, product_id, company_id, cost_price, state=None, layers=()):
+        self.product_id = product_id
+        self.company_id = company_id
+        self.cost_price = cost_price
+        self.is_new = state is None
+        self.opened = not self.is_new
+        self.state = dict(state) if state else dict.fromkeys(ProductCost.STATE_FIELDS, 0)
+        self.open_layers = list(layers)  # Oldest first
+        self.new_layers = []
+        self.changed_layers = {}
+
+    @property
+    def on_hand(self):
+        return self.state['units_in'] - self.state['units_out']
+
+    def fallback_cost(self):
+        """Cost for stock with no layer behind it: the running average, else the product's cost price."""
+        return self.state['average_cost'] or self.cost_price or 0.0
+
+    def apply(self, change, unit_cost, at, movement_type):
+        if change > 0:
+            self.receive(change, unit_cost, at, movement_type)
+        elif change < 0:
+            self.issue(-change)
+
+    def receive(self, quantity, unit_cost, at, movement_type):
+        state = self.state
+        if unit_cost is None:
+            unit_cost = self.cost_price if self.cost_price is not None else self.fallback_cost()
+
+        # Units already issued beyond stock were charged provisionally; this receipt covers them first
+        backlog = state['units_out'] - state['units_in']
+        covered = min(max(backlog, 0), quantity)
+        if covered:
+            for method in METHODS:
+                charged = state[f'backlog_{method}_cost'] * covered / backlog
+                state[f'cogs_{method}'] += covered * unit_cost - charged
+                state[f'backlog_{method}_cost'] -= charged
+
+        on_hand = self.on_hand
+        if on_hand + quantity > 0:
+            state['average_cost'] = (
+                (max(on_hand, 0) * state['average_cost'] + (quantity - covered) * unit_cost) / (on_hand + quantity)
+            )
+
+        layer = {
+            'product_id': self.product_id,
+            'company_id': self.company_id,
+            'movement_type': movement_type,
+            'unit_cost': unit_cost,
+            'quantity': quantity,
+            'remaining': quantity - covered,
+            'start_position': state['units_in'],
+            'received_at': at,
+        }
+        self.new_layers.append(layer)
+        if layer['remaining']:
+            self.open_layers.append(layer)
+        state['units_in'] += quantity
+        state['cost_in'] += quantity * unit_cost
+
+    def issue(self, quantity):
+        state = self.state
+        fifo_cost = 0.0
+        needed = quantity
+        while needed and self.open_layers:
+            layer = self.open_layers[0]
+            taken = min(layer['remaining'], needed)
+            fifo_cost += taken * layer['unit_cost']
+            layer['remaining'] -= taken
+            needed -= taken
+            if 'id' in layer:
+                self.changed_layers[layer['id']] = layer
+            if not layer['remaining']:
+                self.open_layers.pop(0)
+
+        fallback = self.fallback_cost()
+        average_cost = state['average_cost'] if self.on_hand > 0 else fallback
+        if needed:
+            # Issued beyond the stock on record: charge provisionally until a receipt arrives
+            fifo_cost += needed * fallback
+            state['backlog_fifo_cost'] += needed * fallback
+            state['backlog_average_cost'] += needed * average_cost
+        state['units_out'] += quantity
+        state['cogs_fifo'] += fifo_cost
+        state['cogs_average'] += quantity * average_cost
+
+    def open(self, opening_quantity, at):
+        """Open the position of a product first seen mid-life, at its cost price."""
+        self.opened = True
+        if opening_quantity:
+            self.apply(opening_quantity, None, at, 'opening')
+
+
+class CostLayers:
+    """Incremental FIFO / weighted-average costing and the valuation and COGS reads built on it"""
+
+    @staticmethod
+    def method(method):
+        if method not in METHODS:
+            raise CostingError(f"Unknown costing method '{method}'; expected one of {', '.join(METHODS)}")
+        return method
+
+    @staticmethod
+    def record(session, movements):
+        """
+        Apply written movements (dicts of StockMovement columns) to their products' cost positions.
+
+        Movements are applied in the order given. A product seen for the first
+        time is opened with its previous quantity at the product's cost price.
+        """
+        movements = [m for m in movements if (m['new_quantity'] or 0) != (m['previous_quantity'] or 0)]
+        if not movements:
+            return
+        now = datetime.utcnow()
+        issued = {m['product_id'] for m in movements if m['new_quantity'] < m['previous_quantity']}
+        costings = CostLayers._load(session, {m['product_id'] for m in movements}, issued)
+
+        snapshots = {}
+        for movement in movements:
+            costing = costings[movement['product_id']]
+            at = movement.get('created_at') or now
+            if not costing.opened:
+                costing.open(movement['previous_quantity'] or 0, at)
+            costing.apply(movement['new_quantity'] - movement['previous_quantity'], movement.get('unit_cost'),
+                          at, movement['movement_type'])
+            snapshot = {field: costing.state[field] for field in ProductCostDaily.SNAPSHOT_FIELDS}
+            snapshots[(costing.product_id, at.date())] = dict(
+                snapshot, product_id=costing.product_id, day=at.date(), company_id=costing.company_id)
+
+        CostLayers._save(session, costings.values(), list(snapshots.values()), now)
+
+    @staticmethod
+    def _load(session, product_ids, issued_ids):
+        """
+        Cost positions for the products in a batch, plus open layers for those issuing stock.
+
+        The product rows are locked until the caller's transaction ends (in id
+        order, so batches never deadlock), so concurrent movements for the same
+        product apply to its cost position one after the other instead of both
+        reading it and the later save overwriting the earlier one.
+        """
+        costs = ProductCost.__table__
+        products = Product.__table__
+        rows = session.execute(
+            select(products.c.id, products.c.company_id, products.c.cost_price,
+                   *[costs.c[field] for field in ProductCost.STATE_FIELDS], costs.c.id.label('cost_id'))
+            .outerjoin(costs, costs.c.product_id == products.c.id)
+            .where(products.c.id.in_(product_ids))
+            .order_by(products.c.id)
+            .with_for_update(of=products)
+        ).all()
+
+        layers = CostLayer.__table__
+        open_layers = {}
+        if issued_ids:
+            for layer in session.execute(
+                select(layers.c.id, layers.c.product_id, layers.c.unit_cost, layers.c.remaining)
+                .where(layers.c.product_id.in_(issued_ids), layers.c.remaining > 0)
+                .order_by(layers.c.product_id, layers.c.start_position)
+            ).mappings():
+                open_layers.setdefault(layer['product_id'], []).append(dict(layer))
+
+        costings = {}
+        for row in rows:
+            state = None
+            if row.cost_id is not None:
+                state = {field: row._mapping[field] for field in ProductCost.STATE_FIELDS}
+            costings[row.id] = _Costing(row.id, row.company_id, row.cost_price, state, open_layers.get(row.id, ()))
+        return costings
+
+    @staticmethod
+    def _save(session, costings, snapshots, now):
+        costs = ProductCost.__table__
+        created = []
+        updated = []
+        new_layers = []
+        changed_layers = []
+        for costing in costings:
+            if costing.is_new:
+                created.append(dict(costing.state, product_id=costing.product_id,
+                                    company_id=costing.company_id, updated_at=now))
+            else:
+                updated.append(dict({f'cost_{field}': value for field, value in costing.state.items()},
+                                    cost_product_id=costing.product_id, cost_updated_at=now))
+            new_layers.extend(costing.new_layers)
+            changed_layers.extend({'layer_id': layer_id, 'layer_remaining': layer['remaining']}
+                                  for layer_id, layer in costing.changed_layers.items())
+
+        if created:
+            session.execute(insert(ProductCost), created)
+        if updated:
+            session.execute(costs.update().where(costs.c.product_id == bindparam('cost_product_id')).values(
+                updated_at=bindparam('cost_updated_at'),
+                **{field: bindparam(f'cost_{field}') for field in ProductCost.STATE_FIELDS}
+            ), updated)
+        if new_layers:
+            session.execute(insert(CostLayer), new_layers)
+        if changed_layers:
+            layers = CostLayer.__table__
+            session.execute(layers.update().where(layers.c.id == bindparam('layer_id')).values(
+                remaining=bindparam('layer_remaining')
+            ), changed_layers)
+        CostLayers._save_snapshots(session, snapshots)
+
+    @staticmethod
+    def _save_snapshots(session, rows):
+        """Write each product's end-of-day position, replacing an earlier one for the same day."""
+        table = ProductCostDaily.__table__
+        dialect = session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            statement = upsert(table)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['product_id', 'day'],
+                set_={field: statement.excluded[field] for field in ProductCostDaily.SNAPSHOT_FIELDS}
+            ), rows)
+            return
+        for row in rows:
+            updated = session.execute(table.update().where(
+                table.c.product_id == row['product_id'], table.c.day == row['day']
+            ).values(**{field: row[field] for field in ProductCostDaily.SNAPSHOT_FIELDS})).rowcount
+            if not updated:
+                session.execute(table.insert().values(**row))
+
+    @staticmethod
+    def positions(company_id, as_of=None):
+        """
+        Each costed product's cumulative position at the end of `as_of` (now when omitted).
+
+        A past date reads the product's latest end-of-day copy on or before it
+        through the (product_id, day) index, one row per product.
+        """
+        if as_of is None or as_of >= datetime.utcnow().date():
+            source = ProductCost
+            return select(source.product_id, *[getattr(source, field) for field in ProductCostDaily.SNAPSHOT_FIELDS]
+                          ).where(source.company_id == company_id)
+
+        daily = ProductCostDaily
+        latest = select(daily.id).where(
+            daily.product_id == ProductCost.product_id, daily.day <= as_of
+        ).order_by(daily.day.desc()).limit(1).correlate(ProductCost).scalar_subquery()
+        return select(daily.product_id, *[getattr(daily, field) for field in ProductCostDaily.SNAPSHOT_FIELDS]
+                      ).select_from(ProductCost).join(daily, daily.id == latest).where(
+            ProductCost.company_id == company_id
+        )
+
+    @staticmethod
+    def valuation(company_id, as_of=None, method='fifo'):
+        """Stock on hand and its value at the end of `as_of` under FIFO or weighted-average cost."""
+        cogs_field = f'cogs_{CostLayers.method(method)}'
+        positions = CostLayers.positions(company_id, as_of).subquery()
+        row = db.session.execute(select(
+            func.count(),
+            func.coalesce(func.sum(positions.c.units_in - positions.c.units_out), 0),
+            func.coalesce(func.sum(positions.c.cost_in - positions.c[cogs_field]), 0.0)
+        )).one()
+        return {
+            'as_of': (as_of or datetime.utcnow().date()).isoformat(),
+            'method': method,
+            'products': row[0],
+            'units': int(row[1]),
+            'value': round(float(row[2]), 2)
+        }
+
+    @staticmethod
+    def cogs(company_id, start, end, method='fifo'):
+        """Cost of goods issued from the start of `start` to the end of `end` (both dates)."""
+        cogs_field = f'cogs_{CostLayers.method(method)}'
+        if start > end:
+            raise CostingError('The period must start on or before its end')
+
+        def totals(as_of):
+            positions = CostLayers.positions(company_id, as_of).subquery()
+            return db.session.execute(select(
+                func.coalesce(func.sum(positions.c.units_out), 0),
+                func.coalesce(func.sum(positions.c[cogs_field]), 0.0)
+            )).one()
+
+        closing = totals(end)
+        opening = totals(start - timedelta(days=1))
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'method': method,
+            'units': int(closing[0] - opening[0]),
+            'cogs': round(float(closing[1] - opening[1]), 2)
+        }
+
+    @staticmethod
+    def layers(product_id, as_of=None):
+        """
+        FIFO layers holding stock at the end of `as_of` (now when omitted), oldest first.
+
+        A layer covers the product's received units [start_position, start_position
+        + quantity); whatever lies below the units issued by that date is consumed.
+        """
+        query = CostLayer.query.filter(CostLayer.product_id == product_id)
+        if as_of is None or as_of >= datetime.utcnow().date():
+            layers = query.filter(CostLayer.remaining > 0).order_by(CostLayer.start_position).all()
+            return [layer.to_dict() for layer in layers]
+
+        daily = ProductCostDaily
+        issued = db.session.query(daily.units_out).filter(
+            daily.product_id == product_id, daily.day <= as_of
+        ).order_by(daily.day.desc()).limit(1).scalar()
+        if issued is None:
+            return []
+        cutoff = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+        layers = query.filter(
+            CostLayer.received_at < cutoff,
+            CostLayer.start_position + CostLayer.quantity > issued
+        ).order_by(CostLayer.start_position).all()
+        return [layer.to_dict(min(layer.start_position + layer.quantity - issued, layer.quantity))
+                for layer in layers]
@@ -0,0 +1,452 @@
+"""
+Dashboard Cache Warming for RahaSoft ERP
+Keeps the inventory, finance and CRM dashboard aggregates of recently active
+companies in the cache, so the first user of the day no longer waits for them.
+Requests record which companies are active; the scheduled warm_dashboards.py run
+and commits that write many dashboard rows recompute whatever is missing. Warming
+runs a few companies at a time across all workers, staggered, and holds back
+while the worker it runs in is serving requests.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import redis
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.crm import Customer, Lead, Opportunity
+from models.finance import Expense, ExpenseCategory, Invoice, Payment
+from utils.cache_manager import cache, CacheConfig, _acquire_lock, _release_lock
+from utils.inventory_stats import InventoryStats
+
+FINANCE = 'finance'
+FINANCE_TRENDS = 'finance_trends'
+CRM = 'crm'
+
+# Dashboard aggregates each model's writes change
+SECTIONS_BY_MODEL = {
+    Invoice: (FINANCE, FINANCE_TRENDS),
+    Payment: (FINANCE, FINANCE_TRENDS),
+    Expense: (FINANCE, FINANCE_TRENDS),
+    ExpenseCategory: (FINANCE_TRENDS,),
+    Lead: (CRM,),
+    Customer: (CRM,),
+    Opportunity: (CRM,),
+}
+
+
+class DashboardAggregates:
+    """Per-tenant dashboard figures, cached for the day until a write changes them"""
+
+    @staticmethod
+    def _cache_key(section, company_id):
+        # Figures such as "overdue" and "this month" are relative to the day they were computed on
+        return f"{CacheConfig.PREFIX_ANALYTICS}dashboard:{section}:{company_id}:{date.today().isoformat()}"
+
+    @staticmethod
+    def compute_finance(company_id):
+        """Revenue, expenses and receivables for the finance dashboard."""
+        total_revenue = db.session.query(func.sum(Invoice.total_amount)).filter(
+            Invoice.company_id == company_id,
+            Invoice.status == 'paid'
+        ).scalar() or 0
+
+        total_expenses = db.session.query(func.sum(Expense.amount)).filter(
+            Expense.company_id == company_id,
+            Expense.status == 'approved'
+        ).scalar() or 0
+
+        outstanding_invoices = db.session.query(func.sum(Invoice.total_amount - Invoice.paid_amount)).filter(
+            Invoice.company_id == company_id,
+            Invoice.status.in_(['sent', 'overdue']),
+            Invoice.total_amount > Invoice.paid_amount
+        ).scalar() or 0
+
+        overdue_invoices = Invoice.query.filter(
+            Invoice.company_id == company_id,
+            Invoice.status.in_(['sent', 'overdue']),
+            Invoice.due_date < date.today(),
+            Invoice.total_amount > Invoice.paid_amount
+        ).count()
+
+        return {
+            'total_revenue': float(total_revenue),
+            'total_expenses': float(total_expenses),
+            'outstanding_invoices': float(outstanding_invoices),
+            'overdue_invoices': overdue_invoices,
+        }
+
+    @staticmethod
+    def compute_finance_trends(company_id):
+        """Twelve months of paid revenue and approved expenses by category."""
+        monthly_revenue = []
+        for i in range(12):
+            month_start = date.today().replace(day=1) - timedelta(days=31*i)
+            month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+            revenue = db.session.query(func.sum(Invoice.total_amount)).filter(
+                Invoice.company_id == company_id,
+                Invoice.status == 'paid',
+                Invoice.invoice_date.between(month_start, month_end)
+            ).scalar() or 0
+
+            monthly_revenue.append({
+                'month': month_start.strftime('%Y-%m'),
+                'revenue': float(revenue)
+            })
+
+        monthly_revenue.reverse()
+
+        expense_categories = db.session.query(
+            ExpenseCategory.name,
+            func.sum(Expense.amount).label('total')
+        ).join(Expense).filter(
+            Expense.company_id == company_id,
+            Expense.status == 'approved'
+        ).group_by(ExpenseCategory.name).all()
+
+        return {
+            'monthly_revenue': monthly_revenue,
+            'expense_categories': [{'category': cat.name, 'amount': float(cat.total)} for cat in expense_categories]
+        }
+
+    @staticmethod
+    def compute_crm(company_id):
+        """Lead, customer and pipeline figures for the CRM dashboard."""
+        this_month_start = datetime.utcnow().date().replace(day=1)
+
+        total_leads = Lead.query.filter_by(company_id=company_id).count()
+        new_leads_this_month = Lead.query.filter(
+            Lead.company_id == company_id,
+            Lead.created_at >= this_month_start
+        ).count()
+        qualified_leads = Lead.query.filter(
+            Lead.company_id == company_id,
+            Lead.qualification_status.in_(['marketing_qualified', 'sales_qualified'])
+        ).count()
+        converted_leads = Lead.query.filter_by(company_id=company_id, lead_status='converted').count()
+
+        total_customers = Customer.query.filter_by(company_id=company_id).count()
+        active_customers = Customer.query.filter_by(company_id=company_id, customer_status='active').count()
+
+        total_pipeline_value, weighted_pipeline = db.session.query(
+            func.sum(Opportunity.estimated_value),
+            func.sum(Opportunity.estimated_value * Opportunity.probability / 100.0)
+        ).filter_by(company_id=company_id, status='open').one()
+
+        opportunities_this_month = Opportunity.query.filter(
+            Opportunity.company_id == company_id,
+            Opportunity.created_at >= this_month_start
+        ).count()
+
+        revenue_this_month = db.session.query(func.sum(Opportunity.estimated_value)).filter(
+            Opportunity.company_id == company_id,
+            Opportunity.stage == 'closed_won',
+            Opportunity.updated_at >= this_month_start
+        ).scalar() or 0
+
+        pipeline_data = db.session.query(
+            Opportunity.stage,
+            func.count(Opportunity.id).label('count'),
+            func.sum(Opportunity.estimated_value).label('value')
+        ).filter_by(company_id=company_id, status='open').group_by(Opportunity.stage).all()
+
+        return {
+            'total_leads': total_leads,
+            'new_leads_this_month': new_leads_this_month,
+            'qualified_leads': qualified_leads,
+            'total_customers': total_customers,
+            'active_customers': active_customers,
+            'total_pipeline_value': float(total_pipeline_value or 0),
+            'weighted_pipeline': float(weighted_pipeline or 0),
+            'opportunities_this_month': opportunities_this_month,
+            'revenue_this_month': float(revenue_this_month),
+            'conversion_rate': (converted_leads / total_leads * 100) if total_leads > 0 else 0,
+            'pipeline_data': [{'stage': row.stage, 'count': row.count, 'value': float(row.value or 0)}
+                              for row in pipeline_data],
+        }
+
+    @staticmethod
+    def get(section, company_id):
+        """Return one section's cached figures, computing and caching them on a miss."""
+        key = DashboardAggregates._cache_key(section, company_id)
+        category = SECTION_CATEGORIES[section]
+        data = cache.get(key, company_id=company_id, category=category)
+        if data is not None:
+            return data
+
+        data = SECTION_BUILDERS[section](company_id)
+        cache.set(key, data, ttl=CacheConfig.TTL_VERY_LONG, category=category, company_id=company_id)
+        return data
+
+    @staticmethod
+    def finance(company_id):
+        return DashboardAggregates.get(FINANCE, company_id)
+
+    @staticmethod
+    def finance_trends(company_id):
+        return DashboardAggregates.get(FINANCE_TRENDS, company_id)
+
+    @staticmethod
+    def crm(company_id):
+        return DashboardAggregates.get(CRM, company_id)
+
+    @staticmethod
+    def warm(company_id, sections=None):
+        """Compute and cache the sections that are not cached yet; returns the ones computed."""
+        warmed = []
+        for section in sections or SECTION_BUILDERS:
+            key = DashboardAggregates._cache_key(section, company_id)
+            category = SECTION_CATEGORIES[section]
+            if cache.exists(key, company_id=company_id, category=category):
+                continue
+            cache.set(key, SECTION_BUILDERS[section](company_id), ttl=CacheConfig.TTL_VERY_LONG,
+                      category=category, company_id=company_id)
+            warmed.append(section)
+        return warmed
+
+    @staticmethod
+    def invalidate(company_id, sections):
+        """Drop a tenant's cached sections after a write that changes them."""
+        for category in {SECTION_CATEGORIES[section] for section in sections}:
+            cache.delete_many([DashboardAggregates._cache_key(section, company_id) for section in sections
+                               if SECTION_CATEGORIES[section] == category],
+                              company_id=company_id, category=category)
+
+
+SECTION_BUILDERS = {
+    FINANCE: DashboardAggregates.compute_finance,
+    FINANCE_TRENDS: DashboardAggregates.compute_finance_trends,
+    CRM: DashboardAggregates.compute_crm,
+}
+SECTION_CATEGORIES = {
+    FINANCE: CacheConfig.CATEGORY_FINANCIAL,
+    FINANCE_TRENDS: CacheConfig.CATEGORY_FINANCIAL,
+    CRM: CacheConfig.CATEGORY_CRM,
+}
+
+
+class DashboardWarmer:
+    """
+    Tracks which companies are active and warms their dashboards off the request path.
+
+    Configuration (app.config):
+        DASHBOARD_WARM_CONCURRENCY: Companies warmed at once across all workers (default 2)
+        DASHBOARD_WARM_STAGGER: Average seconds between companies per warming thread (default 0.5)
+        DASHBOARD_WARM_BULK_ROWS: Dashboard rows one commit must write to trigger a warm (default 50)
+    """
+
+    ACTIVE_PREFIX = f"{CacheConfig.PREFIX_ANALYTICS}active_companies:"
+    ACTIVE_RETENTION_DAYS = 7
+    ACTIVITY_THROTTLE = 60   # Seconds between activity writes per company per worker
+    SLOT_PREFIX = "dashboard_warm:slot:"
+    COMPANY_PREFIX = "dashboard_warm:company:"
+    SLOT_TIMEOUT = 120       # Longest one company may hold a warming slot
+    SLOT_WAIT = 300          # Longest a company waits for a free slot before it is skipped
+    IDLE_POLL = 0.1
+    IDLE_MAX_WAIT = 30       # Warm anyway after waiting this long for requests to finish
+    DEBOUNCE = 5             # Seconds a post-write warm waits so a run of commits warms once
+
+    def __init__(self):
+        self.concurrency = 2
+        self.stagger = 0.5
+        self.bulk_rows = 50
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._last_recorded = {}
+        self._scheduled = set()
+
+    def init_app(self, app):
+        """Record company activity and count in-flight requests for this app."""
+        self.concurrency = app.config.get('DASHBOARD_WARM_CONCURRENCY', self.concurrency)
+        self.stagger = app.config.get('DASHBOARD_WARM_STAGGER', self.stagger)
+        self.bulk_rows = app.config.get('DASHBOARD_WARM_BULK_ROWS', self.bulk_rows)
+        app.before_request(self._request_started)
+        app.teardown_request(self._request_finished)
+
+    def _request_started(self):
+        if request.endpoint == 'static':
+            return
+        with self._lock:
+            self._in_flight += 1
+        g._dashboard_warm_counted = True
+
+    def _request_finished(self, exception=None):
+        if not g.pop('_dashboard_warm_counted', False):
+            return
+        with self._lock:
+            self._in_flight -= 1
+        # Flask-Login keeps the user it loaded here; reading it never triggers a load of its own
+        user = g.get('_login_user')
+        company_id = getattr(user, 'company_id', None)
+        if company_id is not None:
+            self.record_activity(company_id)
+
+    def record_activity(self, company_id):
+        """Add a company to today's active set, at most once a minute per worker."""
+        now = time.monotonic()
+        if now - self._last_recorded.get(company_id, -self.ACTIVITY_THROTTLE) < self.ACTIVITY_THROTTLE:
+            return
+        self._last_recorded[company_id] = now
+        if not cache.redis:
+            return
+        key = f"{self.ACTIVE_PREFIX}{date.today().isoformat()}"
+        try:
+            pipe = cache.redis.pipeline(transaction=False)
+            pipe.sadd(key, company_id)
+            pipe.expire(key, self.ACTIVE_RETENTION_DAYS * 86400)
+            pipe.execute()
+        except redis.RedisError as e:
+            current_app.logger.warning(f"Could not record activity for company {company_id}: {e}")
+
+    def active_companies(self, days=1):
+        """Ids of companies with requests on any of the last `days` days, today included."""
+        if not cache.redis:
+            return []
+        today = date.today()
+        pipe = cache.redis.pipeline(transaction=False)
+        for offset in range(min(days, self.ACTIVE_RETENTION_DAYS)):
+            pipe.smembers(f"{self.ACTIVE_PREFIX}{(today - timedelta(days=offset)).isoformat()}")
+        return sorted({int(company_id) for members in pipe.execute() for company_id in members})
+
+    def warm(self, company_id):
+        """Fill whatever is missing from one company's dashboard caches; returns the sections warmed."""
+        warmed = []
+        if not cache.exists(InventoryStats._cache_key(company_id), company_id=company_id,
+                            category=CacheConfig.CATEGORY_INVENTORY):
+            InventoryStats.get(company_id)
+            warmed.append('inventory')
+        warmed.extend(DashboardAggregates.warm(company_id))
+        return warmed
+
+    def warm_companies(self, company_ids, concurrency=None, stagger=None, app=None):
+        """
+        Warm several companies' dashboards and return {'warmed', 'skipped', 'failed'} id lists.
+
+        At most `concurrency` companies are warmed at once across every worker
+        sharing the cache; each thread pauses a jittered `stagger` between companies.
+        """
+        concurrency = concurrency or self.concurrency
+        stagger = self.stagger if stagger is None else stagger
+        app = app or current_app._get_current_object()
+        results = {'warmed': [], 'skipped': [], 'failed': []}
+        if not cache.redis or not company_ids:
+            results['skipped'].extend(company_ids)
+            return results
+
+        def run(company_id):
+            # Uniform jitter averaging `stagger` keeps workers from waking in lockstep
+            time.sleep(random.uniform(0, 2 * stagger))
+            with app.app_context():
+                try:
+                    outcome = 'warmed' if self._warm_in_slot(company_id, concurrency) else 'skipped'
+                except Exception as e:
+                    app.logger.error(f"Dashboard warming failed for company {company_id}: {e}")
+                    outcome = 'failed'
+            with self._lock:
+                results[outcome].append(company_id)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='dashboard-warm') as pool:
+            list(pool.map(run, company_ids))
+        return results
+
+    def _warm_in_slot(self, company_id, concurrency):
+        """Warm one company inside a shared slot; False when it was skipped."""
+        self._wait_for_idle()
+        slot, slot_token = self._acquire_slot(concurrency)
+        if slot is None:
+            return False
+        try:
+            # Another worker warming the same company (e.g. after the same import) is enough
+            company_token = _acquire_lock(f"{self.COMPANY_PREFIX}{company_id}", self.SLOT_TIMEOUT)
+            if company_token is None:
+                return False
+            try:
+                self.warm(company_id)
+                return True
+            finally:
+                _release_lock(f"{self.COMPANY_PREFIX}{company_id}", company_token)
+        finally:
+            _release_lock(slot, slot_token)
+
+    def _acquire_slot(self, concurrency):
+        """Take one of `concurrency` cross-worker slots; (None, None) if none frees up in time."""
+        deadline = time.monotonic() + self.SLOT_WAIT
+        while True:
+            for number in range(concurrency):
+                slot = f"{self.SLOT_PREFIX}{number}"
+                token = _acquire_lock(slot, self.SLOT_TIMEOUT)
+                if token is not None:
+                    return slot, token
+            if time.monotonic() >= deadline:
+                return None, None
+            time.sleep(random.uniform(0.5, 1.5))
+
+    def _wait_for_idle(self):
+        """Hold back while this worker is serving requests, up to IDLE_MAX_WAIT."""
+        deadline = time.monotonic() + self.IDLE_MAX_WAIT
+        while self._in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(self.IDLE_POLL)
+
+    def schedule_warm(self, company_id):
+        """Warm a company in the background shortly after a bulk write; repeated calls coalesce."""
+        if not has_app_context():
+            return
+        app = current_app._get_current_object()
+        with self._lock:
+            if company_id in self._scheduled:
+                return
+            self._scheduled.add(company_id)
+
+        def run():
+            with self._lock:
+                self._scheduled.discard(company_id)
+            self.warm_companies([company_id], stagger=0, app=app)
+
+        timer = threading.Timer(self.DEBOUNCE, run)
+        timer.name = f"dashboard-warm:{company_id}"
+        timer.daemon = True
+        timer.start()
+
+
+dashboard_warmer = DashboardWarmer()
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_dashboard_writes(session, flush_context):
+    """Note which tenants' dashboard sections this transaction changed, and how many rows."""
+    changes = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        sections = SECTIONS_BY_MODEL.get(type(obj))
+        company_id = getattr(obj, 'company_id', None) if sections else None
+        if company_id is None:
+            continue
+        if changes is None:
+            changes = session.info.setdefault('dashboard_changes', {})
+        staged = changes.setdefault(company_id, {'sections': set(), 'rows': 0})
+        staged['sections'].update(sections)
+        staged['rows'] += 1
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dashboards(session):
+    """Drop changed dashboard sections, and warm tenants whose commit was a bulk write."""
+    changes = session.info.pop('dashboard_changes', {})
+    bulk = session.info.pop('dashboard_bulk_writes', set())
+    for company_id, staged in changes.items():
+        DashboardAggregates.invalidate(company_id, staged['sections'])
+        if staged['rows'] >= dashboard_warmer.bulk_rows:
+            bulk.add(company_id)
+    for company_id in bulk:
+        dashboard_warmer.schedule_warm(company_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dashboard_writes(session):
+    session.info.pop('dashboard_changes', None)
+    session.info.pop('dashboard_bulk_writes', None)
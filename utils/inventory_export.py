@@ -0,0 +1,196 @@
+"""
+Streaming CSV Export for RahaSoft ERP Inventory Reports
+Rows are read through a chunked server-side cursor and written straight to the
+response, so memory use stays flat no matter how large the export is
+"""
+import csv
+import zlib
+from datetime import datetime, timedelta
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from extensions import db
+from models.product import Product, StockMovement, StockAlert
+
+EXPORT_CHUNK_SIZE = 1000       # rows fetched per server-side cursor round trip
+FLUSH_THRESHOLD = 64 * 1024    # bytes buffered before a chunk is sent
+
+
+class _LineBuffer:
+    """File-like sink that collects csv.writer output until it is drained"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        self.parts.append(value)
+        self.size += len(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+def iter_rows(statement, chunk_size=EXPORT_CHUNK_SIZE):
+    """Execute a Core select and yield plain rows chunk by chunk."""
+    result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def generate_csv(header, rows, compress=False):
+    """Yield encoded CSV chunks, gzip-compressed on the fly when requested."""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip container
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.size >= FLUSH_THRESHOLD:
+            data = encode(buffer.drain())
+            if data:
+                yield data
+
+    data = encode(buffer.drain())
+    if compressor:
+        data += compressor.flush()
+    if data:
+        yield data
+
+
+def csv_response(filename, header, rows, compress=False):
+    """Build a streaming CSV download response."""
+    if compress:
+        filename = f'{filename}.gz'
+    response = Response(
+        stream_with_context(generate_csv(header, rows, compress=compress)),
+        mimetype='application/gzip' if compress else 'text/csv'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass chunks through
+    return response
+
+
+def parse_date_range(date_from=None, date_to=None):
+    """Parse YYYY-MM-DD filter strings into a [start, end) range that includes both days."""
+    start = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+    end = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+    return start, end
+
+
+def _format_datetime(value, fmt='%Y-%m-%d %H:%M:%S'):
+    return value.strftime(fmt) if value else ''
+
+
+# Product exports
+PRODUCT_EXPORT_HEADER = [
+    'Product Code', 'Product Name', 'Category', 'Brand', 'Supplier',
+    'Price', 'Cost Price', 'Quantity', 'Reorder Level', 'Location',
+    'Barcode', 'Weight', 'Dimensions', 'Description', 'Tax Rate',
+    'Expiry Date', 'Created Date'
+]
+
+
+def product_export_rows(company_id, active_only=True):
+    """Yield full product rows for a company without hydrating ORM objects."""
+    statement = select(
+        Product.product_code, Product.product_name, Product.category, Product.brand,
+        Product.supplier, Product.price, Product.cost_price, Product.quantity,
+        Product.reorder_level, Product.location, Product.barcode, Product.weight,
+        Product.dimensions, Product.description, Product.tax_rate,
+        Product.expiry_date, Product.created_at
+    ).where(Product.company_id == company_id).order_by(Product.id)
+    if active_only:
+        statement = statement.where(Product.is_active == True)
+
+    for row in iter_rows(statement):
+        yield [
+            row.product_code, row.product_name, row.category or '', row.brand or '',
+            row.supplier or '', row.price, row.cost_price or '', row.quantity,
+            row.reorder_level, row.location or '', row.barcode or '', row.weight or '',
+            row.dimensions or '', row.description or '', row.tax_rate,
+            row.expiry_date.strftime('%Y-%m-%d') if row.expiry_date else '',
+            _format_datetime(row.created_at)
+        ]
+
+
+STOCK_REPORT_HEADER = ['SKU', 'Name', 'Category', 'Supplier', 'Price', 'Cost', 'Quantity', 'Stock Status']
+
+
+def stock_report_rows(company_id):
+    """Yield product rows with their stock status computed in SQL."""
+    statement = select(
+        Product.product_code, Product.product_name, Product.category, Product.supplier,
+        Product.price, Product.cost_price, Product.quantity,
+        Product.stock_status_expression().label('stock_status')
+    ).where(Product.company_id == company_id).order_by(Product.id)
+
+    for row in iter_rows(statement):
+        yield [
+            row.product_code, row.product_name, row.category or '', row.supplier or '',
+            row.price, row.cost_price or '', row.quantity, row.stock_status
+        ]
+
+
+LOW_STOCK_HEADER = ['SKU', 'Name', 'Current Stock', 'Reorder Level', 'Supplier']
+
+
+def low_stock_rows(company_id):
+    """Yield active products at or below their reorder level, from the low-stock set."""
+    statement = select(
+        Product.product_code, Product.product_name, Product.quantity,
+        Product.reorder_level, Product.supplier
+    ).join(StockAlert, StockAlert.product_id == Product.id).where(
+        StockAlert.company_id == company_id
+    ).order_by(Product.quantity, Product.id)
+
+    for row in iter_rows(statement):
+        yield [row.product_code, row.product_name, row.quantity, row.reorder_level, row.supplier or '']
+
+
+# Stock movement exports
+STOCK_MOVEMENT_HEADER = [
+    'Date', 'Product Code', 'Product', 'Movement Type', 'Quantity',
+    'Previous Quantity', 'New Quantity', 'Unit Cost', 'Total Cost',
+    'Reference', 'Notes', 'User'
+]
+
+
+def stock_movement_rows(company_id, date_from=None, date_to=None, product_id=None, movement_type=None):
+    """Yield the full movement history for a company, newest first, joined to its product."""
+    statement = select(
+        StockMovement.created_at, Product.product_code, Product.product_name,
+        StockMovement.movement_type, StockMovement.quantity,
+        StockMovement.previous_quantity, StockMovement.new_quantity,
+        StockMovement.unit_cost, StockMovement.total_cost,
+        StockMovement.reference, StockMovement.notes, StockMovement.created_by
+    ).join(Product, Product.id == StockMovement.product_id).where(
+        StockMovement.company_id == company_id
+    ).order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
+
+    if date_from:
+        statement = statement.where(StockMovement.created_at >= date_from)
+    if date_to:
+        statement = statement.where(StockMovement.created_at < date_to)
+    if product_id:
+        statement = statement.where(StockMovement.product_id == product_id)
+    if movement_type:
+        statement = statement.where(StockMovement.movement_type == movement_type)
+
+    for row in iter_rows(statement):
+        yield [
+            _format_datetime(row.created_at, '%Y-%m-%d %H:%M'), row.product_code, row.product_name,
+            row.movement_type, row.quantity, row.previous_quantity, row.new_quantity,
+            row.unit_cost if row.unit_cost is not None else '',
+            row.total_cost if row.total_cost is not None else '',
+            row.reference or '', row.notes or '', row.created_by or ''
+        ]
@@ -0,0 +1,47 @@
+"""
+Inventory Statistics Service for RahaSoft ERP
+Single-pass stock-status statistics shared by the inventory dashboards and metrics API
+"""
+from models.product import InventoryValuation
+from utils.cache_manager import cache, CacheConfig
+
+
+class InventoryStats:
+    """Per-tenant stock-status statistics, cached until the next stock change"""
+
+    @staticmethod
+    def _cache_key(company_id):
+        return f"{CacheConfig.PREFIX_ANALYTICS}inventory_stats:{company_id}"
+
+    @staticmethod
+    def _build(valuation):
+        """Shape a valuation summary into the dashboard statistics payload."""
+        return {
+            'total_products': valuation['total_products'],
+            'in_stock': valuation['total_products'] - valuation['out_of_stock_count'],
+            'out_of_stock': valuation['out_of_stock_count'],
+            'low_stock': valuation['low_stock_count'],
+            'overstocked': valuation['overstocked_count'],
+            'normal': valuation['normal_count'],
+            'needs_reorder': valuation['low_stock_count'] + valuation['out_of_stock_count'],
+            'cost_value': round(valuation['cost_value'], 2),
+            'retail_value': round(valuation['retail_value'], 2),
+        }
+
+    @staticmethod
+    def get(company_id):
+        """Return cached statistics, reading the valuation summary row on a miss."""
+        key = InventoryStats._cache_key(company_id)
+        stats = cache.get(key, company_id=company_id, category=CacheConfig.CATEGORY_INVENTORY)
+        if stats is not None:
+            return stats
+
+        stats = InventoryStats._build(InventoryValuation.for_company(company_id).to_dict())
+        cache.set(key, stats, ttl=CacheConfig.TTL_LONG, category=CacheConfig.CATEGORY_INVENTORY, company_id=company_id)
+        return stats
+
+    @staticmethod
+    def invalidate(company_id):
+        """Drop a tenant's cached statistics after its stock changed."""
+        return cache.delete(InventoryStats._cache_key(company_id), company_id=company_id,
+                            category=CacheConfig.CATEGORY_INVENTORY)
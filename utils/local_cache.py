@@ -0,0 +1,572 @@
+"""
+Local Cache Backend for RahaSoft ERP
+Stands in for Redis on single-node and offline deployments. LocalRedis answers
+the subset of the redis-py client API the cache layer, product lookup and rate
+limiter use (strings with TTLs, counters, sets, hashes, pipelines, SCAN), so
+the rest of the code runs unchanged. Entries live either in this process
+(MemoryStore) or in a SQLite file that every gunicorn worker on the host
+opens (SQLiteStore). Both evict least recently used entries that carry a TTL
+once a byte budget is exceeded; keys without a TTL, such as namespace
+versions, are never evicted, as with Redis' volatile-lru policy.
+"""
+import fnmatch
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import redis
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_OVERHEAD = 64  # Rough bytes per entry beyond its key and value
+
+
+class Entry:
+    """One stored key: a bytes string, a set of bytes or a dict of bytes to bytes"""
+
+    __slots__ = ('kind', 'value', 'expires_at')
+
+    def __init__(self, kind, value, expires_at=None):
+        self.kind = kind
+        self.value = value
+        self.expires_at = expires_at
+
+    def size(self, key):
+        if self.kind == 'string':
+            payload = len(self.value)
+        elif self.kind == 'set':
+            payload = sum(len(member) for member in self.value)
+        else:
+            payload = sum(len(field) + len(value) for field, value in self.value.items())
+        return len(key) + payload + ENTRY_OVERHEAD
+
+    def snapshot(self):
+        """Comparable copy for WATCH."""
+        value = self.value if self.kind == 'string' else type(self.value)(self.value)
+        return self.kind, value, self.expires_at
+
+
+class MemoryStore:
+    """Entries in this process, kept in LRU order under a byte budget"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def transaction(self, write=False):
+        with self._lock:
+            yield self
+
+    def load(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= now:
+            self.remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def save(self, key, entry):
+        self.size -= self._sizes.get(key, 0)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._sizes[key] = entry.size(key)
+        self.size += self._sizes[key]
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return False
+        self.size -= self._sizes.pop(key)
+        return True
+
+    def keys(self, now):
+        return [key for key, entry in self._entries.items()
+                if entry.expires_at is None or entry.expires_at > now]
+
+    def _evict(self):
+        skipped = 0
+        while self.size > self.max_bytes and skipped < len(self._entries):
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at is None:
+                # Never evicted; moving it back keeps the next pass from rescanning it
+                self._entries.move_to_end(key)
+                skipped += 1
+                continue
+            self.remove(key)
+            self.evictions += 1
+
+    def flush(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'used_memory': self.size, 'keys': len(self._entries), 'evictions': self.evictions}
+
+
+class SQLiteStore:
+    """
+    Entries in a SQLite file shared by every process that opens it. Writes take
+    the database lock (BEGIN IMMEDIATE), so counters and read-modify-write
+    commands are atomic across workers. Reads record their keys and the next
+    write stamps them, which keeps the LRU order without a write per read.
+    """
+
+    EVICTION_INTERVAL = 100  # Writes between checks of the byte budget
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().executescript('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value BLOB,
+                expires_at REAL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_entries_lru
+                ON cache_entries (accessed_at) WHERE expires_at IS NOT NULL;
+        ''')
+
+    def _connection(self):
+        # One connection per thread and process; forked workers open their own
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                               check_same_thread=False)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            local.pid = os.getpid()
+            local.depth = 0
+            local.touched = set()
+        return local.connection
+
+    @contextmanager
+    def transaction(self, write=False):
+        connection = self._connection()
+        local = self._local
+        if local.depth:
+            local.depth += 1
+            try:
+                yield self
+            finally:
+                local.depth -= 1
+            return
+
+        connection.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        local.depth = 1
+        try:
+            yield self
+            if write:
+                self._after_write(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            local.depth = 0
+
+    def _after_write(self, connection):
+        local = self._local
+        if local.touched:
+            connection.executemany('UPDATE cache_entries SET accessed_at = ? WHERE key = ?',
+                                   [(time.time(), key) for key in local.touched])
+            local.touched = set()
+        self._writes += 1
+        if self._writes % self.EVICTION_INTERVAL == 0:
+            self._evict(connection)
+
+    def load(self, key, now):
+        row = self._connection().execute(
+            'SELECT kind, value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[2] is not None and row[2] <= now):
+            return None
+        self._local.touched.add(key)
+        return Entry(row[0], self._decode(row[0], row[1]), row[2])
+
+    def save(self, key, entry):
+        self._local.touched.discard(key)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, kind, value, expires_at, size, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, entry.kind, self._encode(entry), entry.expires_at, entry.size(key), time.time())
+        )
+
+    def remove(self, key):
+        return self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount > 0
+
+    def keys(self, now):
+        return [row[0] for row in self._connection().execute(
+            'SELECT key FROM cache_entries WHERE expires_at IS NULL OR expires_at > ?', (now,))]
+
+    def _evict(self, connection):
+        connection.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+        excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        # Oldest entries with a TTL until the excess is covered
+        victims = connection.execute('''
+            SELECT key FROM (
+                SELECT key, SUM(size) OVER (ORDER BY accessed_at, key) - size AS freed_before
+                FROM cache_entries WHERE expires_at IS NOT NULL
+            ) WHERE freed_before < ?
+        ''', (excess,)).fetchall()
+        connection.executemany('DELETE FROM cache_entries WHERE key = ?', victims)
+        self.evictions += len(victims)
+
+    @staticmethod
+    def _encode(entry):
+        if entry.kind == 'string':
+            return entry.value
+        if entry.kind == 'set':
+            return json.dumps(sorted(member.decode('latin1') for member in entry.value)).encode()
+        return json.dumps({field.decode('latin1'): value.decode('latin1')
+                           for field, value in entry.value.items()}).encode()
+
+    @staticmethod
+    def _decode(kind, value):
+        if kind == 'string':
+            return bytes(value)
+        if kind == 'set':
+            return {member.encode('latin1') for member in json.loads(value)}
+        return {field.encode('latin1'): item.encode('latin1') for field, item in json.loads(value).items()}
+
+    def flush(self):
+        with self.transaction(write=True):
+            self._connection().execute('DELETE FROM cache_entries')
+
+    def stats(self):
+        with self.transaction():
+            used, keys = self._connection().execute(
+                'SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries').fetchone()
+        return {'used_memory': used, 'keys': keys, 'evictions': self.evictions}
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    raise redis.DataError(f'Invalid input of type {type(value).__name__}')
+
+
+class LocalPipeline:
+    """Queues commands and runs them in one store transaction"""
+
+    def __init__(self, client):
+        self.client = client
+        self._commands = []
+        self._watched = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self._commands = []
+        self._watched = {}
+
+    def watch(self, *keys):
+        with self.client.store.transaction():
+            now = time.time()
+            for key in keys:
+                entry = self.client.store.load(key, now)
+                self._watched[key] = entry.snapshot() if entry else None
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        store = self.client.store
+        try:
+            with store.transaction(write=True):
+                now = time.time()
+                for key, snapshot in self._watched.items():
+                    entry = store.load(key, now)
+                    if (entry.snapshot() if entry else None) != snapshot:
+                        raise redis.WatchError('Watched variable changed.')
+                return [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        finally:
+            self.reset()
+
+
+class LocalRedis:
+    """redis-py compatible client over a MemoryStore or SQLiteStore"""
+
+    # Lua scripts the app sends with EVAL, mapped to Python equivalents by register_script
+    scripts = {}
+
+    def __init__(self, store, decode_responses=False):
+        self.store = store
+        self.decode_responses = decode_responses
+
+    @classmethod
+    def register_script(cls, script, handler):
+        """Run handler(client, keys, args) whenever this script is passed to eval."""
+        cls.scripts[script] = handler
+
+    def _out(self, value):
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode()
+
+    def _load(self, key, kind, now=None):
+        entry = self.store.load(key, now or time.time())
+        if entry is not None and entry.kind != kind:
+            raise redis.ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return entry
+
+    def _expires(self, ex=None, px=None):
+        if px is not None:
+            return time.time() + px / 1000
+        if ex is not None:
+            return time.time() + ex
+        return None
+
+    # Connection
+    def ping(self):
+        return True
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+    def publish(self, channel, message):
+        return 0  # Nothing else shares this process' cache to notify
+
+    def eval(self, script, numkeys, *keys_and_args):
+        handler = self.scripts.get(script)
+        if handler is None:
+            raise redis.ResponseError('Script is not supported by the local cache backend')
+        with self.store.transaction(write=True):
+            return handler(self, list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:]))
+
+    # Strings and counters
+    def get(self, name):
+        with self.store.transaction():
+            entry = self._load(name, 'string')
+        if entry is None:
+            self.store.misses += 1
+            return None
+        self.store.hits += 1
+        return self._out(entry.value)
+
+    def mget(self, keys, *args):
+        names = list(keys) if isinstance(keys, (list, tuple)) else [keys, *args]
+        with self.store.transaction():
+            now = time.time()
+            entries = [self.store.load(name, now) for name in names]
+        values = []
+        for entry in entries:
+            if entry is None or entry.kind != 'string':
+                self.store.misses += 1
+                values.append(None)
+            else:
+                self.store.hits += 1
+                values.append(self._out(entry.value))
+        return values
+
+    def set(self, name, value, ex=None, px=None, nx=False, xx=False):
+        with self.store.transaction(write=True):
+            exists = self.store.load(name, time.time()) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            self.store.save(name, Entry('string', _to_bytes(value), self._expires(ex, px)))
+            return True
+
+    def setex(self, name, time_seconds, value):
+        return self.set(name, value, ex=time_seconds)
+
+    def incrby(self, name, amount=1):
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'string')
+            try:
+                current = int(entry.value) if entry else 0
+            except ValueError:
+                raise redis.ResponseError('value is not an integer or out of range')
+            self.store.save(name, Entry('string', str(current + amount).encode(),
+                                        entry.expires_at if entry else None))
+            return current + amount
+
+    def incr(self, name, amount=1):
+        return self.incrby(name, amount)
+
+    def decr(self, name, amount=1):
+        return self.incrby(name, -amount)
+
+    # Keys
+    def delete(self, *names):
+        with self.store.transaction(write=True):
+            return sum(1 for name in names if self.store.remove(name))
+
+    def exists(self, *names):
+        with self.store.transaction():
+            now = time.time()
+            return sum(1 for name in names if self.store.load(name, now) is not None)
+
+    def expire(self, name, time_seconds):
+        with self.store.transaction(write=True):
+            entry = self.store.load(name, time.time())
+            if entry is None:
+                return False
+            entry.expires_at = time.time() + time_seconds
+            self.store.save(name, entry)
+            return True
+
+    def pttl(self, name):
+        with self.store.transaction():
+            entry = self.store.load(name, time.time())
+        if entry is None:
+            return -2
+        if entry.expires_at is None:
+            return -1
+        return max(int((entry.expires_at - time.time()) * 1000), 0)
+
+    def ttl(self, name):
+        remaining = self.pttl(name)
+        return remaining if remaining < 0 else remaining // 1000
+
+    def scan_iter(self, match=None, count=None, _type=None):
+        with self.store.transaction():
+            names = self.store.keys(time.time())
+        for name in names:
+            if match is None or fnmatch.fnmatchcase(name, match):
+                yield name if self.decode_responses else name.encode()
+
+    def flushdb(self):
+        self.store.flush()
+        return True
+
+    # Sets
+    def sadd(self, name, *values):
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'set') or Entry('set', set())
+            before = len(entry.value)
+            entry.value.update(_to_bytes(value) for value in values)
+            self.store.save(name, entry)
+            return len(entry.value) - before
+
+    def srem(self, name, *values):
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'set')
+            if entry is None:
+                return 0
+            before = len(entry.value)
+            entry.value.difference_update(_to_bytes(value) for value in values)
+            if entry.value:
+                self.store.save(name, entry)
+            else:
+                self.store.remove(name)
+            return before - len(entry.value)
+
+    def smembers(self, name):
+        with self.store.transaction():
+            entry = self._load(name, 'set')
+        return {self._out(member) for member in entry.value} if entry else set()
+
+    # Hashes
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'hash') or Entry('hash', {})
+            added = 0
+            for field, item in items.items():
+                field = _to_bytes(field)
+                added += field not in entry.value
+                entry.value[field] = _to_bytes(item)
+            self.store.save(name, entry)
+            return added
+
+    def hget(self, name, key):
+        return self.hmget(name, [key])[0]
+
+    def hmget(self, name, keys, *args):
+        fields = list(keys) if isinstance(keys, (list, tuple)) else [keys, *args]
+        with self.store.transaction():
+            entry = self._load(name, 'hash')
+        values = entry.value if entry else {}
+        return [self._out(values.get(_to_bytes(field))) for field in fields]
+
+    def hgetall(self, name):
+        with self.store.transaction():
+            entry = self._load(name, 'hash')
+        return {self._out(field): self._out(value) for field, value in (entry.value if entry else {}).items()}
+
+    def hexists(self, name, key):
+        return self.hget(name, key) is not None
+
+    def hdel(self, name, *keys):
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'hash')
+            if entry is None:
+                return 0
+            removed = sum(1 for key in keys if entry.value.pop(_to_bytes(key), None) is not None)
+            if entry.value:
+                self.store.save(name, entry)
+            else:
+                self.store.remove(name)
+            return removed
+
+    def hincrby(self, name, key, amount=1):
+        with self.store.transaction(write=True):
+            entry = self._load(name, 'hash') or Entry('hash', {})
+            field = _to_bytes(key)
+            try:
+                current = int(entry.value.get(field, b'0'))
+            except ValueError:
+                raise redis.ResponseError('hash value is not an integer')
+            entry.value[field] = str(current + amount).encode()
+            self.store.save(name, entry)
+            return current + amount
+
+    # Monitoring
+    def info(self):
+        stats = self.store.stats()
+        used = stats['used_memory']
+        return {
+            'redis_mode': 'local',
+            'connected_clients': 1,
+            'used_memory': used,
+            'used_memory_human': f"{used / 1024 / 1024:.2f}M",
+            'maxmemory': self.store.max_bytes,
+            'evicted_keys': stats['evictions'],
+            'keyspace_hits': self.store.hits,
+            'keyspace_misses': self.store.misses,
+            'db0': {'keys': stats['keys']},
+        }
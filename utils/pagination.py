@@ -0,0 +1,180 @@
+"""
+Keyset Pagination for RahaSoft ERP
+Pages through large listings by seeking past the last row's sort key instead of
+using OFFSET, so page 5,000 costs the same as page 1 and no COUNT(*) is needed.
+Cursors are opaque URL-safe tokens that encode the boundary row's sort values.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, func, literal, select, text, tuple_
+
+from extensions import db
+
+TOTAL_COUNT_CAP = 10000  # exact counts stop here on databases without planner estimates
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was tampered with or belongs to a different sort order"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(sort_key, values, direction):
+    payload = {'s': sort_key, 'v': [_encode_value(value) for value in values], 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_key):
+    """Return (values, direction) for a cursor issued under `sort_key`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(value) for value in payload['v']]
+        direction = payload['d']
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Malformed page cursor') from e
+    if payload.get('s') != sort_key or direction not in ('next', 'prev'):
+        raise InvalidCursor('Page cursor does not match the current sort order')
+    return values, direction
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def meta(self):
+        """Pagination block for JSON responses."""
+        return {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'total': self.total,
+            'total_is_estimate': self.total_is_estimate
+        }
+
+
+def _key_expressions(columns, boundary):
+    """
+    Sort expressions and boundary values as the database should compare them.
+
+    SQLite keeps datetimes as text, and server-default timestamps lack the
+    microseconds a bound value carries, so equal instants would compare unequal;
+    both sides are normalised through julianday() there.
+    """
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return list(columns), boundary
+    expressions = []
+    values = []
+    for position, column in enumerate(columns):
+        is_datetime = isinstance(column.type, DateTime)
+        expressions.append(func.julianday(column) if is_datetime else column)
+        if boundary is not None:
+            value = boundary[position]
+            values.append(func.julianday(literal(value, DateTime())) if is_datetime else value)
+    return expressions, values if boundary is not None else None
+
+
+def keyset_paginate(query, sort_key, columns, descending=False, cursor=None, per_page=20, with_total=False):
+    """
+    Return a KeysetPage of `query` ordered by `columns`.
+
+    `columns` are the sort column(s) followed by a unique tie-breaker (normally
+    the primary key); all are sorted in the same direction so a single row-value
+    comparison can seek through the matching index. `sort_key` names the sort
+    order and is embedded in cursors so a cursor from another ordering is rejected.
+    """
+    direction = 'next'
+    boundary = None
+    if cursor:
+        boundary, direction = decode_cursor(cursor, sort_key)
+        if len(boundary) != len(columns):
+            raise InvalidCursor('Page cursor does not match the current sort order')
+
+    # Walking backwards flips the order; the page is reversed again after fetching
+    backwards = direction == 'prev'
+    ascending = descending == backwards
+    expressions, values = _key_expressions(columns, boundary)
+    filtered = query
+    if values is not None:
+        key = tuple_(*expressions)
+        filtered = filtered.filter(key > tuple_(*values) if ascending else key < tuple_(*values))
+    ordering = [expression.asc() if ascending else expression.desc() for expression in expressions]
+
+    rows = filtered.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def row_cursor(row, to):
+        return encode_cursor(sort_key, [getattr(row, column.key) for column in columns], to)
+
+    # Going forward, the extra row says whether a next page exists and any cursor
+    # means one lies behind; going backward it is the other way round
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards or more:
+            next_cursor = row_cursor(rows[-1], 'next')
+        if (more if backwards else boundary is not None):
+            prev_cursor = row_cursor(rows[0], 'prev')
+
+    total, estimated = (None, False)
+    if with_total:
+        total, estimated = estimate_total(query)
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total, estimated)
+
+
+def estimate_total(query):
+    """
+    Return (total, is_estimate) for a listing query.
+
+    PostgreSQL answers from the planner's row estimate without touching the
+    rows; elsewhere the count is exact but stops at TOTAL_COUNT_CAP.
+    """
+    statement = query.order_by(None).statement
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        compiled = statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    capped = statement.limit(TOTAL_COUNT_CAP + 1).subquery()
+    count = db.session.execute(select(func.count()).select_from(capped)).scalar()
+    if count > TOTAL_COUNT_CAP:
+        return TOTAL_COUNT_CAP, True
+    return count, False
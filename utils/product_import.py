@@ -0,0 +1,262 @@
+"""
+Bulk Product Import Engine for RahaSoft ERP
+Streams an uploaded CSV in chunks, validates each chunk against prefetched
+SKUs, barcodes, categories and suppliers, and bulk-inserts the valid rows.
+Runs as a background job tracked by DataImportJob.
+"""
+import csv
+import os
+import threading
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+
+from extensions import db
+from models.api_framework import DataImportJob
+from models.product import Product, Category, Supplier, InventoryValuation
+
+IMPORT_BATCH_SIZE = 1000
+ERROR_REPORT_HEADER = ['Row', 'SKU', 'Error']
+
+
+class ImportRowError(ValueError):
+    """A single CSV row that cannot be imported"""
+
+
+def _text(row, field):
+    return (row.get(field) or '').strip()
+
+
+def _number(row, field, cast, default=None):
+    value = _text(row, field)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ImportRowError(f"Invalid {field} '{value}'")
+
+
+def parse_product_row(row, company_id):
+    """Convert one CSV row into Product column values."""
+    name = _text(row, 'name')
+    sku = _text(row, 'sku')
+    if not name or not sku:
+        raise ImportRowError('Name and SKU are required')
+
+    return {
+        'product_code': sku,
+        'product_name': name,
+        'description': _text(row, 'description') or None,
+        'price': _number(row, 'price', float, 0.0),
+        'cost_price': _number(row, 'cost', float),
+        'quantity': _number(row, 'quantity', int, 0),
+        'category': _text(row, 'category') or None,
+        'supplier': _text(row, 'supplier') or None,
+        'brand': _text(row, 'brand') or None,
+        'reorder_level': _number(row, 'reorder_level', int, 10),
+        'max_stock_level': _number(row, 'max_stock_level', int, 1000),
+        'location': _text(row, 'location') or None,
+        'barcode': _text(row, 'barcode') or None,
+        'weight': _number(row, 'weight', float),
+        'dimensions': _text(row, 'dimensions') or None,
+        'tax_rate': _number(row, 'tax_rate', float, 0.0),
+        'is_active': True,
+        'company_id': company_id,
+    }
+
+
+class ProductImporter:
+    """Chunked, set-based product import for one DataImportJob"""
+
+    def __init__(self, job, batch_size=None):
+        self.job = job
+        self.company_id = job.company_id
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
+        self.seen_skus = set()
+        self.seen_barcodes = set()
+        self.known_categories = set()
+        self.known_suppliers = set()
+        self.successful = 0
+        self.failed = 0
+        self.processed = 0
+
+    def run(self):
+        """Import the job's file chunk by chunk, committing progress after each chunk."""
+        job = self.job
+        job.status = 'processing'
+        job.started_at = datetime.utcnow()
+        job.total_records = self._count_rows()
+        db.session.commit()
+
+        with open(job.file_path, newline='', encoding='utf-8-sig') as handle:
+            rows = enumerate(csv.DictReader(handle), start=2)
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                errors = self._import_chunk(chunk)
+                self.processed += len(chunk)
+                job.update_progress(
+                    processed=self.processed,
+                    successful=self.successful,
+                    failed=self.failed,
+                    errors=errors
+                )
+
+        job.total_records = self.processed
+        job.status = 'completed'
+        job.completed_at = datetime.utcnow()
+        db.session.commit()
+        return job
+
+    def _count_rows(self):
+        with open(self.job.file_path, newline='', encoding='utf-8-sig') as handle:
+            return max(sum(1 for _ in csv.reader(handle)) - 1, 0)
+
+    def _import_chunk(self, chunk):
+        errors = []
+        candidates = []
+        for row_number, row in chunk:
+            try:
+                candidates.append((row_number, parse_product_row(row, self.company_id)))
+            except ImportRowError as e:
+                errors.append(self._error(row_number, _text(row, 'sku'), str(e)))
+
+        existing_skus, existing_barcodes = self._prefetch_existing(candidates)
+
+        values = []
+        for row_number, product in candidates:
+            sku, barcode = product['product_code'], product['barcode']
+            if sku in existing_skus or sku in self.seen_skus:
+                errors.append(self._error(row_number, sku, f"Product with SKU '{sku}' already exists"))
+                continue
+            if barcode and (barcode in existing_barcodes or barcode in self.seen_barcodes):
+                errors.append(self._error(row_number, sku, f"Barcode '{barcode}' already exists"))
+                continue
+            self.seen_skus.add(sku)
+            if barcode:
+                self.seen_barcodes.add(barcode)
+            values.append((row_number, product))
+
+        self._ensure_lookups([product for _, product in values])
+        errors.extend(self._insert(values))
+        self.failed += len(errors)
+        return sorted(errors, key=lambda error: error['row'])
+
+    def _prefetch_existing(self, candidates):
+        """Load every clashing SKU and barcode for the chunk in two IN queries."""
+        skus = {product['product_code'] for _, product in candidates}
+        barcodes = {product['barcode'] for _, product in candidates if product['barcode']}
+
+        existing_skus = set(db.session.scalars(
+            select(Product.product_code).where(Product.product_code.in_(skus))
+        )) if skus else set()
+        existing_barcodes = set(db.session.scalars(
+            select(Product.barcode).where(Product.barcode.in_(barcodes))
+        )) if barcodes else set()
+        return existing_skus, existing_barcodes
+
+    def _ensure_lookups(self, products):
+        """Create any categories and suppliers the chunk references but the company lacks."""
+        for model, field, known in ((Category, 'category', self.known_categories),
+                                    (Supplier, 'supplier', self.known_suppliers)):
+            names = {product[field] for product in products if product[field]} - known
+            if not names:
+                continue
+            existing = set(db.session.scalars(
+                select(model.name).where(model.company_id == self.company_id, model.name.in_(names))
+            ))
+            missing = names - existing
+            if missing:
+                db.session.execute(insert(model), [
+                    {'name': name, 'company_id': self.company_id, 'is_active': True}
+                    for name in sorted(missing)
+                ])
+            known.update(names)
+
+    def _insert(self, values):
+        """Bulk-insert a chunk, falling back to per-row savepoints if the batch is rejected."""
+        if not values:
+            return []
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Product), [product for _, product in values])
+            self.successful += len(values)
+        except IntegrityError:
+            return self._insert_rows(values)
+        finally:
+            InventoryValuation.mark_stale(db.session, self.company_id)
+        return []
+
+    def _insert_rows(self, values):
+        errors = []
+        for row_number, product in values:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(Product), [product])
+                self.successful += 1
+            except IntegrityError as e:
+                errors.append(self._error(row_number, product['product_code'], str(e.orig)))
+        return errors
+
+    @staticmethod
+    def _error(row_number, sku, message):
+        return {'row': row_number, 'sku': sku, 'error': message}
+
+
+def start_product_import(file_storage, company_id, user_id, batch_size=None):
+    """Save an uploaded CSV, create its DataImportJob and import it in the background."""
+    upload_dir = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(upload_dir, exist_ok=True)
+    filename = secure_filename(file_storage.filename)
+    file_path = os.path.join(upload_dir, f'{uuid.uuid4().hex}_{filename}')
+    file_storage.save(file_path)
+
+    job = DataImportJob(
+        company_id=company_id,
+        user_id=user_id,
+        job_type='products',
+        file_name=filename,
+        file_path=file_path,
+        status='pending'
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+    app = current_app._get_current_object()
+    worker = threading.Thread(target=_run_import_job, args=(app, job.id, batch_size), daemon=True)
+    worker.start()
+    return job
+
+
+def _run_import_job(app, job_id, batch_size):
+    with app.app_context():
+        job = db.session.get(DataImportJob, job_id)
+        try:
+            ProductImporter(job, batch_size=batch_size).run()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Product import job {job_id} failed: {e}")
+            job = db.session.get(DataImportJob, job_id)
+            job.status = 'failed'
+            job.completed_at = datetime.utcnow()
+            job.error_log = (job.error_log or []) + [{'row': None, 'sku': None, 'error': str(e)}]
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def error_report_rows(job):
+    """Yield the job's row errors in the downloadable report layout."""
+    for entry in job.error_log or []:
+        if isinstance(entry, dict):
+            yield [entry.get('row') or '', entry.get('sku') or '', entry.get('error', '')]
+        else:
+            yield ['', '', entry]
@@ -0,0 +1,142 @@
+"""
+Product Search for RahaSoft ERP
+Indexed type-ahead search used by the POS and inventory search APIs.
+Exact SKU/barcode hits short-circuit; otherwise PostgreSQL trigram indexes or the
+SQLite FTS5 table find the matches, which are ranked in SQL before the limit.
+"""
+import re
+
+from sqlalchemy import case, func, or_, text
+
+from extensions import db
+from models.product import Product
+
+MIN_QUERY_LENGTH = 2
+MAX_RESULTS = 50
+
+_FTS_TOKEN = re.compile(r'\w+', re.UNICODE)
+FTS_TEXT_COLUMNS = ('product_name', 'product_code', 'barcode', 'brand')
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class ProductSearch:
+    """Relevance-ranked product lookup scoped to one company"""
+
+    @staticmethod
+    def search(company_id, query, limit=10):
+        """Return up to `limit` active products matching `query`, best match first."""
+        query = (query or '').strip()
+        if len(query) < MIN_QUERY_LENGTH:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+
+        exact = ProductSearch.exact_match(company_id, query)
+        if exact is not None:
+            return [exact]
+
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            return ProductSearch._search_trigram(company_id, query, limit)
+        if dialect == 'sqlite':
+            return ProductSearch._search_fts(company_id, query, limit)
+        return ProductSearch._search_like(company_id, query, limit)
+
+    @staticmethod
+    def exact_match(company_id, code):
+        """Resolve a scanned SKU or barcode through their unique indexes."""
+        return Product.query.filter(
+            Product.company_id == company_id,
+            Product.is_active == True,
+            or_(Product.product_code == code, Product.barcode == code)
+        ).first()
+
+    @staticmethod
+    def _active(company_id):
+        return Product.query.filter(Product.company_id == company_id, Product.is_active == True)
+
+    @staticmethod
+    def _search_trigram(company_id, query, limit):
+        pattern = f'%{_like_escape(query)}%'
+        prefix = f'{_like_escape(query)}%'
+        relevance = func.greatest(
+            func.similarity(Product.product_name, query),
+            func.similarity(Product.product_code, query),
+            func.similarity(func.coalesce(Product.barcode, ''), query)
+        )
+        prefix_boost = case(
+            (Product.product_code.ilike(prefix, escape='\\'), 2.0),
+            (Product.product_name.ilike(prefix, escape='\\'), 1.0),
+            else_=0.0
+        )
+        return ProductSearch._active(company_id).filter(or_(
+            Product.product_name.ilike(pattern, escape='\\'),
+            Product.product_code.ilike(pattern, escape='\\'),
+            Product.barcode.ilike(pattern, escape='\\'),
+            Product.product_name.op('%')(query)  # trigram similarity, tolerates typos
+        )).order_by(
+            (prefix_boost + relevance).desc(),
+            Product.product_name
+        ).limit(limit).all()
+
+    @staticmethod
+    def _search_fts(company_id, query, limit):
+        tokens = _FTS_TOKEN.findall(query)
+        if not tokens:
+            return ProductSearch._search_like(company_id, query, limit)
+        # The company is an indexed FTS column so tenant scoping happens inside the index.
+        # User tokens are confined to the text columns, so a query for the tenant's own id
+        # does not match every product. Every token must match; the last one as a prefix
+        # for type-ahead.
+        columns = '{' + ' '.join(FTS_TEXT_COLUMNS) + '}'
+        terms = [f'company_id:"{int(company_id)}"'] + [f'{columns}: "{token}"' for token in tokens[:-1]]
+        match = ' AND '.join(terms + [f'{columns}: "{tokens[-1]}"*'])
+
+        # Rank the whole match set in SQL so the LIMIT applies after ranking: SKU prefix,
+        # then name prefix, then a word of the name starting with the query, shortest first
+        needle = _like_escape(query.lower())
+        ranked_ids = db.session.execute(text(
+            "SELECT p.id FROM products_fts JOIN products p ON p.id = products_fts.rowid "
+            "WHERE products_fts MATCH :match AND p.company_id = :company_id AND p.is_active = 1 "
+            "ORDER BY CASE "
+            "WHEN lower(p.product_code) LIKE :prefix ESCAPE '\\' THEN 0 "
+            "WHEN lower(p.product_name) LIKE :prefix ESCAPE '\\' THEN 1 "
+            "WHEN lower(p.product_name) LIKE :word_prefix ESCAPE '\\' THEN 2 "
+            "ELSE 3 END, length(p.product_name), lower(p.product_name) "
+            "LIMIT :limit"
+        ), {'match': match, 'company_id': company_id, 'prefix': f'{needle}%',
+            'word_prefix': f'% {needle}%', 'limit': limit}).scalars().all()
+        if not ranked_ids:
+            return []
+
+        products = Product.query.filter(Product.id.in_(ranked_ids)).all()
+        position = {product_id: index for index, product_id in enumerate(ranked_ids)}
+        products.sort(key=lambda product: position[product.id])
+        return products
+
+    @staticmethod
+    def _search_like(company_id, query, limit):
+        pattern = f'%{_like_escape(query)}%'
+        prefix = f'{_like_escape(query)}%'
+        return ProductSearch._active(company_id).filter(or_(
+            Product.product_name.ilike(pattern, escape='\\'),
+            Product.product_code.ilike(pattern, escape='\\'),
+            Product.barcode.ilike(pattern, escape='\\')
+        )).order_by(
+            case((Product.product_name.ilike(prefix, escape='\\'), 0), else_=1),
+            Product.product_name
+        ).limit(limit).all()
+
+    @staticmethod
+    def to_result(product):
+        """Compact JSON payload for type-ahead widgets."""
+        return {
+            'id': product.id,
+            'name': product.product_name,
+            'sku': product.product_code,
+            'barcode': product.barcode,
+            'price': product.price,
+            'quantity': product.quantity
+        }
@@ -0,0 +1,72 @@
+"""
+Sales Leaderboard for RahaSoft ERP
+Ranks a company's best sellers over a rolling window by summing the per-day
+product_sales_daily rows that the sale write hooks keep current, so a top-N
+for any window up to 90 days reads at most 90 rows per product sold and never
+scans the sales table.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from extensions import db
+from models.product import Product
+from models.sale import ProductSalesDaily
+
+MAX_WINDOW_DAYS = 90
+RANKINGS = ('units', 'revenue')
+
+
+class LeaderboardError(ValueError):
+    """Unsupported leaderboard window or ranking"""
+
+
+class SalesLeaderboard:
+    """Top-selling products per company from the daily sales rollup"""
+
+    @staticmethod
+    def top(company_id, days=30, limit=5, rank_by='units', until=None):
+        """
+        The `limit` best sellers over the `days` days ending with `until` (today by default).
+
+        Each entry carries product_id (None when no active product has that name
+        any more), product_name, units, revenue and sale_count.
+        """
+        if not 1 <= days <= MAX_WINDOW_DAYS:
+            raise LeaderboardError(f'Leaderboard windows run from 1 to {MAX_WINDOW_DAYS} days')
+        if rank_by not in RANKINGS:
+            raise LeaderboardError(f"Unknown ranking '{rank_by}'; expected one of {', '.join(RANKINGS)}")
+        until = until or datetime.utcnow().date()  # Sales are bucketed by their UTC day
+        since = until - timedelta(days=days - 1)
+
+        units = func.sum(ProductSalesDaily.units).label('units')
+        revenue = func.sum(ProductSalesDaily.revenue).label('revenue')
+        rows = db.session.query(
+            ProductSalesDaily.product_name,
+            units,
+            revenue,
+            func.sum(ProductSalesDaily.sale_count).label('sale_count')
+        ).filter(
+            ProductSalesDaily.company_id == company_id,
+            ProductSalesDaily.day >= since,
+            ProductSalesDaily.day <= until
+        ).group_by(ProductSalesDaily.product_name).order_by(
+            (units if rank_by == 'units' else revenue).desc(), ProductSalesDaily.product_name
+        ).limit(limit).all()
+
+        names = [row.product_name for row in rows]
+        product_ids = {}
+        if names:
+            product_ids = dict(db.session.query(Product.product_name, func.min(Product.id)).filter(
+                Product.company_id == company_id,
+                Product.is_active == True,
+                Product.product_name.in_(names)
+            ).group_by(Product.product_name).all())
+
+        return [{
+            'product_id': product_ids.get(row.product_name),
+            'product_name': row.product_name,
+            'units': int(row.units or 0),
+            'revenue': float(row.revenue or 0),
+            'sale_count': int(row.sale_count or 0),
+        } for row in rows]
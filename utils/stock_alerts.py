@@ -0,0 +1,81 @@
+"""
+Stock Alerts for RahaSoft ERP
+Reads the per-tenant low-stock set that the product write hooks keep current,
+and fans committed reorder/cleared events out to in-process subscribers and a
+Redis pub/sub channel per company
+"""
+import json
+
+import redis
+from flask import current_app
+from sqlalchemy import case, func
+
+from extensions import db
+from models.product import Product, StockAlert
+from utils.cache_manager import cache
+
+CHANNEL_PREFIX = "inventory:stock_alerts:"
+
+
+class StockAlerts:
+    """Low-stock set reads and reorder event delivery"""
+
+    _subscribers = []
+
+    @staticmethod
+    def channel(company_id):
+        return f"{CHANNEL_PREFIX}{company_id}"
+
+    @staticmethod
+    def subscribe(handler):
+        """Register `handler(events)` for committed events; usable as a decorator."""
+        StockAlerts._subscribers.append(handler)
+        return handler
+
+    @staticmethod
+    def dispatch(events):
+        """Deliver committed events; a failing subscriber is logged and never reaches the writer."""
+        for handler in list(StockAlerts._subscribers):
+            try:
+                handler(events)
+            except Exception as e:
+                current_app.logger.error(f"Stock alert subscriber {handler!r} failed: {e}")
+
+        redis_client = cache.redis
+        if not redis_client:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for event in events:
+                pipe.publish(StockAlerts.channel(event['company_id']), json.dumps(event))
+            pipe.execute()
+        except redis.RedisError as e:
+            current_app.logger.error(f"Stock alert publish error: {e}")
+
+    @staticmethod
+    def products_query(company_id, status=None):
+        """Products in the company's set, out of stock first, then the lowest stock."""
+        query = Product.query.join(StockAlert, StockAlert.product_id == Product.id).filter(
+            StockAlert.company_id == company_id
+        )
+        if status:
+            query = query.filter(StockAlert.status == status)
+        urgency = case((StockAlert.status == 'out_of_stock', 0), else_=1)
+        return query.order_by(urgency, Product.quantity, Product.product_name)
+
+    @staticmethod
+    def products(company_id, status=None, limit=None):
+        query = StockAlerts.products_query(company_id, status)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+
+    @staticmethod
+    def counts(company_id):
+        """Size of the set per status, read from the alerts index alone."""
+        rows = db.session.query(StockAlert.status, func.count()).filter(
+            StockAlert.company_id == company_id
+        ).group_by(StockAlert.status)
+        counts = dict.fromkeys(StockAlert.STATUSES, 0)
+        counts.update(dict(rows.all()))
+        return counts
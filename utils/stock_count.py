@@ -0,0 +1,189 @@
+"""
+Cycle Count Posting for RahaSoft ERP
+Takes thousands of counted quantities in one submission, compares them with
+current stock in a single query and posts every variance through the stock
+ledger, with bulk-inserted count lines, in one transaction
+"""
+import csv
+import io
+
+from sqlalchemy import insert, or_, select
+
+from extensions import db
+from models.product import Product, StockCount, StockCountLine
+from utils.stock_ledger import StockLedger
+
+MAX_COUNT_LINES = 20000
+COUNT_MOVEMENT_TYPE = 'stock_count'
+SUMMARY_VARIANCES = 20
+
+
+class StockCountError(ValueError):
+    """A count submission that cannot be posted"""
+
+
+def rows_from_request(req):
+    """Return (rows, reference, notes) from a JSON body or a CSV upload/body."""
+    if req.is_json:
+        data = req.get_json(silent=True)
+        if isinstance(data, list):
+            return data, None, None
+        if not isinstance(data, dict) or not isinstance(data.get('lines'), list):
+            raise StockCountError("Expected a JSON list of lines or an object with a 'lines' list")
+        return data['lines'], data.get('reference'), data.get('notes')
+
+    upload = req.files.get('file')
+    text = upload.read().decode('utf-8-sig') if upload else req.get_data(as_text=True)
+    if not text.strip():
+        raise StockCountError('No count lines submitted')
+    return list(csv.DictReader(io.StringIO(text))), req.form.get('reference'), req.form.get('notes')
+
+
+def parse_count_lines(rows):
+    """
+    Normalise submitted rows into {code: counted quantity}.
+
+    A row names its product by `sku` or `barcode` and its count by `counted`
+    or `quantity`. A code counted in several bins is summed.
+    """
+    counts = {}
+    errors = []
+    for line_number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'line': line_number, 'code': None, 'error': 'Line must be an object'})
+            continue
+        code = str(row.get('sku') or row.get('barcode') or '').strip()
+        raw = row.get('counted', row.get('quantity'))
+        if not code:
+            errors.append({'line': line_number, 'code': None, 'error': 'SKU or barcode is required'})
+            continue
+        try:
+            quantity = int(str(raw).strip())
+        except (TypeError, ValueError):
+            errors.append({'line': line_number, 'code': code, 'error': f"Invalid counted quantity '{raw}'"})
+            continue
+        if quantity < 0:
+            errors.append({'line': line_number, 'code': code, 'error': 'Counted quantity cannot be negative'})
+            continue
+        counts[code] = counts.get(code, 0) + quantity
+    return counts, errors
+
+
+class StockCountService:
+    """Set-based posting of cycle counts"""
+
+    @staticmethod
+    def post(company_id, rows, reference=None, notes=None, counted_by=None):
+        """
+        Post a cycle count and return (StockCount, variance lines, errors); the caller commits.
+
+        Unknown codes and malformed lines are reported in `errors` and skipped,
+        so one mistyped SKU does not hold back the rest of the count.
+        """
+        counts, errors = parse_count_lines(rows)
+        if len(counts) > MAX_COUNT_LINES:
+            raise StockCountError(f'A count may contain at most {MAX_COUNT_LINES} products')
+        if not counts:
+            raise StockCountError('No valid count lines submitted')
+
+        # One query resolves every code and snapshots current stock
+        codes = list(counts)
+        snapshot = db.session.execute(
+            select(Product.id, Product.product_code, Product.barcode, Product.product_name,
+                   Product.quantity, Product.cost_price)
+            .where(Product.company_id == company_id,
+                   or_(Product.product_code.in_(codes), Product.barcode.in_(codes)))
+        ).all()
+
+        counted = {}
+        matched = set()
+        for row in snapshot:
+            for code in {row.product_code, row.barcode}:
+                if code in counts:
+                    counted[row.id] = counted.get(row.id, 0) + counts[code]
+                    matched.add(code)
+        errors.extend({'line': None, 'code': code, 'error': 'Unknown SKU or barcode'}
+                      for code in codes if code not in matched)
+        if not counted:
+            raise StockCountError('None of the submitted codes match a product')
+
+        stock_count = StockCount(company_id=company_id, reference=reference, notes=notes,
+                                 counted_by=counted_by, line_count=len(counted))
+        db.session.add(stock_count)
+        db.session.flush()
+
+        lines = []
+        adjustments = []
+        for row in snapshot:
+            if row.id not in counted:
+                continue
+            variance = counted[row.id] - row.quantity
+            unit_cost = row.cost_price
+            lines.append({
+                'stock_count_id': stock_count.id,
+                'product_id': row.id,
+                'expected_quantity': row.quantity,
+                'counted_quantity': counted[row.id],
+                'variance': variance,
+                'unit_cost': unit_cost,
+                'variance_value': variance * unit_cost if unit_cost is not None else None,
+                'product_code': row.product_code,
+                'product_name': row.product_name,
+            })
+            if variance:
+                # Posted as a delta, so sales made while the count was being keyed are kept
+                adjustments.append({
+                    'product_id': row.id,
+                    'delta': variance,
+                    'movement_type': COUNT_MOVEMENT_TYPE,
+                    'unit_cost': unit_cost,
+                    'reference': reference or f'COUNT-{stock_count.id}',
+                })
+
+        if adjustments:
+            StockLedger.adjust_many(company_id, adjustments, created_by=counted_by, allow_negative=True)
+        line_columns = set(StockCountLine.__table__.c.keys())
+        db.session.execute(insert(StockCountLine), [
+            {key: value for key, value in line.items() if key in line_columns} for line in lines
+        ])
+
+        variances = [line for line in lines if line['variance']]
+        stock_count.variance_line_count = len(variances)
+        stock_count.surplus_quantity = sum(line['variance'] for line in variances if line['variance'] > 0)
+        stock_count.shrinkage_quantity = -sum(line['variance'] for line in variances if line['variance'] < 0)
+        stock_count.variance_value = sum(line['variance_value'] or 0.0 for line in variances)
+        stock_count.status = 'posted' if variances else 'no_variance'
+        db.session.flush()
+        return stock_count, variances, errors
+
+    @staticmethod
+    def summary(stock_count, variances, errors=None):
+        """Variance summary returned to the counting device, largest variances first."""
+        largest = sorted(variances, key=lambda line: abs(line['variance_value'] or line['variance']),
+                         reverse=True)[:SUMMARY_VARIANCES]
+        data = stock_count.to_dict()
+        data['largest_variances'] = [
+            {
+                'product_id': line['product_id'],
+                'sku': line['product_code'],
+                'name': line['product_name'],
+                'expected_quantity': line['expected_quantity'],
+                'counted_quantity': line['counted_quantity'],
+                'variance': line['variance'],
+                'variance_value': line['variance_value']
+            }
+            for line in largest
+        ]
+        data['errors'] = errors or []
+        return data
+
+    @staticmethod
+    def lines(stock_count):
+        """Every line of a posted count with its product code and name."""
+        rows = db.session.execute(
+            select(StockCountLine, Product.product_code, Product.product_name)
+            .join(Product, Product.id == StockCountLine.product_id)
+            .where(StockCountLine.stock_count_id == stock_count.id)
+            .order_by(StockCountLine.id)
+        )
+        return [dict(line.to_dict(), sku=sku, name=name) for line, sku, name in rows]
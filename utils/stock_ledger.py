@@ -0,0 +1,237 @@
+"""
+Stock Ledger for RahaSoft ERP
+Applies stock changes as atomic `quantity = quantity + :delta` updates and records
+the matching StockMovement rows in the same transaction. Rows are never read
+before they are written, so concurrent sales of one SKU cannot lose updates and
+do not queue behind SELECT ... FOR UPDATE locks.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from extensions import db
+from models.product import Product, StockMovement, StockMovementDaily, track_stock_updates
+from utils.cost_layers import CostLayers
+
+SET_QUANTITY_RETRIES = 3
+
+
+class StockLedgerError(Exception):
+    """A stock change that could not be applied"""
+
+
+class ProductNotFoundError(StockLedgerError):
+    """The product does not exist for the company"""
+
+
+class InsufficientStockError(StockLedgerError):
+    """The change would take the quantity below zero"""
+
+
+class StockVersionConflict(StockLedgerError):
+    """The product's stock changed since the caller read it"""
+
+
+class StockChange:
+    """Outcome of one ledger entry"""
+
+    def __init__(self, product_id, delta, previous_quantity, new_quantity, version):
+        self.product_id = product_id
+        self.delta = delta
+        self.previous_quantity = previous_quantity
+        self.new_quantity = new_quantity
+        self.version = version
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'delta': self.delta,
+            'previous_quantity': self.previous_quantity,
+            'new_quantity': self.new_quantity,
+            'version': self.version
+        }
+
+    def __repr__(self):
+        return f"<StockChange product={self.product_id} {self.previous_quantity}->{self.new_quantity}>"
+
+
+def _returning_columns():
+    table = Product.__table__
+    return (table.c.id, table.c.company_id, table.c.quantity, table.c.stock_version,
+            table.c.is_active, table.c.price, table.c.cost_price, table.c.reorder_level,
+            table.c.max_stock_level, table.c.product_code, table.c.product_name,
+            table.c.barcode, table.c.tax_rate)
+
+
+@lru_cache(maxsize=None)
+def _update_statement(versioned, guarded, returning):
+    """Build each guarded UPDATE shape once; rows only differ in bound values."""
+    table = Product.__table__
+    statement = table.update().where(
+        table.c.id == bindparam('ledger_product_id'),
+        table.c.company_id == bindparam('ledger_company_id')
+    )
+    if versioned:
+        statement = statement.where(table.c.stock_version == bindparam('ledger_version'))
+    if guarded:
+        statement = statement.where(table.c.quantity + bindparam('ledger_delta') >= 0)
+    statement = statement.values(
+        quantity=table.c.quantity + bindparam('ledger_delta'),
+        stock_version=table.c.stock_version + 1,
+        updated_at=bindparam('ledger_now')
+    )
+    return statement.returning(*_returning_columns()) if returning else statement
+
+
+class StockLedger:
+    """Atomic stock adjustments scoped to one company"""
+
+    @staticmethod
+    def adjust(company_id, product_id, delta, movement_type, reference=None, notes=None,
+               unit_cost=None, created_by=None, expected_version=None, allow_negative=False):
+        """Apply one signed quantity change; the caller commits."""
+        return StockLedger.adjust_many(company_id, [{
+            'product_id': product_id,
+            'delta': delta,
+            'movement_type': movement_type,
+            'reference': reference,
+            'notes': notes,
+            'unit_cost': unit_cost,
+            'expected_version': expected_version,
+        }], created_by=created_by, allow_negative=allow_negative)[0]
+
+    @staticmethod
+    def adjust_many(company_id, adjustments, created_by=None, allow_negative=False):
+        """
+        Apply signed quantity changes to many products in one transaction.
+
+        Each adjustment is a dict with product_id, delta and movement_type, plus
+        optional reference, notes, unit_cost and expected_version. Updates run
+        in product id order so concurrent batches lock rows in the same order.
+        The first failure raises and the caller rolls back the whole batch.
+        """
+        session = db.session
+        now = datetime.utcnow()
+        ordered = sorted(enumerate(adjustments), key=lambda item: item[1]['product_id'])
+
+        changes = [None] * len(adjustments)
+        movements = []
+        updated = []
+        for position, adjustment in ordered:
+            row = StockLedger._update(session, company_id, adjustment, now, allow_negative)
+            delta = adjustment['delta']
+            change = StockChange(row.id, delta, row.quantity - delta, row.quantity, row.stock_version)
+            changes[position] = change
+
+            unit_cost = adjustment.get('unit_cost')
+            movements.append({
+                'product_id': row.id,
+                'company_id': company_id,
+                'movement_type': adjustment['movement_type'],
+                'quantity': delta,
+                'previous_quantity': change.previous_quantity,
+                'new_quantity': change.new_quantity,
+                'unit_cost': unit_cost,
+                'total_cost': unit_cost * abs(delta) if unit_cost is not None else None,
+                'reference': adjustment.get('reference'),
+                'notes': adjustment.get('notes'),
+                'created_by': created_by,
+                'created_at': now,
+            })
+            updated.append((row, delta))
+            StockLedger._sync_identity_map(session, row, now)
+
+        track_stock_updates(session, updated)
+        if movements:
+            session.execute(insert(StockMovement), movements)
+            StockMovementDaily.record(session, movements)
+            CostLayers.record(session, movements)
+        return changes
+
+    @staticmethod
+    def set_quantity(company_id, product_id, quantity, movement_type='adjustment', reference=None,
+                     notes=None, unit_cost=None, created_by=None, retries=SET_QUANTITY_RETRIES):
+        """
+        Set an absolute count (stock takes, manual corrections).
+
+        The delta is computed from the current row and applied with its version,
+        so a sale that lands in between is retried rather than overwritten.
+        """
+        table = Product.__table__
+        for attempt in range(retries):
+            current = db.session.execute(
+                select(table.c.quantity, table.c.stock_version)
+                .where(table.c.id == product_id, table.c.company_id == company_id)
+            ).first()
+            if current is None:
+                raise ProductNotFoundError(f"Product {product_id} not found")
+            try:
+                return StockLedger.adjust(
+                    company_id, product_id, quantity - current.quantity, movement_type,
+                    reference=reference, notes=notes, unit_cost=unit_cost, created_by=created_by,
+                    expected_version=current.stock_version, allow_negative=True
+                )
+            except StockVersionConflict:
+                if attempt == retries - 1:
+                    raise
+
+    @staticmethod
+    def _update(session, company_id, adjustment, now, allow_negative):
+        table = Product.__table__
+        product_id = adjustment['product_id']
+        delta = adjustment['delta']
+        expected_version = adjustment.get('expected_version')
+
+        returning = session.get_bind().dialect.update_returning
+        statement = _update_statement(expected_version is not None, delta < 0 and not allow_negative, returning)
+        params = {
+            'ledger_product_id': product_id,
+            'ledger_company_id': company_id,
+            'ledger_delta': delta,
+            'ledger_now': now,
+        }
+        if expected_version is not None:
+            params['ledger_version'] = expected_version
+
+        if returning:
+            row = session.execute(statement, params).first()
+        else:
+            # Without RETURNING the UPDATE's row lock keeps this read consistent
+            updated = session.execute(statement, params).rowcount
+            row = session.execute(
+                select(*_returning_columns()).where(table.c.id == product_id)
+            ).first() if updated else None
+
+        if row is None:
+            StockLedger._raise_for(session, company_id, product_id, delta, expected_version)
+        return row
+
+    @staticmethod
+    def _raise_for(session, company_id, product_id, delta, expected_version):
+        """Explain why a guarded UPDATE matched no row."""
+        table = Product.__table__
+        current = session.execute(
+            select(table.c.quantity, table.c.stock_version)
+            .where(table.c.id == product_id, table.c.company_id == company_id)
+        ).first()
+        if current is None:
+            raise ProductNotFoundError(f"Product {product_id} not found")
+        if expected_version is not None and current.stock_version != expected_version:
+            raise StockVersionConflict(
+                f"Product {product_id} is at version {current.stock_version}, expected {expected_version}"
+            )
+        raise InsufficientStockError(
+            f"Insufficient stock for product {product_id}: {current.quantity} available, {-delta} requested"
+        )
+
+    @staticmethod
+    def _sync_identity_map(session, row, now):
+        """Refresh a loaded Product so later ORM flushes see the ledger's values."""
+        product = session.identity_map.get(identity_key(Product, row.id))
+        if product is not None:
+            set_committed_value(product, 'quantity', row.quantity)
+            set_committed_value(product, 'stock_version', row.stock_version)
+            set_committed_value(product, 'updated_at', now)
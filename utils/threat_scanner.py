@@ -0,0 +1,221 @@
+"""
+Request Threat Scanner for RahaSoft ERP
+Looks for SQL injection, XSS and path traversal payloads in the request path,
+query string, form fields and JSON body. The detection patterns are compiled
+once at import. A literal prefilter, run once over all the values of a source,
+finds the few values containing a character or keyword some pattern needs; only
+those are confirmed against the patterns of each category that applies. All
+inputs are walked in one pass, bounded in JSON depth and in total size.
+"""
+import re
+
+SQL_INJECTION = 'sql_injection'
+XSS = 'xss'
+PATH_TRAVERSAL = 'path_traversal'
+CATEGORIES = (SQL_INJECTION, XSS, PATH_TRAVERSAL)  # Order the middleware checks them in
+
+SQL_PATTERNS = (
+    r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)",
+    r"((\%27)|(\'))\s*((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
+    r"((\%27)|(\'))\s*((\%4F)|o|(\%6F))((\%72)|r|(\%52))",
+    r"\b(OR|AND)\b\s+\d+\s*=\s*\d+",
+    r"UNION\s+(ALL\s+)?SELECT",
+    r"\b(INFORMATION_SCHEMA|SYSOBJECTS|SYSCOLUMNS)\b",
+    r"((\%3D)|(=))[^\n]*((\%27)|(\'))",
+    r"\b(waitfor|delay)\b\s+\d+",
+    r"((\%3C)|<)((\%2F)|\/)*[a-z0-9\%]+((\%3E)|>)",
+    r"((\%3C)|<)((\%69)|i|(\%49))((\%6D)|m|(\%4D))((\%67)|g|(\%47))[^\n]+((\%3E)|>)",
+)
+
+XSS_PATTERNS = (
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"<iframe[^>]*>.*?</iframe>",
+    r"<object[^>]*>.*?</object>",
+    r"<embed[^>]*>.*?</embed>",
+    r"<form[^>]*>.*?</form>",
+    r"<input[^>]*>",
+    r"<img[^>]*src\s*=\s*[\"']?javascript:",
+    r"<body[^>]*onload\s*=",
+    r"document\.cookie",
+    r"document\.write",
+    r"window\.location",
+    r"eval\s*\(",
+    r"alert\s*\(",
+    r"confirm\s*\(",
+    r"prompt\s*\(",
+)
+
+PATH_PATTERNS = (
+    r"\.\.\/",
+    r"\.\.\\",
+    r"%2e%2e%2f",
+    r"%2e%2e\\",
+    r"..%2f",
+    r"..%5c",
+    r"%252e%252e%252f",
+    r"..%252f",
+    r"..%c0%af",
+    r"..%c1%9c",
+)
+
+# Every match of every pattern above contains one of these literals once the
+# text is lower-cased: a quote, '=', '<', '%', a backslash, '..' or a keyword.
+# Patterns added above must keep that true, or add their literal here. Keywords
+# are grouped by first letter, which lets the regex engine reject most positions
+# after one character.
+PREFILTER_KEYWORDS = (
+    'alert', 'alter', 'confirm', 'create', 'delay', 'delete', 'document', 'drop', 'eval', 'exec',
+    'information_schema', 'insert', 'javascript', 'prompt', 'script', 'select', 'syscolumns',
+    'sysobjects', 'union', 'update', 'waitfor', 'window',
+)
+PREFILTER = re.compile(r"[<='%\\]|\.\.|" + '|'.join(
+    f"{letter}(?:{'|'.join(keyword[1:] for keyword in PREFILTER_KEYWORDS if keyword[0] == letter)})"
+    for letter in sorted({keyword[0] for keyword in PREFILTER_KEYWORDS})
+))
+
+# Characters re.IGNORECASE matches to an ASCII letter that str.lower() does not
+# turn into it. Mapping them first also keeps lower() from changing the length.
+CASE_FOLD = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+DETECTORS = {
+    category: tuple(re.compile(pattern, re.IGNORECASE) for pattern in patterns)
+    for category, patterns in (
+        (SQL_INJECTION, SQL_PATTERNS),
+        (XSS, XSS_PATTERNS),
+        (PATH_TRAVERSAL, PATH_PATTERNS),
+    )
+}
+
+# Which checks apply to which input: the path is not checked for XSS, nor JSON for traversal
+SOURCE_CATEGORIES = {
+    'path': (SQL_INJECTION, PATH_TRAVERSAL),
+    'args': CATEGORIES,
+    'form': CATEGORIES,
+    'json': (SQL_INJECTION, XSS),
+}
+
+MAX_DEPTH = 32
+MAX_BYTES = 1024 * 1024
+
+
+class ScanResult:
+    """Categories detected in a request, and the limit that cut the scan short, if any"""
+
+    def __init__(self):
+        self.categories = set()
+        self.limit_hit = None
+        self.scanned_bytes = 0
+
+    def __contains__(self, category):
+        return category in self.categories
+
+    def __bool__(self):
+        return bool(self.categories)
+
+    def __repr__(self):
+        return f"<ScanResult {sorted(self.categories)} limit_hit={self.limit_hit}>"
+
+
+class ThreatScanner:
+    """Single-pass scanner over request inputs using the precompiled patterns"""
+
+    def __init__(self, max_depth=MAX_DEPTH, max_bytes=MAX_BYTES):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+
+    def scan_request(self, request):
+        """Scan a Flask request's path, query string, form and JSON body."""
+        return self.scan(
+            request.path,
+            args=request.args.values(),
+            form=request.form.values() if request.form else (),
+            json_data=request.json if request.is_json and request.json else None,
+        )
+
+    def scan(self, path, args=(), form=(), json_data=None):
+        """
+        Scan the given inputs and return a ScanResult. Only string values are
+        checked; in JSON that means values inside objects and arrays, not keys.
+        Stops as soon as every category has been found.
+        """
+        result = ScanResult()
+        sources = (
+            ('path', (path,)),
+            ('args', args),
+            ('form', form),
+            ('json', self._json_strings(json_data, result)),
+        )
+        for source, values in sources:
+            for value in self._candidates(self._within_budget(values, result)):
+                for category in SOURCE_CATEGORIES[source]:
+                    if category not in result.categories and any(
+                            detector.search(value) for detector in DETECTORS[category]):
+                        result.categories.add(category)
+                if len(result.categories) == len(CATEGORIES):
+                    return result
+            if result.limit_hit == 'size':
+                break
+        return result
+
+    def _within_budget(self, values, result):
+        """The string values, cut off once max_bytes characters have been taken in total."""
+        strings = []
+        for value in values:
+            if not isinstance(value, str):
+                continue
+            remaining = self.max_bytes - result.scanned_bytes
+            if len(value) > remaining:
+                strings.append(value[:remaining])
+                result.scanned_bytes = self.max_bytes
+                result.limit_hit = 'size'
+                break
+            strings.append(value)
+            result.scanned_bytes += len(value)
+        return strings
+
+    @staticmethod
+    def _candidates(strings):
+        """
+        The strings the prefilter matches, in order. All strings of a source are
+        joined and lower-cased once and searched in a single pass; no literal
+        contains a newline, so no match can span two strings.
+        """
+        if not strings:
+            return []
+        text = '\n'.join(strings)
+        if not text.isascii():
+            text = text.translate(CASE_FOLD)
+        text = text.lower()
+
+        candidates = []
+        index, end, last = 0, len(strings[0]), None
+        for match in PREFILTER.finditer(text):
+            while match.start() > end:
+                index += 1
+                end += len(strings[index]) + 1
+            if index != last:
+                candidates.append(strings[index])
+                last = index
+        return candidates
+
+    def _json_strings(self, data, result):
+        """String values nested in a JSON object or array, walked iteratively up to max_depth."""
+        if not isinstance(data, (dict, list)):
+            return
+        stack = [(data, 1)]
+        while stack:
+            container, depth = stack.pop()
+            items = container.values() if isinstance(container, dict) else container
+            nested = []
+            for item in items:
+                if isinstance(item, str):
+                    yield item
+                elif isinstance(item, (dict, list)):
+                    if depth < self.max_depth:
+                        nested.append((item, depth + 1))
+                    else:
+                        result.limit_hit = result.limit_hit or 'depth'
+            # Reversed so containers are visited in document order
+            stack.extend(reversed(nested))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Scheduled Dashboard Warming
+Precomputes the inventory, finance and CRM dashboard aggregates of every company
+active in the last few days, so the first user of the morning finds them cached.
+Only sections missing from the cache are computed. Warming shares the app's
+concurrency budget with post-import warms in the web workers and staggers
+companies so the database never sees them all at once. Intended for cron, shortly
+before business hours and again through the day if entries are invalidated often.
+
+Usage: python warm_dashboards.py [--days N] [--concurrency N] [--stagger SECONDS] [company_id ...]
+"""
+import argparse
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from utils.dashboard_warmer import dashboard_warmer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Warm dashboard caches for active companies')
+    parser.add_argument('company_ids', nargs='*', type=int)
+    parser.add_argument('--days', type=int, default=3,
+                        help='Warm companies active on any of the last N days (default 3)')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Companies warmed at once (default DASHBOARD_WARM_CONCURRENCY)')
+    parser.add_argument('--stagger', type=float, default=None,
+                        help='Average seconds between companies per thread (default DASHBOARD_WARM_STAGGER)')
+    return parser.parse_args()
+
+
+def warm(args):
+    with app.app_context():
+        try:
+            company_ids = args.company_ids or dashboard_warmer.active_companies(days=args.days)
+            if not company_ids:
+                print("ℹ️  No active companies to warm")
+                return
+
+            print(f"🔥 Warming dashboards of {len(company_ids)} companies")
+            started = time.monotonic()
+            results = dashboard_warmer.warm_companies(company_ids, concurrency=args.concurrency,
+                                                      stagger=args.stagger)
+            print(f"✅ Warmed {len(results['warmed'])}, skipped {len(results['skipped'])} "
+                  f"in {time.monotonic() - started:.1f}s")
+            if results['failed']:
+                print(f"❌ Failed for companies {', '.join(map(str, sorted(results['failed'])))}")
+                sys.exit(1)
+
+        except Exception as e:
+            print(f"❌ Error warming dashboards: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    warm(parse_args())